@@ -1,123 +1,218 @@
 import os
 import google.generativeai as genai
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from core.models import DoctorPlan, Medication, SymptomPayload
-import json
-import re
+from core.deadline import race
+from core.llm import GeminiClient
+from core.llm_cache import shared_cache
+from core.json_stream import JsonStreamParser
+from core.schemas import CombinedAssessment, PlanSchema, SymptomExtraction, parse_llm_json, parse_plan
+
+# JSON structure Gemini is asked to return for a plan (indented to sit inside the prompts)
+PLAN_JSON_FORMAT = """{
+            "differential": [
+                {
+                    "condition": "condition_name", 
+                    "likelihood": 0.XX,
+                    "explanation": "brief reasoning"
+                }
+            ],
+            "tests_suggested": [
+                {
+                    "test": "test_name",
+                    "reason": "why this test is suggested"
+                }
+            ],
+            "self_care": [
+                {
+                    "recommendation": "specific advice",
+                    "details": "detailed instructions"
+                }
+            ],
+            "medications": [
+                {
+                    "name": "medication_name",
+                    "dose": "dose_info",
+                    "route": "oral/topical/etc",
+                    "frequency": "frequency_info",
+                    "max_daily": "max_daily_dose",
+                    "duration": "recommended_duration",
+                    "precautions": ["precaution1", "precaution2"],
+                    "interactions": ["interaction1", "interaction2"]
+                }
+            ],
+            "escalation": {
+                "needed": true/false, 
+                "reason": "reason_if_needed",
+                "urgency": "immediate/within_hours/within_days"
+            },
+            "follow_up_advice": [
+                {
+                    "advice": "specific follow-up instruction",
+                    "timing": "when to do this"
+                }
+            ],
+            "warning_signs": ["warning1", "warning2"],
+            "disclaimer": "appropriate disclaimer text"
+        }"""
+
+def _parse_assessment(text: str) -> CombinedAssessment:
+    """Validated combined response; raises if the extraction half is unusable"""
+    data = parse_llm_json(CombinedAssessment, text)
+    if not data.extraction.chief_complaint:
+        raise ValueError("combined response has no usable extraction")
+    return data
 
 class DoctorAgent:
-    def __init__(self):
+    def __init__(self, latency_budget: Optional[float] = None):
+        # Seconds to wait for Gemini before answering with the rule-based plan (None waits indefinitely)
+        self.latency_budget = latency_budget
         self.gemini_available = False
         try:
             if os.getenv("GEMINI_API_KEY"):
                 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-                self.model = genai.GenerativeModel('gemini-pro')
+                self.model = GeminiClient('gemini-pro', cache=shared_cache())
                 self.gemini_available = True
         except:
             self.gemini_available = False
     
     def generate_plan(self, symptom_data: SymptomPayload) -> DoctorPlan:
         """Generate a comprehensive assessment and care plan"""
+        if self.gemini_available and not self.model.available():
+            # Gemini is failing; use the rule-based plan without waiting on another failed call
+            plan = self._generate_fallback_plan(symptom_data)
+            plan.source = "circuit_open"
+            return plan
         if self.gemini_available:
+            if self.latency_budget is not None:
+                plan, source = race(lambda: self._llm_plan(symptom_data),
+                                    lambda: self._generate_fallback_plan(symptom_data),
+                                    self.latency_budget, label="Doctor plan Gemini")
+                plan.source = source
+                return plan
             try:
-                prompt = f"""
-                You are a medical assistant providing detailed preliminary assessment. 
-                Based on the following symptoms and patient context:
-                
-                {symptom_data.to_dict()}
-                
-                Provide a comprehensive structured assessment with:
-                1. Differential diagnosis (list 3-4 most likely conditions with likelihood estimates and brief explanations)
-                2. Suggested diagnostic tests with reasons
-                3. Detailed self-care recommendations with specific instructions
-                4. Medication suggestions if appropriate (with proper dosing instructions, precautions, and duration)
-                5. Clear escalation criteria and when to seek immediate care
-                6. Follow-up advice and monitoring instructions
-                7. Warning signs that should prompt immediate medical attention
-                8. A clear disclaimer that this is not a medical diagnosis
-                
-                Consider patient context: {symptom_data.context.to_dict()}
-                
-                Return ONLY valid JSON with this structure:
-                {{
-                    "differential": [
-                        {{
-                            "condition": "condition_name", 
-                            "likelihood": 0.XX,
-                            "explanation": "brief reasoning"
-                        }}
-                    ],
-                    "tests_suggested": [
-                        {{
-                            "test": "test_name",
-                            "reason": "why this test is suggested"
-                        }}
-                    ],
-                    "self_care": [
-                        {{
-                            "recommendation": "specific advice",
-                            "details": "detailed instructions"
-                        }}
-                    ],
-                    "medications": [
-                        {{
-                            "name": "medication_name",
-                            "dose": "dose_info",
-                            "route": "oral/topical/etc",
-                            "frequency": "frequency_info",
-                            "max_daily": "max_daily_dose",
-                            "duration": "recommended_duration",
-                            "precautions": ["precaution1", "precaution2"],
-                            "interactions": ["interaction1", "interaction2"]
-                        }}
-                    ],
-                    "escalation": {{
-                        "needed": true/false, 
-                        "reason": "reason_if_needed",
-                        "urgency": "immediate/within_hours/within_days"
-                    }},
-                    "follow_up_advice": [
-                        {{
-                            "advice": "specific follow-up instruction",
-                            "timing": "when to do this"
-                        }}
-                    ],
-                    "warning_signs": ["warning1", "warning2"],
-                    "disclaimer": "appropriate disclaimer text"
-                }}
-                """
-                
-                response = self.model.generate_content(prompt)
-                json_str = self._extract_json(response.text)
-                plan_data = json.loads(json_str)
-                
-                # Convert medications to Medication objects
-                medications = []
-                for med in plan_data.get("medications", []):
-                    medications.append(Medication(**med))
-                
-                return DoctorPlan(
-                    differential=plan_data.get("differential", []),
-                    tests_suggested=plan_data.get("tests_suggested", []),
-                    self_care=plan_data.get("self_care", []),
-                    medications=medications,
-                    escalation=plan_data.get("escalation", {"needed": False, "reason": None}),
-                    disclaimer=plan_data.get("disclaimer", "Informational only; see a clinician for diagnosis."),
-                    follow_up_advice=plan_data.get("follow_up_advice", []),
-                    warning_signs=plan_data.get("warning_signs", [])
-                )
+                return self._llm_plan(symptom_data)
             except Exception as e:
                 print(f"Error generating doctor plan with Gemini: {e}")
         
         # Fallback plan if Gemini fails
         return self._generate_fallback_plan(symptom_data)
     
-    def _extract_json(self, text: str) -> str:
-        """Extract JSON string from response"""
-        json_match = re.search(r'\{.*\}', text, re.DOTALL)
-        if json_match:
-            return json_match.group(0)
-        return text
+    def generate_plan_stream(self, symptom_data: SymptomPayload,
+                             on_field: Optional[Callable[[str, Any], None]] = None) -> DoctorPlan:
+        """generate_plan with the Gemini response streamed.
+
+        on_field(key, value) is called for each top-level plan field
+        ("differential", "medications", "escalation", ...) as soon as its
+        value is complete, while the rest is still being generated. Rule-based
+        plans report their fields too, so callers handle both paths the same
+        way; if a stream fails midway the fallback plan's fields follow and
+        replace what was already reported. The latency budget does not apply
+        here, since the caller is already seeing partial output.
+        """
+        if self.gemini_available and self.model.available():
+            try:
+                plan = self._llm_plan_stream(symptom_data, on_field)
+            except Exception as e:
+                print(f"Error streaming doctor plan from Gemini: {e}")
+                plan = self._generate_fallback_plan(symptom_data)
+        else:
+            plan = self.generate_plan(symptom_data)
+        if on_field and plan.source != "llm":
+            for key, value in plan.to_dict().items():
+                if key != "source":
+                    on_field(key, value)
+        return plan
+    
+    def _llm_plan_stream(self, symptom_data: SymptomPayload,
+                         on_field: Optional[Callable[[str, Any], None]] = None) -> DoctorPlan:
+        """Streamed Gemini assessment; raises on any API failure or an incomplete response"""
+        parser = JsonStreamParser()
+        # Read to the end even after the object closes, so the full text gets cached
+        for chunk in self.model.stream_content(self._plan_prompt(symptom_data), validate=parse_plan):
+            for key, value in parser.feed(chunk):
+                if on_field:
+                    on_field(key, value)
+        if not parser.complete:
+            raise ValueError("streamed plan ended before the JSON object was complete")
+        return self._plan_from_data(parser.result())
+    
+    def _llm_plan(self, symptom_data: SymptomPayload) -> DoctorPlan:
+        """Gemini assessment; raises on any API or parsing failure"""
+        return self.model.generate_content(self._plan_prompt(symptom_data), parse=parse_plan).to_plan()
+    
+    def _plan_prompt(self, symptom_data: SymptomPayload) -> str:
+        """Prompt for a single-case assessment"""
+        # Leave out per-request fields so identical cases produce identical prompts
+        case = {k: v for k, v in symptom_data.to_dict().items() if k not in ("timestamp", "source")}
+        prompt = f"""
+        You are a medical assistant providing detailed preliminary assessment. 
+        Based on the following symptoms and patient context:
+        
+        {case}
+        
+        Provide a comprehensive structured assessment with:
+        1. Differential diagnosis (list 3-4 most likely conditions with likelihood estimates and brief explanations)
+        2. Suggested diagnostic tests with reasons
+        3. Detailed self-care recommendations with specific instructions
+        4. Medication suggestions if appropriate (with proper dosing instructions, precautions, and duration)
+        5. Clear escalation criteria and when to seek immediate care
+        6. Follow-up advice and monitoring instructions
+        7. Warning signs that should prompt immediate medical attention
+        8. A clear disclaimer that this is not a medical diagnosis
+        
+        Consider patient context: {symptom_data.context.to_dict()}
+        
+        Return ONLY valid JSON with this structure:
+        {PLAN_JSON_FORMAT}
+        """
+        return prompt
+    
+    def _plan_from_data(self, plan_data: Dict[str, Any], source: str = "llm") -> DoctorPlan:
+        """Build a DoctorPlan from the fields Gemini returned; raises ValidationError if they are malformed"""
+        return PlanSchema.model_validate(plan_data).to_plan(source)
+    
+    def generate_assessment(self, user_input: str, context: Dict[str, Any] = None) -> Tuple[SymptomExtraction, DoctorPlan]:
+        """Symptom extraction and plan from a single Gemini call.
+
+        Returns the validated extraction and the plan. Raises if the call
+        fails or either half of the response does not validate, so the caller
+        can fall back to the separate extraction and plan calls.
+        """
+        message = ' '.join(user_input.split())
+        prompt = f"""
+        You are a medical assistant. Read this patient message, extract the symptom details and
+        provide a detailed preliminary assessment, all in one response.
+        
+        Patient message: "{message}"
+        
+        Context: {context if context else 'No additional context provided'}
+        
+        For "extraction" give:
+        - chief_complaint: Primary complaint in 2-5 words
+        - symptoms: List of all symptoms mentioned with details
+        - onset: Duration or time since onset with specific timeframe
+        - severity: Mild, moderate, severe, or critical
+        - red_flags: List any potential red flag symptoms
+        - duration_hours: Estimated duration in hours
+        - triggers: Any identified triggers or aggravating factors
+        
+        For "plan" give a differential diagnosis with likelihoods, suggested tests, self-care,
+        medications with dosing, escalation criteria, follow-up advice, warning signs and a
+        disclaimer that this is not a medical diagnosis.
+        
+        Return ONLY valid JSON with this structure:
+        {{
+            "extraction": {{
+                "chief_complaint": "...", "symptoms": ["..."], "onset": "...", "severity": "...",
+                "red_flags": ["..."], "duration_hours": 0, "triggers": ["..."]
+            }},
+            "plan": {PLAN_JSON_FORMAT}
+        }}
+        """
+        
+        data = self.model.generate_content(prompt, parse=_parse_assessment)
+        return data.extraction, data.plan.to_plan(source="combined")
     
     def _generate_fallback_plan(self, symptom_data: SymptomPayload) -> DoctorPlan:
         """Generate a comprehensive fallback plan"""
@@ -240,5 +335,6 @@ class DoctorAgent:
             },
             disclaimer="Informational only; see a clinician for proper diagnosis and treatment. This is an automated assessment and should not replace professional medical advice.",
             follow_up_advice=follow_up_advice,
-            warning_signs=warning_signs
+            warning_signs=warning_signs,
+            source="fallback"
         )
\ No newline at end of file
@@ -1,10 +1,12 @@
 from typing import List, Dict, Any
 from core.models import SafetyReview, SymptomPayload, DoctorPlan, PharmacyAvailability
 from core.rules import SafetyRules
+from core.interactions import shared_interactions
 
 class SafetyGuardian:
     def __init__(self):
         self.rules = SafetyRules()
+        self.interactions = shared_interactions()
     
     def review_plan(self, symptom_data: SymptomPayload, 
                    doctor_plan: DoctorPlan, 
@@ -30,8 +32,9 @@ class SafetyGuardian:
         
         # 2. Check medication safety
         context = symptom_data.context.to_dict() if hasattr(symptom_data.context, 'to_dict') else {}
+        allergies = self.rules.allergy_set(context.get("allergies"))
         for medication in doctor_plan.medications:
-            med_issues = self.rules.check_medication_safety(medication, context)
+            med_issues = self.rules.check_medication_safety(medication, context, allergies)
             issues.extend(med_issues)
             
             # Add specific recommendations for medication issues
@@ -48,9 +51,9 @@ class SafetyGuardian:
             recommendations.append("Review all medications for pregnancy safety")
         
         # 4. Check pharmacy availability against allergies
-        if context.get("allergies"):
+        if allergies:
             for item in pharmacy_data.availability:
-                if self.rules.check_allergy_contraindication(item["name"], context["allergies"]):
+                if self.rules.check_allergy_contraindication(item["name"], allergies):
                     issues.append(f"Available medication {item['name']} may be contraindicated due to allergies")
                     recommendations.append(f"Avoid {item['name']} due to allergy concerns")
         
@@ -112,41 +115,19 @@ class SafetyGuardian:
     
     def _check_drug_interactions(self, recommended_meds: List[Any], current_meds: List[str]) -> List[str]:
         """Check for potential drug interactions"""
-        issues = []
-        
-        # Simple interaction check (in real implementation, use a drug interaction database)
-        interaction_pairs = [
-            ("warfarin", "aspirin"), ("warfarin", "ibuprofen"),
-            ("ssri", "maoi"), ("digoxin", "quinine"),
-            ("statins", "azole"), ("diuretic", "lithium")
-        ]
+        all_meds = [med.name for med in recommended_meds] + list(current_meds)
         
-        all_meds = [med.name.lower() for med in recommended_meds] + [med.lower() for med in current_meds]
-        
-        for med1, med2 in interaction_pairs:
-            if med1 in all_meds and med2 in all_meds:
-                issues.append(f"Potential interaction between {med1} and {med2}")
+        issues = []
+        # Same ontology as the rules, so a drug_classes.csv reload reaches both checks
+        for interaction in self.interactions.check(all_meds, self.rules.ontology):
+            issue = f"Potential {interaction.severity} interaction between {interaction.drug_a} and {interaction.drug_b}"
+            if interaction.mechanism:
+                issue += f": {interaction.mechanism}"
+            issues.append(issue)
         
         return issues
     
     def _check_age_appropriateness(self, plan: DoctorPlan, age: int) -> List[str]:
         """Check if recommendations are age-appropriate"""
-        issues = []
-        
-        if age is None:
-            return issues
-        
         # Check medications for age restrictions
-        age_restricted_meds = {
-            "aspirin": (16, "Should not be used in children due to Reye's syndrome risk"),
-            "tetracycline": (8, "Can cause tooth discoloration in children"),
-            "fluoroquinolones": (18, "Generally avoided in children due to effects on cartilage")
-        }
-        
-        for medication in plan.medications:
-            med_name = medication.name.lower()
-            for restricted_med, (min_age, reason) in age_restricted_meds.items():
-                if restricted_med in med_name and age < min_age:
-                    issues.append(f"Medication {medication.name} {reason}")
-        
-        return issues
\ No newline at end of file
+        return self.rules.check_age_restrictions(plan.medications, age)
@@ -1,149 +1,245 @@
 import os
+import glob
+import json
 import google.generativeai as genai
 import re
-from typing import Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from core.models import SymptomPayload, PatientContext
+from core.lexicon import SymptomMatcher, LexiconStore
+from core.deadline import race
+from core.llm import GeminiClient
+from core.llm_cache import shared_cache
+from core.json_stream import extract_json
+from core.schemas import SymptomExtraction, parse_extraction
+from pydantic import ValidationError
 from datetime import datetime
 
+DURATION_PATTERN = re.compile(r'for (\d+)\s*(hour|day|week|month)')
+LEXICON_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'lexicon')
+
+def load_lexicon_store():
+    """Compiled data-file lexicon, or None if the files are missing or broken"""
+    paths = sorted(glob.glob(os.path.join(LEXICON_DIR, '*.tsv')))
+    if not paths:
+        return None
+    try:
+        return LexiconStore.compile(paths, cache_dir=os.path.join(LEXICON_DIR, '..', '.cache', 'lexicon'))
+    except Exception as e:
+        print(f"Lexicon load failed, using built-in terms only: {e}")
+        return None
+
+def rule_extraction(matcher: SymptomMatcher, user_input: str, context: Dict[str, Any] = None) -> SymptomPayload:
+    """Lexicon-only symptom extraction (no LLM)"""
+    user_input_lower = user_input.lower()
+
+    # Symptoms, red flags and severity keywords in a single pass
+    found = matcher.match(user_input_lower)
+    symptoms = found.symptoms
+    red_flags = found.red_flags
+
+    # Extract duration
+    duration_match = DURATION_PATTERN.search(user_input_lower)
+    duration_hours = None
+    if duration_match:
+        value, unit = duration_match.groups()
+        value = int(value)
+        if unit == 'hour':
+            duration_hours = value
+        elif unit == 'day':
+            duration_hours = value * 24
+        elif unit == 'week':
+            duration_hours = value * 168
+        elif unit == 'month':
+            duration_hours = value * 720
+
+    # Determine chief complaint
+    chief_complaint = symptoms[0] if symptoms else "General symptoms"
+
+    # Severity from the strongest keyword found
+    severity = found.severity
+
+    # Create patient context
+    patient_context = PatientContext(**context) if context else PatientContext()
+
+    return SymptomPayload(
+        chief_complaint=chief_complaint,
+        symptoms=symptoms,
+        onset=None,
+        severity=severity,
+        red_flags=red_flags,
+        context=patient_context,
+        duration_hours=duration_hours,
+        source="fallback"
+    )
+
+# Per-process matcher for batch workers; the lexicon arrays are memory-mapped,
+# so every worker shares the same pages
+_worker_matcher: Optional[SymptomMatcher] = None
+
+def _init_worker():
+    global _worker_matcher
+    _worker_matcher = SymptomMatcher.default(load_lexicon_store())
+
+def _extract_chunk(chunk: List[Tuple[str, Optional[Dict[str, Any]]]]) -> List[SymptomPayload]:
+    return [rule_extraction(_worker_matcher, text, context) for text, context in chunk]
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _parse_batch(text: str) -> List[Optional[SymptomExtraction]]:
+    """One validated extraction per entry of a batch response, None where an entry is malformed"""
+    extracted = json.loads(extract_json(text, opening='['))
+    if not isinstance(extracted, list):
+        raise ValueError("batch response is not a JSON array")
+    items = []
+    for i, data in enumerate(extracted):
+        try:
+            items.append(SymptomExtraction.model_validate(data))
+        except ValidationError as e:
+            print(f"Gemini extraction {i} invalid: {e}")
+            items.append(None)
+    return items
+
 class PatientSymptomAgent:
-    def __init__(self):
+    def __init__(self, latency_budget: Optional[float] = None):
+        self.matcher = SymptomMatcher.default(load_lexicon_store())
+        # Seconds to wait for Gemini before answering from the lexicon (None waits indefinitely)
+        self.latency_budget = latency_budget
         self.gemini_available = False
         try:
             if os.getenv("GEMINI_API_KEY"):
                 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-                self.model = genai.GenerativeModel('gemini-pro')
+                self.model = GeminiClient('gemini-pro', cache=shared_cache())
                 self.gemini_available = True
         except:
             self.gemini_available = False
     
     def extract_symptoms(self, user_input: str, context: Dict[str, Any] = None) -> SymptomPayload:
         """Extract structured symptom information from patient input"""
-        if self.gemini_available:
-            try:
-                prompt = f"""
-                You are a medical symptom extraction agent. Extract detailed information from this patient message:
-                
-                Patient message: "{user_input}"
-                
-                Context: {context if context else 'No additional context provided'}
-                
-                Extract comprehensive information including:
-                - chief_complaint: Primary complaint in 2-5 words
-                - symptoms: List of all symptoms mentioned with details
-                - onset: Duration or time since onset with specific timeframe
-                - severity: Mild, moderate, severe, or critical
-                - red_flags: List any potential red flag symptoms
-                - duration_hours: Estimated duration in hours
-                - triggers: Any identified triggers or aggravating factors
-                
-                Return ONLY valid JSON with these fields. Do not include any other text.
-                """
-                
-                response = self.model.generate_content(prompt)
-                json_str = self._extract_json(response.text)
-                symptom_data = eval(json_str)
-                
-                patient_context = PatientContext(**context) if context else PatientContext()
-                
-                return SymptomPayload(
-                    chief_complaint=symptom_data.get("chief_complaint", ""),
-                    symptoms=symptom_data.get("symptoms", []),
-                    onset=symptom_data.get("onset"),
-                    severity=symptom_data.get("severity"),
-                    red_flags=symptom_data.get("red_flags", []),
-                    context=patient_context,
-                    duration_hours=symptom_data.get("duration_hours"),
-                    triggers=symptom_data.get("triggers", [])
-                )
-            except Exception as e:
-                print(f"Gemini API error: {e}")
-                return self._fallback_extraction(user_input, context)
-        else:
+        if not self.gemini_available:
+            return self._fallback_extraction(user_input, context)
+        if not self.model.available():
+            # Gemini is failing; answer from the lexicon without waiting on another failed call
+            payload = self._fallback_extraction(user_input, context)
+            payload.source = "circuit_open"
+            return payload
+        if self.latency_budget is not None:
+            payload, source = race(lambda: self._llm_extraction(user_input, context),
+                                   lambda: self._fallback_extraction(user_input, context),
+                                   self.latency_budget, label="Gemini API")
+            payload.source = source
+            return payload
+        try:
+            return self._llm_extraction(user_input, context)
+        except Exception as e:
+            print(f"Gemini API error: {e}")
             return self._fallback_extraction(user_input, context)
     
-    def _extract_json(self, text: str) -> str:
-        """Extract JSON string from response"""
-        json_match = re.search(r'\{.*\}', text, re.DOTALL)
-        if json_match:
-            return json_match.group(0)
-        return text
+    def _llm_extraction(self, user_input: str, context: Dict[str, Any] = None) -> SymptomPayload:
+        """Gemini extraction; raises on any API or parsing failure"""
+        # Collapsed whitespace keeps retyped messages on the same response-cache key
+        message = ' '.join(user_input.split())
+        prompt = f"""
+        You are a medical symptom extraction agent. Extract detailed information from this patient message:
+
+        Patient message: "{message}"
+
+        Context: {context if context else 'No additional context provided'}
+
+        Extract comprehensive information including:
+        - chief_complaint: Primary complaint in 2-5 words
+        - symptoms: List of all symptoms mentioned with details
+        - onset: Duration or time since onset with specific timeframe
+        - severity: Mild, moderate, severe, or critical
+        - red_flags: List any potential red flag symptoms
+        - duration_hours: Estimated duration in hours
+        - triggers: Any identified triggers or aggravating factors
+
+        Return ONLY valid JSON with these fields. Do not include any other text.
+        """
+
+        return self.model.generate_content(prompt, parse=parse_extraction).to_payload(context)
     
     def _fallback_extraction(self, user_input: str, context: Dict[str, Any] = None) -> SymptomPayload:
         """Fallback method for symptom extraction"""
-        symptoms = []
-        red_flags = []
-        
-        # Enhanced symptom detection
-        symptom_patterns = {
-            "fever": [r"fever", r"temperature", r"hot", r"chills", r"°F", r"°C"],
-            "sore throat": [r"sore throat", r"throat pain", r"difficulty swallowing"],
-            "cough": [r"cough", r"coughing", r"hacking"],
-            "headache": [r"headache", r"head pain", r"migraine"],
-            "fatigue": [r"fatigue", r"tired", r"exhausted", r"weakness"],
-            "nausea": [r"nausea", r"sick to stomach", r"queasy"],
-            "vomiting": [r"vomiting", r"throwing up", r"puking"],
-            "chest pain": [r"chest pain", r"chest discomfort"],
-            "breathing issues": [r"shortness of breath", r"difficulty breathing", r"wheezing"],
-            "abdominal pain": [r"stomach pain", r"abdominal pain", r"belly ache"]
-        }
-        
-        # Red flag detection
-        red_flag_patterns = [
-            r"severe pain", r"worst pain", r"excruciating",
-            r"can't breathe", r"difficulty breathing",
-            r"chest pain", r"chest pressure",
-            r"confusion", r"disoriented",
-            r"fainting", r"passed out",
-            r"blood", r"bleeding",
-            r"high fever", r"fever over 103"
-        ]
-        
-        user_input_lower = user_input.lower()
-        
-        # Extract symptoms
-        for symptom, patterns in symptom_patterns.items():
-            if any(re.search(pattern, user_input_lower) for pattern in patterns):
-                symptoms.append(symptom)
+        return rule_extraction(self.matcher, user_input, context)
+    
+    def extract_symptoms_batch(self, items: Iterable[Tuple[str, Optional[Dict[str, Any]]]],
+                               workers: int = None, chunk_size: int = 256,
+                               messages_per_prompt: int = 10) -> Iterator[SymptomPayload]:
+        """Extract symptoms for many (text, context) pairs, yielding results in input order.
+
+        With Gemini available, messages are sent several to a prompt. Otherwise
+        the lexicon path runs in a process pool of `workers` processes (CPU count
+        by default) fed chunk by chunk, so arbitrarily long inputs stream through
+        with only a few chunks in flight.
+        """
+        if self.gemini_available:
+            for group in _chunks(items, messages_per_prompt):
+                yield from self._extract_group(group)
+            return
         
-        # Extract red flags
-        for pattern in red_flag_patterns:
-            if re.search(pattern, user_input_lower):
-                red_flags.append(pattern)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            for text, context in items:
+                yield self._fallback_extraction(text, context)
+            return
         
-        # Extract duration
-        duration_match = re.search(r'for (\d+)\s*(hour|day|week|month)', user_input_lower)
-        duration_hours = None
-        if duration_match:
-            value, unit = duration_match.groups()
-            value = int(value)
-            if unit == 'hour':
-                duration_hours = value
-            elif unit == 'day':
-                duration_hours = value * 24
-            elif unit == 'week':
-                duration_hours = value * 168
-            elif unit == 'month':
-                duration_hours = value * 720
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = []
+            for chunk in _chunks(items, chunk_size):
+                pending.append(pool.submit(_extract_chunk, chunk))
+                # Keep every worker busy without queueing the whole input
+                if len(pending) >= workers * 2:
+                    yield from pending.pop(0).result()
+            for future in pending:
+                yield from future.result()
+    
+    def _extract_group(self, group: List[Tuple[str, Optional[Dict[str, Any]]]]) -> List[SymptomPayload]:
+        """One LLM call for several messages; falls back to the lexicon for any it misses"""
+        # Each message keeps its own context (age, pregnancy, medications), as in the single prompt
+        numbered = "\n".join(
+            f'{i}. Patient message: "{" ".join(text.split())}"\n'
+            f'           Context: {context if context else "No additional context provided"}'
+            for i, (text, context) in enumerate(group, 1))
+        prompt = f"""
+        You are a medical symptom extraction agent. Extract detailed information from each of these {len(group)} patient messages:
         
-        # Determine chief complaint
-        chief_complaint = symptoms[0] if symptoms else "General symptoms"
+        {numbered}
         
-        # Determine severity based on keywords
-        severity = "mild"
-        if any(word in user_input_lower for word in ["severe", "worst", "excruciating", "unbearable"]):
-            severity = "severe"
-        elif any(word in user_input_lower for word in ["moderate", "moderately", "significant"]):
-            severity = "moderate"
+        For each message extract:
+        - chief_complaint: Primary complaint in 2-5 words
+        - symptoms: List of all symptoms mentioned with details
+        - onset: Duration or time since onset with specific timeframe
+        - severity: Mild, moderate, severe, or critical
+        - red_flags: List any potential red flag symptoms
+        - duration_hours: Estimated duration in hours
+        - triggers: Any identified triggers or aggravating factors
         
-        # Create patient context
-        patient_context = PatientContext(**context) if context else PatientContext()
+        Return ONLY a JSON array with one object per message, in the same order. Do not include any other text.
+        """
+        extracted = []
+        if self.model.available():
+            try:
+                # Cached only if every message came back valid; otherwise the valid ones are still used
+                extracted = self.model.generate_content(
+                    prompt, parse=_parse_batch,
+                    cacheable=lambda items: len(items) == len(group) and all(item is not None for item in items))
+            except Exception as e:
+                print(f"Gemini API error: {e}")
         
-        return SymptomPayload(
-            chief_complaint=chief_complaint,
-            symptoms=symptoms,
-            onset=None,
-            severity=severity,
-            red_flags=red_flags,
-            context=patient_context,
-            duration_hours=duration_hours
-        )
\ No newline at end of file
+        results = []
+        for i, (text, context) in enumerate(group):
+            data = extracted[i] if i < len(extracted) else None
+            if data is not None:
+                results.append(data.to_payload(context))
+            else:
+                results.append(self._fallback_extraction(text, context))
+        return results
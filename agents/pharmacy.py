@@ -1,20 +1,147 @@
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from core.models import PharmacyAvailability, Medication
+from core.inventory import InventoryIndex, InventorySnapshot, derive_drug_ids
+from core.geo import PharmacyRegistry, parse_location
+from core.stock import StoreStock, StockLedger
+from core.reloader import FileWatcher
+from core.resolver import MedicationResolver
+from core.alternatives import AlternativesGraph
+from core.rules import SafetyRules
 import os
-import random
-from geopy.distance import geodesic
+import threading
+import time
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
 
 class PharmacyAgent:
-    def __init__(self):
+    def __init__(self, watch_interval: float = 5.0, journal_path: str = None):
+        # Allergy rules shared with the safety review, hot-reloaded from data/rules
+        self.rules = SafetyRules()
         # Load inventory data
-        self.inventory_df = self._load_inventory()
-        self.pharmacy_locations = self._generate_pharmacy_locations()
+        self._reload_lock = threading.Lock()
+        self._snapshot = self._build_snapshot(version=1)
+        
+        # Stock and price deltas from pharmacy feeds, replayed from the journal after a crash
+        self.ledger = StockLedger(journal_path)
+        self.ledger.replay()
+        
+        # Reload in the background whenever one of the data files changes
+        self.watcher = None
+        if watch_interval:
+            self.watcher = FileWatcher(
+                [os.path.join(DATA_DIR, name) for name in
+                 ('inventory.csv', 'pharmacies.csv', 'store_stock.csv', 'drug_synonyms.csv', 'alternatives.csv')],
+                self.reload_inventory,
+                interval=watch_interval
+            )
+            self.watcher.start()
+    
+    @property
+    def snapshot(self) -> InventorySnapshot:
+        """Current inventory snapshot; grab it once per request"""
+        return self._snapshot
+    
+    @property
+    def inventory_df(self) -> pd.DataFrame:
+        return self._snapshot.inventory_df
+    
+    @property
+    def inventory_index(self) -> InventoryIndex:
+        return self._snapshot.inventory_index
+    
+    @property
+    def pharmacy_registry(self) -> PharmacyRegistry:
+        return self._snapshot.pharmacy_registry
     
-    def _load_inventory(self):
+    @property
+    def store_stock(self) -> StoreStock:
+        return self._snapshot.store_stock
+    
+    def _build_snapshot(self, version: int, strict: bool = False) -> InventorySnapshot:
+        """Load all data files into a new snapshot"""
+        inventory_df = self._load_inventory(strict)
+        if 'drug_id' not in inventory_df.columns:
+            inventory_df['drug_id'] = derive_drug_ids(inventory_df)
+        inventory_df['drug_id'] = inventory_df['drug_id'].astype(str)
+        pharmacy_registry = self._load_pharmacies(strict)
+        store_stock = self._load_store_stock(len(inventory_df), strict)
+        store_stock.attach(pharmacy_registry, inventory_df['drug_id'].tolist())
+        inventory_index = InventoryIndex(inventory_df)
+        synonyms = self._load_synonyms(strict)
+        alternatives = self._load_alternatives(inventory_index, strict)
+        # Ingredients we know of but may not stock, so they are not spelled onto one we do
+        known_names = set(self.rules.ontology.names) | set(alternatives.neighbours)
+        return InventorySnapshot(
+            version=version,
+            inventory_df=inventory_df,
+            inventory_index=inventory_index,
+            pharmacy_registry=pharmacy_registry,
+            store_stock=store_stock,
+            resolver=MedicationResolver(inventory_index, synonyms, known_names=known_names),
+            alternatives=alternatives,
+            loaded_at=time.time()
+        )
+    
+    def reload_inventory(self) -> InventorySnapshot:
+        """Rebuild the snapshot from disk and swap it in atomically.
+        
+        Readers are never blocked: they keep using the snapshot they already
+        hold, and the new one becomes visible with a single reference swap.
+        A file that fails to parse leaves the current snapshot in place.
+        Stock and price deltas are kept: a changed file does not mean the
+        feed has folded them in, so they are only dropped by compact_ledger().
+        """
+        with self._reload_lock:
+            snapshot = self._build_snapshot(self._snapshot.version + 1, strict=True)
+            self._snapshot = snapshot
+            return snapshot
+    
+    def compact_ledger(self, upto_seq: int) -> InventorySnapshot:
+        """Reload the data files and drop the deltas up to ``upto_seq``.
+        
+        Call this once the feed has rewritten store_stock.csv and
+        inventory.csv with every delta up to that sequence number.
+        """
+        with self._reload_lock:
+            snapshot = self._build_snapshot(self._snapshot.version + 1, strict=True)
+            self._snapshot = snapshot
+            self.ledger.truncate(upto_seq)
+            return snapshot
+    
+    def apply_stock_delta(self, sku: int, store_id: str, quantity: int) -> int:
+        """Set the units of an inventory SKU (row position in the current snapshot) held by a store"""
+        return self.ledger.set_quantity(self._drug_id(sku), store_id, quantity)
+    
+    def apply_price_delta(self, sku: int, price: float) -> int:
+        """Set the price of an inventory SKU (row position in the current snapshot)"""
+        return self.ledger.set_price(self._drug_id(sku), price)
+    
+    def apply_deltas(self, events: List[Dict[str, Any]]) -> int:
+        """Apply a batch of feed events in one go.
+        
+        Events look like {"type": "stock", "sku": 12, "store_id": "S0001", "quantity": 3}
+        or {"type": "price", "sku": 12, "price": 18}; "drug_id" may be given instead of "sku".
+        """
+        events = [dict(event, drug_id=self._drug_id(event.get("sku"), event.get("drug_id")))
+                  for event in events]
+        return self.ledger.apply(events)
+    
+    def _drug_id(self, sku: int = None, drug_id: str = None) -> str:
+        """Ledger key for a SKU or drug id, checked against the current snapshot"""
+        index = self._snapshot.inventory_index
+        if drug_id is not None:
+            if str(drug_id) not in index.by_drug_id:
+                raise ValueError(f"Unknown drug id {drug_id}")
+            return str(drug_id)
+        if sku is None or not 0 <= int(sku) < len(index):
+            raise ValueError(f"Unknown SKU {sku}")
+        return index.columns['drug_id'][int(sku)]
+    
+    def _load_inventory(self, strict: bool = False):
         """Load pharmacy inventory from CSV"""
         try:
-            inventory_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'inventory.csv')
+            inventory_path = os.path.join(DATA_DIR, 'inventory.csv')
             df = pd.read_csv(inventory_path)
             
             # Add additional information if not present
@@ -29,6 +156,8 @@ class PharmacyAgent:
             
             return df
         except:
+            if strict:
+                raise
             # Return default inventory if file not found
             return pd.DataFrame({
                 'name': ['paracetamol', 'ibuprofen', 'amoxicillin', 'aspirin', 
@@ -44,136 +173,243 @@ class PharmacyAgent:
                 'price': [15, 18, 45, 10, 12, 15, 28, 85]
             })
     
-    def _generate_pharmacy_locations(self):
-        """Generate simulated pharmacy locations"""
-        return [
-            {"name": "Apollo Pharmacy", "distance_km": 0.8, "rating": 4.5, "delivery": True},
-            {"name": "MedPlus", "distance_km": 1.2, "rating": 4.2, "delivery": True},
-            {"name": "Netmeds", "distance_km": 2.5, "rating": 4.3, "delivery": True},
-            {"name": "Local Medical Store", "distance_km": 0.3, "rating": 4.0, "delivery": False},
-            {"name": "Wellness Pharmacy", "distance_km": 1.8, "rating": 4.7, "delivery": True}
-        ]
+    def _load_pharmacies(self, strict: bool = False) -> PharmacyRegistry:
+        """Load the pharmacy store registry from CSV"""
+        try:
+            pharmacies_path = os.path.join(DATA_DIR, 'pharmacies.csv')
+            return PharmacyRegistry.from_csv(pharmacies_path)
+        except:
+            if strict:
+                raise
+            # Return default stores (central Delhi) if file not found
+            return PharmacyRegistry(pd.DataFrame({
+                'store_id': ['S0001', 'S0002', 'S0003', 'S0004', 'S0005'],
+                'name': ['Apollo Pharmacy', 'MedPlus', 'Netmeds', 'Local Medical Store', 'Wellness Pharmacy'],
+                'lat': [28.6200, 28.6050, 28.6350, 28.6150, 28.5990],
+                'lon': [77.2100, 77.2200, 77.1950, 77.2050, 77.2280],
+                'rating': [4.5, 4.2, 4.3, 4.0, 4.7],
+                'delivery': [True, True, True, False, True],
+                'hours': ['08:00-23:00', '08:00-22:00', '09:00-21:00', '09:00-21:00', '24x7']
+            }))
+    
+    def _load_synonyms(self, strict: bool = False) -> Dict[str, str]:
+        """Load brand and international drug-name synonyms from CSV"""
+        try:
+            return MedicationResolver.load_synonyms(os.path.join(DATA_DIR, 'drug_synonyms.csv'))
+        except:
+            if strict:
+                raise
+            return {}
+    
+    def _load_alternatives(self, inventory_index: InventoryIndex, strict: bool = False) -> AlternativesGraph:
+        """Load therapeutic alternatives and join them to the inventory"""
+        try:
+            return AlternativesGraph.from_csv(os.path.join(DATA_DIR, 'alternatives.csv'), inventory_index)
+        except:
+            if strict:
+                raise
+            return AlternativesGraph.empty(inventory_index)
+    
+    def _load_store_stock(self, n_skus: int, strict: bool = False) -> StoreStock:
+        """Load per-store stock levels, memory-mapping the compiled arrays when available"""
+        try:
+            return StoreStock.from_csv(
+                os.path.join(DATA_DIR, 'store_stock.csv'),
+                n_skus=n_skus,
+                cache_dir=os.path.join(DATA_DIR, '.cache', 'store_stock')
+            )
+        except:
+            if strict and os.path.exists(os.path.join(DATA_DIR, 'store_stock.csv')):
+                raise
+            return StoreStock.empty(n_skus)
     
     def check_availability(self, medications: List[Medication], 
                           allergies: List[str] = None, 
                           location: Dict[str, float] = None) -> PharmacyAvailability:
         """Check availability of medications and suggest alternatives considering allergies"""
-        availability = []
-        alternatives = []
+        return self.check_availability_batch(medications, allergies, location)
+    
+    def check_availability_batch(self, medications: List[Medication], 
+                                 allergies: List[str] = None, 
+                                 location: Dict[str, float] = None) -> PharmacyAvailability:
+        """Check a whole medication list against the inventory in one vectorized pass"""
+        # One snapshot for the whole request, even if a reload swaps in a new one meanwhile
+        snapshot = self.snapshot
+        # Read before the stock and prices, so a delta landing meanwhile reads as newer
+        ledger_seq = self.ledger.seq
+        allergies = self.rules.allergy_set(allergies)
         
-        for med in medications:
-            med_name = med.name.lower()
-            
-            # Check if medication is in inventory
-            matches = self.inventory_df[self.inventory_df['name'].str.lower() == med_name]
-            
-            if not matches.empty:
-                # Medication is available
-                for _, row in matches.iterrows():
-                    if allergies and self._check_allergy_contraindication(med_name, allergies):
-                        # Medication contraindicated due to allergy
-                        alternatives.append({
-                            "name": f"{row['name']} {row['strength']}",
-                            "reason": "Contraindicated due to allergy",
-                            "suggestion": "Consult doctor for alternative",
-                            "type": "contraindicated"
-                        })
-                    else:
-                        availability.append({
-                            "name": f"{row['name']} {row['strength']}",
-                            "generic_name": row['generic_name'],
-                            "strength": row['strength'],
-                            "form": row['form'],
-                            "in_stock": bool(row['in_stock']),
-                            "stock_level": row['stock_level'],
-                            "price": f"₹{row['price']}",
-                            "brand": row['brand'],
-                            "manufacturer": row['manufacturer']
-                        })
+        # Resolve every requested medication to inventory row positions
+        orders, positions, missing = [], [], []
+        # order -> (canonical name, how) for names that were not an exact inventory match
+        resolved: Dict[int, Tuple[str, str]] = {}
+        for order, med in enumerate(medications):
+            matches = snapshot.inventory_index.find(med.name)
+            if not matches:
+                # Free-text names like "Paracetamol 500mg" or "acetaminophen"
+                found = snapshot.resolver.match(med.name)
+                if found:
+                    matches = snapshot.inventory_index.lookup(found[0])
+                    if matches and found[1] != "exact":
+                        resolved[order] = found
+            if matches:
+                orders.extend([order] * len(matches))
+                positions.extend(matches)
+            else:
+                missing.append((order, med))
+        
+        # Gather all matched rows at once instead of filtering per medication
+        matched = snapshot.inventory_df.take(positions)
+        display_names = (matched['name'].astype(str) + ' ' + matched['strength'].astype(str)).tolist()
+        
+        # Allergy check once per distinct medication name, then broadcast as a mask
+        if allergies:
+            blocked_names = [name for name in matched['name'].unique()
+                             if self._check_allergy_contraindication(name, allergies)]
+            blocked = matched['name'].isin(blocked_names).tolist()
+        else:
+            blocked = [False] * len(matched)
+        
+        prices = matched['price'].tolist()
+        if self.ledger.has_prices:
+            prices = [self._price(drug_id, price) for drug_id, price in zip(matched['drug_id'].tolist(), prices)]
+        
+        columns = zip(
+            orders, display_names, blocked,
+            matched['generic_name'].tolist(), matched['strength'].tolist(),
+            matched['form'].tolist(), matched['in_stock'].astype(bool).tolist(),
+            matched['stock_level'].tolist(), prices,
+            matched['brand'].tolist(), matched['manufacturer'].tolist()
+        )
+        
+        availability = []
+        flagged = []
+        for (order, name, is_blocked, generic_name, strength, form,
+             in_stock, stock_level, price, brand, manufacturer) in columns:
+            if is_blocked:
+                # Medication contraindicated due to allergy
+                flagged.append((order, {
+                    "name": name,
+                    "reason": "Contraindicated due to allergy",
+                    "suggestion": "Consult doctor for alternative",
+                    "type": "contraindicated"
+                }))
             else:
-                # Medication not found, suggest alternatives
-                alt_suggestions = self._suggest_alternatives(med_name, allergies)
-                alternatives.append({
-                    "name": med.name,
-                    "reason": "Not available in inventory",
-                    "suggestions": alt_suggestions,
-                    "type": "unavailable"
-                })
+                item = {
+                    "name": name,
+                    "generic_name": generic_name,
+                    "strength": strength,
+                    "form": form,
+                    "in_stock": in_stock,
+                    "stock_level": stock_level,
+                    "price": f"₹{price}",
+                    "brand": brand,
+                    "manufacturer": manufacturer
+                }
+                if order in resolved:
+                    # Not the name that was asked for: say so, a spelling match may be a different drug
+                    item["requested"] = medications[order].name
+                    item["match"] = resolved[order][1]
+                availability.append(item)
+        
+        # Nearest stores holding each matched medication
+        point = parse_location(location)
+        lat, lon = point if point else (None, None)
+        skus_by_order: Dict[int, List[int]] = {}
+        for order, pos in zip(orders, positions):
+            skus_by_order.setdefault(order, []).append(pos)
+        store_availability = []
+        for order, skus in skus_by_order.items():
+            entry = {
+                "medication": medications[order].name,
+                "stores": snapshot.store_stock.nearest_stores(skus, lat, lon, ledger=self.ledger)
+            }
+            if order in resolved:
+                entry["matched_name"], entry["match"] = resolved[order]
+            store_availability.append(entry)
         
-        # Get nearby pharmacies
-        nearby_pharmacies = self._get_nearby_pharmacies(location)
+        # Medications not found, suggest alternatives
+        for order, med in missing:
+            flagged.append((order, {
+                "name": med.name,
+                "reason": "Not available in inventory",
+                "suggestions": self._suggest_alternatives(med.name, allergies, snapshot, location),
+                "type": "unavailable"
+            }))
         
-        # Get delivery options
-        delivery_options = self._get_delivery_options()
+        # Keep alternatives in the order the medications were requested
+        flagged.sort(key=lambda item: item[0])
+        alternatives = [entry for _, entry in flagged]
         
         return PharmacyAvailability(
             availability=availability,
             alternatives=alternatives,
-            nearby_pharmacies=nearby_pharmacies,
-            delivery_options=delivery_options
+            nearby_pharmacies=self._get_nearby_pharmacies(location, snapshot=snapshot),
+            delivery_options=self._get_delivery_options(),
+            store_availability=store_availability,
+            inventory_version=snapshot.version,
+            ledger_seq=ledger_seq
         )
     
+    def _price(self, drug_id: str, listed_price):
+        """Listed price unless a price delta has overridden it"""
+        price = self.ledger.price(drug_id)
+        return listed_price if price is None else price
+    
     def _check_allergy_contraindication(self, medication: str, allergies: List[str]) -> bool:
-        """Check if medication is contraindicated due to allergies"""
-        allergy_contraindications = {
-            "penicillin": ["amoxicillin", "augmentin", "ampicillin", "penicillin"],
-            "sulfa": ["sulfamethoxazole", "sulfasalazine", "sulfadiazine"],
-            "aspirin": ["aspirin", "ibuprofen", "naproxen", "diclofenac"]
-        }
+        """Check if medication is contraindicated due to allergies (shared safety rules)"""
+        return self.rules.check_allergy_contraindication(medication, allergies)
+    
+    def _suggest_alternatives(self, medication: str, allergies: List[str] = None,
+                              snapshot: InventorySnapshot = None,
+                              location: Dict[str, float] = None) -> List[Dict]:
+        """Suggest ranked, in-stock alternatives that are safe with the patient's allergies"""
+        snapshot = snapshot or self.snapshot
         
-        medication_lower = medication.lower()
-        allergies_lower = [a.lower() for a in allergies]
+        # Graph keys: the cleaned name, its canonical inventory name, then each word
+        cleaned = MedicationResolver.clean(medication)
+        keys = [cleaned, snapshot.resolver.resolve(medication)] + cleaned.split()
         
-        for allergy in allergies_lower:
-            if allergy in allergy_contraindications:
-                if any(med in medication_lower for med in allergy_contraindications[allergy]):
-                    return True
+        point = parse_location(location)
+        lat, lon = point if point else (None, None)
+        is_contraindicated = None
+        if allergies:
+            is_contraindicated = lambda name: self._check_allergy_contraindication(name, allergies)
         
-        return False
-    
-    def _suggest_alternatives(self, medication: str, allergies: List[str] = None) -> List[Dict]:
-        """Suggest alternative medications"""
         alternatives = []
-        
-        # Simple alternative suggestions based on medication type
-        alternative_map = {
-            "paracetamol": ["acetaminophen"],
-            "ibuprofen": ["naproxen", "diclofenac"],
-            "amoxicillin": ["azithromycin", "cephalexin"],
-            "cetirizine": ["loratadine", "fexofenadine"],
-            "omeprazole": ["pantoprazole", "lansoprazole"]
-        }
-        
-        for med_name, alt_list in alternative_map.items():
-            if med_name in medication.lower():
-                for alt in alt_list:
-                    # Check if alternative is in inventory and not contraindicated
-                    alt_matches = self.inventory_df[self.inventory_df['name'].str.lower() == alt]
-                    if not alt_matches.empty and not (allergies and self._check_allergy_contraindication(alt, allergies)):
-                        row = alt_matches.iloc[0]
-                        alternatives.append({
-                            "name": f"{row['name']} {row['strength']}",
-                            "brand": row['brand'],
-                            "price": f"₹{row['price']}",
-                            "in_stock": bool(row['in_stock']),
-                            "reason": f"Alternative to {medication}"
-                        })
+        for match in snapshot.alternatives.query(
+            [key for key in keys if key], is_contraindicated,
+            store_stock=snapshot.store_stock, lat=lat, lon=lon, ledger=self.ledger
+        ):
+            row = match["row"]
+            alternative = {
+                "name": f"{row['name']} {row['strength']}",
+                "brand": row['brand'],
+                "price": f"₹{self._price(row['drug_id'], row['price'])}",
+                "in_stock": bool(row['in_stock']),
+                "stock_level": row['stock_level'],
+                "relation": match["relation"].replace('_', ' '),
+                "reason": f"Alternative to {medication}"
+            }
+            if match["nearest_store"]:
+                alternative["nearest_store"] = match["nearest_store"]["name"]
+                alternative["distance_km"] = match["nearest_store"]["distance_km"]
+            alternatives.append(alternative)
         
         return alternatives
     
-    def _get_nearby_pharmacies(self, location: Dict[str, float] = None) -> List[Dict]:
-        """Get nearby pharmacies based on location"""
-        if not location:
-            return self.pharmacy_locations[:3]  # Return first 3 if no location
-        
-        # Simulate distance calculation based on location
-        # In a real implementation, you would use actual distance calculation
-        nearby_pharmacies = sorted(
-            self.pharmacy_locations,
-            key=lambda x: x['distance_km']
-        )[:3]
+    def _get_nearby_pharmacies(self, location: Dict[str, float] = None, k: int = 3,
+                               snapshot: InventorySnapshot = None) -> List[Dict]:
+        """Get the k nearest pharmacies to the patient's location"""
+        registry = (snapshot or self.snapshot).pharmacy_registry
+        point = parse_location(location)
+        if point is None:
+            # No usable location: show the best rated stores without distances
+            top = registry.stores['rating'].nlargest(k).index
+            return [registry.record(pos) for pos in top]
         
-        return nearby_pharmacies
+        return [registry.record(pos, distance)
+                for pos, distance in registry.nearest(point[0], point[1], k)]
     
     def _get_delivery_options(self) -> List[Dict]:
         """Get delivery options"""
@@ -10,7 +10,6 @@ sys.path.append(str(parent_dir))
 import streamlit as st
 from core.orchestrator import Orchestrator
 import json
-import time
 from datetime import datetime
 
 
@@ -321,28 +320,44 @@ if submitted:
         progress_bar = st.progress(0)
         status_text = st.empty()
         
+        live_preview = st.empty()
+        
         status_text.markdown("🔍 **Patient Symptom Agent**: Analyzing your symptoms...")
-        progress_bar.progress(25)
-        time.sleep(0.5)
+        progress_bar.progress(10)
+        
+        # Agent events -> (progress, status shown while the next stage runs)
+        stage_status = {
+            "symptoms": (25, "👨‍⚕️ **Doctor Agent**: Creating preliminary assessment..."),
+            "medications": (60, "💊 **Pharmacy Agent**: Checking medication availability..."),
+            "pharmacy": (85, "🛡️ **Safety Guardian**: Verifying recommendations..."),
+            "safety_review": (100, "✅ **Done**")
+        }
+        streamed = {}
+        
+        def show_progress(name, value):
+            """Update the status and preview as each result streams in"""
+            streamed[name] = value
+            if name in stage_status:
+                percent, message = stage_status[name]
+                progress_bar.progress(percent)
+                status_text.markdown(message)
+            with live_preview.container():
+                escalation = streamed.get("escalation")
+                if isinstance(escalation, dict) and escalation.get("needed"):
+                    st.error(f"🚨 **Immediate Medical Attention Recommended** — {escalation.get('reason') or ''}")
+                differential = streamed.get("differential")
+                if isinstance(differential, list) and differential:
+                    st.markdown("**Likely conditions so far:** " + ", ".join(
+                        str(item.get("condition", item)) if isinstance(item, dict) else str(item)
+                        for item in differential))
         
         try:
-            # Process through orchestrator
-            result = orchestrator.process_request(symptoms, context)
-            
-            status_text.markdown("👨‍⚕️ **Doctor Agent**: Creating preliminary assessment...")
-            progress_bar.progress(50)
-            time.sleep(0.7)
-            
-            status_text.markdown("💊 **Pharmacy Agent**: Checking medication availability...")
-            progress_bar.progress(75)
-            time.sleep(0.5)
-            
-            status_text.markdown("🛡️ **Safety Guardian**: Verifying recommendations...")
-            progress_bar.progress(100)
-            time.sleep(0.3)
+            # Process through orchestrator, showing plan fields as Gemini writes them
+            result = orchestrator.process_request_streaming(symptoms, context, on_event=show_progress)
             
             status_text.empty()
             progress_bar.empty()
+            live_preview.empty()
             
             # Display risk level badge
             risk_level = result.get("risk_level", "unknown")
@@ -367,6 +382,8 @@ if submitted:
                     st.error("🚨 **Immediate Medical Attention Recommended**")
                     st.write(f"**Reason:** {result['preliminary_assessment']['escalation']['reason']}")
                     st.write(f"**Urgency:** {result['preliminary_assessment']['escalation'].get('urgency', 'immediate').title()}")
+                    if result.get("sources", {}).get("plan") == "triage":
+                        st.caption("Flagged from your description before the full assessment, so help is not delayed.")
                     st.button("📍 Find Emergency Care Nearby", type="primary", icon="🚑")
                     st.markdown('</div>', unsafe_allow_html=True)
                 else:
@@ -519,12 +536,28 @@ if submitted:
                 if result["pharmacy_availability"].get("nearby_pharmacies"):
                     st.markdown("#### 🏥 Nearby Pharmacies")
                     for pharmacy in result["pharmacy_availability"]["nearby_pharmacies"]:
+                        distance = f"Distance: {pharmacy['distance_km']} km • " if pharmacy.get('distance_km') is not None else ""
                         st.markdown(f"""
                         **{pharmacy['name']}**  
-                        Distance: {pharmacy['distance_km']} km • Rating: {pharmacy['rating']}/5  
+                        {distance}Rating: {pharmacy['rating']}/5  
                         Delivery: {'✅ Available' if pharmacy['delivery'] else '❌ Not Available'}
                         """)
                 
+                # Stores that hold each recommended medication
+                if result["pharmacy_availability"].get("store_availability"):
+                    st.markdown("#### 📦 In Stock Near You")
+                    for entry in result["pharmacy_availability"]["store_availability"]:
+                        if not entry["stores"]:
+                            continue
+                        label = entry['medication'].title()
+                        if entry.get("match") == "fuzzy":
+                            # A spelling match may be a different drug; show what was matched
+                            label += f" (matched as {entry['matched_name'].title()}, check spelling)"
+                        with st.expander(f"{label} - {len(entry['stores'])} stores"):
+                            for store in entry["stores"]:
+                                distance = f" • {store['distance_km']} km" if store.get('distance_km') is not None else ""
+                                st.markdown(f"- **{store['name']}** ({store.get('city', '')}){distance} • {store['quantity']} units")
+                
                 # Delivery options
                 if result["pharmacy_availability"].get("delivery_options"):
                     st.markdown("#### 🚚 Delivery Options")
@@ -674,6 +707,24 @@ with st.sidebar:
     - Sudden weakness or numbness
     """)
     
+    health = orchestrator.health()
+    breakers = health["llm_breakers"]
+    if breakers:
+        st.markdown("## 🩺 AI Service Health")
+        for name, stats in breakers.items():
+            line = f"**{name}**: {stats['state'].replace('_', '-')} · {stats['window_failure_rate']:.0%} failures in window"
+            if stats["state"] == "open":
+                st.warning(f"{line} · retry in {stats['retry_in_s']:.0f}s")
+            else:
+                st.caption(line)
+        cache = health["llm_cache"]
+        if cache and cache["hits"] + cache["misses"]:
+            st.caption(f"Response cache: {cache['hit_rate']:.0%} hit rate · "
+                       f"{cache['bytes_saved'] / 1024:.1f} KB served from cache")
+        plans = health["plan_cache"]
+        if plans and plans["hits"] + plans["misses"]:
+            st.caption(f"Plan cache: {plans['hit_rate']:.0%} hit rate · {plans['entries']} cases")
+    
     st.markdown("## 📞 Emergency Contacts")
     st.error("""
     **National Emergency Number**: 112\n
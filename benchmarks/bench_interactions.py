@@ -0,0 +1,82 @@
+"""Scanning a list of interaction pairs vs. the integer-coded InteractionDB.
+
+The old check looped over every known pair and tested list membership,
+which is how SafetyGuardian._check_drug_interactions worked with its six
+hardcoded pairs. Here both sides hold the shipped interactions plus
+synthetic pairs padding the database out to 100k+. The scan grows with
+the database; the indexed check grows with the k drugs in the regimen.
+Class-level pairs ("ssri", "nsaid") only match through the ontology, so the
+scan finds fewer interactions than the indexed check.
+
+Run from the repository root:
+    python benchmarks/bench_interactions.py [n_pairs]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.interactions import DATA_DIR, SEVERITIES, InteractionDB
+from core.ontology import DrugOntology
+
+REGIMEN = ["warfarin", "Ibuprofen 400mg", "sertraline", "omeprazole", "metformin", "atorvastatin",
+           "amlodipine", "lithium", "fluconazole", "paracetamol", "furosemide", "clopidogrel",
+           "diazepam", "tramadol", "levothyroxine", "losartan"]
+
+
+def synthetic_pairs(n_pairs: int, rng: random.Random) -> pd.DataFrame:
+    shipped = pd.read_csv(Path(DATA_DIR) / 'interactions.csv', dtype=str)
+    n_drugs = int((2 * n_pairs) ** 0.5) + 10
+    pairs = set()
+    while len(pairs) < n_pairs - len(shipped):
+        a, b = rng.sample(range(n_drugs), 2)
+        pairs.add((min(a, b), max(a, b)))
+    synthetic = pd.DataFrame({'drug_a': [f"drug{a}" for a, _ in pairs], 'drug_b': [f"drug{b}" for _, b in pairs],
+                              'severity': [rng.choice(SEVERITIES) for _ in pairs],
+                              'mechanism': [f"mechanism {rng.randrange(500)}" for _ in pairs]})
+    return pd.concat([shipped, synthetic], ignore_index=True)
+
+
+def old_check(pairs, medications):
+    all_meds = [med.lower() for med in medications]
+    issues = []
+    for med1, med2 in pairs:
+        if med1 in all_meds and med2 in all_meds:
+            issues.append(f"Potential interaction between {med1} and {med2}")
+    return issues
+
+
+def per_call_us(fn, budget_s=0.3):
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < budget_s:
+        fn()
+        calls += 1
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    n_pairs = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    frame = synthetic_pairs(n_pairs, random.Random(7))
+    ontology = DrugOntology.from_csv()
+
+    start = time.perf_counter()
+    db = InteractionDB(frame, ontology)
+    load_s = time.perf_counter() - start
+    pairs = list(zip(frame['drug_a'], frame['drug_b']))
+    print(f"{len(db)} pairs over {len(db.names)} drugs and classes, built in {load_s * 1000:.0f} ms\n")
+
+    print(f"{'k':>4} {'scan (us)':>11} {'indexed (us)':>13} {'speedup':>8} {'found':>6}")
+    for k in [2, 4, 8, 16]:
+        regimen = REGIMEN[:k]
+        scan_us = per_call_us(lambda: old_check(pairs, regimen))
+        indexed_us = per_call_us(lambda: db.check(regimen))
+        print(f"{k:>4} {scan_us:>11.1f} {indexed_us:>13.1f} {scan_us / indexed_us:>7.0f}x {len(db.check(regimen)):>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Per-request inventory lookup latency: column scan vs. InventoryIndex.
+
+Run from the repository root:
+    python benchmarks/bench_inventory_lookup.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+import pandas as pd
+from core.inventory import InventoryIndex
+
+SIZES = [500, 50_000, 1_000_000]
+REQUEST = ["paracetamol", "dextromethorphan", "cetirizine"]
+REPEATS = 20
+
+
+def make_inventory(rows: int) -> pd.DataFrame:
+    """Synthesize an inventory with the same columns as data/inventory.csv"""
+    base = pd.read_csv(Path(__file__).parent.parent / 'data' / 'inventory.csv')
+    rng = np.random.default_rng(0)
+    df = base.sample(n=rows, replace=True, random_state=0).reset_index(drop=True)
+    # Spread rows over many distinct names so large inventories are not just 29 keys
+    suffix = rng.integers(0, max(rows // 20, 1), size=rows).astype(str)
+    keep = rng.random(rows) < 0.05
+    df['name'] = np.where(keep, df['name'], df['name'] + '-' + suffix)
+    return df
+
+
+def scan_request(df: pd.DataFrame):
+    """Previous lookup path: lowercase and scan the whole column per medication"""
+    out = []
+    for med in REQUEST:
+        matches = df[df['name'].str.lower() == med]
+        for _, row in matches.iterrows():
+            out.append(row['price'])
+    return out
+
+
+def index_request(index: InventoryIndex):
+    """Indexed lookup path (exact-name probe, same matches as the scan)"""
+    out = []
+    for med in REQUEST:
+        for row in index.rows(index.lookup(med)):
+            out.append(row['price'])
+    return out
+
+
+def timed(fn, *args, repeats=REPEATS):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn(*args)
+    return (time.perf_counter() - start) / repeats, result
+
+
+def main():
+    print(f"{'rows':>10} {'build (ms)':>12} {'scan (ms)':>12} {'index (ms)':>12} {'speedup':>9}")
+    for size in SIZES:
+        df = make_inventory(size)
+
+        start = time.perf_counter()
+        index = InventoryIndex(df)
+        build = time.perf_counter() - start
+
+        scan_s, scan_out = timed(scan_request, df, repeats=3 if size > 100_000 else REPEATS)
+        index_s, index_out = timed(index_request, index)
+        assert sorted(scan_out) == sorted(index_out)
+
+        print(f"{size:>10} {build * 1e3:>12.1f} {scan_s * 1e3:>12.3f} "
+              f"{index_s * 1e3:>12.3f} {scan_s / index_s:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
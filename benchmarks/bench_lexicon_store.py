@@ -0,0 +1,120 @@
+"""Data-file LexiconStore: compile time, mmap load time, private memory and match latency.
+
+Synthesizes lexicons of 5k-200k terms and compiles them to .npy arrays in a
+temporary directory. Opening them memory-mapped is compared against loading
+them into memory, each in a fresh interpreter so the private-memory delta is
+not hidden by allocator reuse. The trie-regex SymptomMatcher is timed on the
+smallest size only; its construction is quadratic in the number of terms.
+
+Run from the repository root:
+    python benchmarks/bench_lexicon_store.py
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.lexicon import LexiconStore, SymptomMatcher
+
+SIZES = [5_000, 50_000, 200_000]
+REGEX_MAX_TERMS = 5_000
+SYLLABLES = ["ba", "dar", "khu", "sir", "pet", "ti", "ma", "jal", "lo", "nak", "ra", "shi", "gu", "ven", "tor"]
+MESSAGE = "mujhe 3 din se tez bukhar hai aur sir dard bhi, raat ko khansi aati hai aur kamzori lagti hai. "
+
+LOAD_SCRIPT = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from benchmarks.bench_lexicon_store import anon_kb, MESSAGE
+from core.lexicon import LexiconStore
+before = anon_kb()
+start = time.perf_counter()
+store = LexiconStore.load(sys.argv[2], mmap=sys.argv[3] == 'mmap')
+store.match(MESSAGE)
+print((time.perf_counter() - start) * 1e3, anon_kb() - before)
+"""
+
+
+def anon_kb() -> int:
+    """Private (anonymous) resident memory of this process on Linux, 0 elsewhere.
+
+    Mapped file pages are left out: they live in the page cache and are
+    shared by every process that maps the same compiled lexicon.
+    """
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Anonymous:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def load_in_subprocess(cache: str, mode: str):
+    """(load + first match ms, private memory delta KB) measured in a fresh interpreter"""
+    root = str(Path(__file__).parent.parent)
+    out = subprocess.run([sys.executable, '-c', LOAD_SCRIPT, root, cache, mode],
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), int(out[1])
+
+
+def write_lexicon(path: str, n_terms: int, seed: int = 7):
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("term\tkind\tlabel\n")
+        for i in range(n_terms):
+            words = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                     for _ in range(rng.randint(1, 3))]
+            f.write(f"{' '.join(words)}\tsymptom\tlabel{i % 500}\n")
+        f.write("bukhar\tsymptom\tfever\nsir dard\tsymptom\theadache\nkhansi\tsymptom\tcough\n")
+
+
+def per_call_us(fn, text, budget_s=0.3):
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < budget_s:
+        fn(text)
+        calls += 1
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    print(f"{'terms':>8} {'compile (ms)':>13} {'disk (KB)':>10} {'mmap load (ms)':>15} "
+          f"{'mmap anon (KB)':>14} {'heap anon (KB)':>14} {'match (us)':>11} {'regex (us)':>11}")
+    for n_terms in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            tsv = os.path.join(tmp, 'terms.tsv')
+            cache = os.path.join(tmp, 'cache')
+            write_lexicon(tsv, n_terms)
+
+            start = time.perf_counter()
+            store = LexiconStore.compile([tsv], cache)
+            compile_ms = (time.perf_counter() - start) * 1e3
+            cache = LexiconStore.compiled_dir([tsv], cache)
+            disk_kb = sum(os.path.getsize(os.path.join(cache, name)) for name in os.listdir(cache)) // 1024
+
+            found = store.match(MESSAGE)
+            assert ('symptom', 'fever') in found and ('symptom', 'headache') in found
+            load_ms, mmap_anon = load_in_subprocess(cache, 'mmap')
+            _, heap_anon = load_in_subprocess(cache, 'heap')
+
+            match_us = per_call_us(store.match, MESSAGE)
+            regex_us = float('nan')
+            if n_terms <= REGEX_MAX_TERMS:
+                with open(tsv, encoding='utf-8') as f:
+                    next(f)
+                    terms = [line.split('\t')[0] for line in f]
+                matcher = SymptomMatcher({"any": terms}, [], {})
+                regex_us = per_call_us(matcher.match, MESSAGE)
+
+        print(f"{n_terms:>8} {compile_ms:>13.1f} {disk_kb:>10} {load_ms:>15.2f} "
+              f"{mmap_anon:>14} {heap_anon:>14} {match_us:>11.1f} {regex_us:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
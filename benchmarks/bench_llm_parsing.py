@@ -0,0 +1,119 @@
+"""Parsing Gemini output into models: eval / json.loads + constructors vs. compiled pydantic schemas.
+
+The old paths are reproduced here as they were before core/schemas.py:
+the JSON was cut out with a greedy regex, extraction text went through
+eval() (which also fails on JSON's true/false/null) and plan medications
+through Medication(**med). Each path parses the same extraction and plan texts;
+"malformed" is a plan whose medication carries an extra key, which crashes
+the constructor and is ignored by the schema. The old plan path checks no
+types at all, so on well-formed plans it mostly measures json.loads; the
+schema path also type-checks every field.
+
+Run from the repository root:
+    python benchmarks/bench_llm_parsing.py [n_medications]
+"""
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.models import DoctorPlan, Medication, PatientContext, SymptomPayload
+from core.schemas import PlanSchema, SymptomExtraction, parse_llm_json
+
+EXTRACTION = {"chief_complaint": "fever and sore throat", "symptoms": ["fever", "sore throat", "cough", "fatigue"],
+              "onset": "2 days ago", "severity": "moderate", "red_flags": [], "duration_hours": 48,
+              "triggers": ["cold weather"]}
+MEDICATION = {"name": "paracetamol", "dose": "500 mg", "route": "oral", "frequency": "every 6 hours",
+              "max_daily": "3000 mg", "duration": "3-5 days", "precautions": ["Avoid alcohol"],
+              "interactions": ["Warfarin"]}
+
+
+def plan_json(n_medications: int, extra_key: bool = False) -> str:
+    meds = [dict(MEDICATION, name=f"medication {i}") for i in range(n_medications)]
+    if extra_key:
+        meds[-1]["brand"] = "Crocin"
+    return "```json\n" + json.dumps({
+        "differential": [{"condition": f"condition {i}", "likelihood": 0.3, "explanation": "reasoning"}
+                         for i in range(4)],
+        "tests_suggested": [{"test": "CBC", "reason": "infection markers"}],
+        "self_care": [{"recommendation": "Hydration", "details": "Drink fluids"}] * 3,
+        "medications": meds,
+        "escalation": {"needed": False, "reason": None, "urgency": "within_days"},
+        "follow_up_advice": [{"advice": "Monitor symptoms", "timing": "daily"}],
+        "warning_signs": ["Difficulty breathing", "High fever"],
+        "disclaimer": "Not a diagnosis."
+    }, indent=2) + "\n```"
+
+
+def old_extract_json(text: str) -> str:
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    return match.group(0) if match else text
+
+
+def old_extraction(text: str) -> SymptomPayload:
+    data = eval(old_extract_json(text))
+    return SymptomPayload(chief_complaint=data.get("chief_complaint", ""), symptoms=data.get("symptoms", []),
+                          onset=data.get("onset"), severity=data.get("severity"),
+                          red_flags=data.get("red_flags", []), context=PatientContext(),
+                          duration_hours=data.get("duration_hours"), triggers=data.get("triggers", []),
+                          source="llm")
+
+
+def old_plan(text: str) -> DoctorPlan:
+    data = json.loads(old_extract_json(text))
+    return DoctorPlan(differential=data.get("differential", []), tests_suggested=data.get("tests_suggested", []),
+                      self_care=data.get("self_care", []),
+                      medications=[Medication(**med) for med in data.get("medications", [])],
+                      escalation=data.get("escalation"), disclaimer=data.get("disclaimer", ""),
+                      follow_up_advice=data.get("follow_up_advice", []),
+                      warning_signs=data.get("warning_signs", []), source="llm")
+
+
+def schema_extraction(text: str) -> SymptomPayload:
+    return parse_llm_json(SymptomExtraction, text).to_payload()
+
+
+def schema_plan(text: str) -> DoctorPlan:
+    return parse_llm_json(PlanSchema, text).to_plan()
+
+
+def per_call_us(fn, text, budget_s=0.5):
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < budget_s:
+        fn(text)
+        calls += 1
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def survives(fn, text) -> str:
+    try:
+        fn(text)
+        return "ok"
+    except Exception as e:
+        return type(e).__name__
+
+
+def main():
+    n_medications = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    extraction = "Here is the extraction:\n" + json.dumps(EXTRACTION)
+    plan = plan_json(n_medications)
+    malformed = plan_json(n_medications, extra_key=True)
+
+    print(f"plan with {n_medications} medications, {len(plan)} bytes\n")
+    print(f"{'input':>12} {'old (us)':>10} {'schema (us)':>12} {'speedup':>8} {'old':>10} {'schema':>8}")
+    for label, text, old, new in [("extraction", extraction, old_extraction, schema_extraction),
+                                  ("plan", plan, old_plan, schema_plan),
+                                  ("malformed", malformed, old_plan, schema_plan)]:
+        old_result, new_result = survives(old, text), survives(new, text)
+        old_us = per_call_us(old, text) if old_result == "ok" else float('nan')
+        new_us = per_call_us(new, text)
+        print(f"{label:>12} {old_us:>10.1f} {new_us:>12.1f} {old_us / new_us:>7.2f}x "
+              f"{old_result:>10} {new_result:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Nearest-pharmacy query latency for the grid-indexed PharmacyRegistry.
+
+Run from the repository root:
+    python benchmarks/bench_nearest_pharmacy.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+import pandas as pd
+from core.geo import PharmacyRegistry, haversine_km
+
+SIZES = [5_000, 50_000, 500_000]
+QUERIES = 2_000
+CITIES = np.array([
+    (28.6139, 77.2090), (19.0760, 72.8777), (12.9716, 77.5946), (17.3850, 78.4867),
+    (13.0827, 80.2707), (22.5726, 88.3639), (18.5204, 73.8567), (26.9124, 75.7873),
+])
+
+
+def make_stores(n: int, rng) -> pd.DataFrame:
+    """Stores clustered around large Indian cities plus a rural scatter"""
+    city = CITIES[rng.integers(0, len(CITIES), size=n)]
+    urban = rng.random(n) < 0.9
+    lat = np.where(urban, city[:, 0] + rng.normal(0, 0.15, n), rng.uniform(8, 32, n))
+    lon = np.where(urban, city[:, 1] + rng.normal(0, 0.15, n), rng.uniform(70, 90, n))
+    return pd.DataFrame({
+        'store_id': np.arange(n), 'name': 'Store', 'lat': lat, 'lon': lon,
+        'rating': rng.uniform(3.5, 5.0, n).round(1), 'delivery': rng.random(n) < 0.7,
+        'hours': '09:00-21:00',
+    })
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'stores':>8} {'build (ms)':>11} {'knn k=3 (us)':>13} {'radius 2km (us)':>16} {'brute knn (us)':>15}")
+    for n in SIZES:
+        stores = make_stores(n, rng)
+        start = time.perf_counter()
+        registry = PharmacyRegistry(stores)
+        build = time.perf_counter() - start
+
+        pick = rng.integers(0, len(CITIES), size=QUERIES)
+        qlat = CITIES[pick, 0] + rng.normal(0, 0.1, QUERIES)
+        qlon = CITIES[pick, 1] + rng.normal(0, 0.1, QUERIES)
+
+        start = time.perf_counter()
+        knn = [registry.nearest(la, lo, 3) for la, lo in zip(qlat, qlon)]
+        knn_s = (time.perf_counter() - start) / QUERIES
+
+        start = time.perf_counter()
+        for la, lo in zip(qlat, qlon):
+            registry.within_radius(la, lo, 2.0)
+        radius_s = (time.perf_counter() - start) / QUERIES
+
+        # Brute force over every store, also used to check the index answers
+        sample = min(QUERIES, 200)
+        start = time.perf_counter()
+        for i in range(sample):
+            dist = haversine_km(qlat[i], qlon[i], registry.lats, registry.lons)
+            top = np.argsort(dist)[:3]
+            assert np.allclose(dist[top], [d for _, d in knn[i]])
+        brute_s = (time.perf_counter() - start) / sample
+
+        print(f"{n:>8} {build * 1e3:>11.1f} {knn_s * 1e6:>13.1f} {radius_s * 1e6:>16.1f} {brute_s * 1e6:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Serial Orchestrator.process_request vs. the async stage pipeline.
+
+Gemini is replaced by a model object that sleeps for a fixed latency and
+returns canned JSON, so the numbers show how much of the LLM wait the
+pipeline overlaps and how many sessions one process can keep in flight.
+Every session sends a distinct message and gets a distinct extraction, and
+the plan and response caches are off, so coalescing and caching do not kick in.
+
+Run from the repository root:
+    python benchmarks/bench_orchestrator_async.py [llm_latency_ms]
+"""
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+# Measure the pipeline, not the on-disk response cache
+os.environ["LLM_CACHE"] = "off"
+
+from core.orchestrator import Orchestrator
+
+CONTEXT = {"age": 34, "allergies": ["penicillin"], "location": {"lat": 19.07, "lon": 72.87}}
+MESSAGE = "I've had fever and sore throat for 2 days, coughing at night"
+EXTRACTION = {"chief_complaint": "fever", "symptoms": ["fever", "sore throat", "cough"],
+              "severity": "moderate", "red_flags": [], "duration_hours": 48}
+PLAN = {"differential": [{"condition": "viral pharyngitis", "likelihood": 0.6}],
+        "medications": [{"name": "paracetamol", "dose": "500 mg", "route": "oral",
+                         "frequency": "every 6 hours", "max_daily": "3000 mg"},
+                        {"name": "dextromethorphan", "dose": "15 mg", "route": "oral",
+                         "frequency": "every 8 hours", "max_daily": "60 mg"}],
+        "escalation": {"needed": False}}
+SESSIONS = [1, 8, 32]
+
+
+class SlowModel:
+    """Stands in for GeminiClient with a fixed response latency"""
+
+    def __init__(self, payload, latency_s, unique_field=None):
+        self.payload = payload
+        self.latency_s = latency_s
+        self.unique_field = unique_field
+        self.counter = itertools.count()
+
+    def available(self):
+        return True
+
+    def generate_content(self, prompt, parse=None, cacheable=None):
+        time.sleep(self.latency_s)
+        payload = dict(self.payload)
+        if self.unique_field:
+            payload[self.unique_field] = f"{payload[self.unique_field]} {next(self.counter)}"
+        text = json.dumps(payload)
+        return parse(text) if parse else type("Response", (), {"text": text})()
+
+
+def main():
+    latency_s = (float(sys.argv[1]) if len(sys.argv) > 1 else 200) / 1000
+    orchestrator = Orchestrator(max_workers=64, plan_cache_size=0)
+    orchestrator.psa.model, orchestrator.psa.gemini_available = \
+        SlowModel(EXTRACTION, latency_s, unique_field="chief_complaint"), True
+    orchestrator.da.model, orchestrator.da.gemini_available = SlowModel(PLAN, latency_s), True
+
+    async def run_async(n):
+        await asyncio.gather(*(orchestrator.process_request_async(f"{MESSAGE} (patient {i})", CONTEXT)
+                               for i in range(n)))
+
+    print(f"simulated LLM latency {latency_s * 1000:.0f} ms per call, 2 calls per request\n")
+    print(f"{'sessions':>9} {'serial (s)':>11} {'async (s)':>10} {'async req/s':>12} {'speedup':>8}")
+    for n in SESSIONS:
+        start = time.perf_counter()
+        for i in range(n):
+            orchestrator.process_request(f"{MESSAGE} (patient {i})", CONTEXT)
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asyncio.run(run_async(n))
+        concurrent = time.perf_counter() - start
+        print(f"{n:>9} {serial:>11.2f} {concurrent:>10.2f} {n / concurrent:>12.1f} {serial / concurrent:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
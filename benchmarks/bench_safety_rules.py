@@ -0,0 +1,180 @@
+"""Per-call list literals and nested substring scans vs. the compiled SafetyRules index.
+
+The old checks are reproduced here as they were before the rule tables were
+compiled. Each row runs all four checks once for a case with n symptoms,
+n medications and n allergies, the way SafetyGuardian.review_plan calls them.
+The old cost grows with n times the size of each rule table; the compiled
+checks grow with n alone. A second table pads allergies.json with
+synthetic allergy rules to show that an allergy check does not grow with
+the number of rules.
+
+Run from the repository root:
+    python benchmarks/bench_safety_rules.py
+"""
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.models import DoctorPlan, Medication
+from core.rules import RULES_DIR, RuleBook, SafetyRules
+
+SIZES = [1, 4, 16, 64]
+MEDICATIONS = ["paracetamol", "amoxicillin", "ibuprofen", "cetirizine", "sulfasalazine", "omeprazole",
+               "metformin", "dextromethorphan", "loratadine", "azithromycin"]
+ALLERGIES = ["Penicillin", "Sulfa", "Aspirin", "NSAID", "latex", "peanuts", "eggs", "dust"]
+SYMPTOMS = ["mild cough", "runny nose", "sore throat for two days", "tiredness in the evening",
+            "slight headache", "body ache", "sneezing", "low appetite"]
+
+
+def old_check_red_flags(symptoms, red_flags):
+    critical_red_flags = [
+        "chest pain", "severe shortness of breath", "unilateral weakness",
+        "confusion", "blood in vomit", "blood in stool", "difficulty breathing",
+        "neck stiffness", "severe headache", "fainting", "loss of consciousness",
+        "severe abdominal pain", "high fever", "rapid heart rate",
+        "sudden vision changes", "difficulty speaking"
+    ]
+    all_symptoms = symptoms + red_flags
+    for flag in critical_red_flags:
+        if any(flag in symptom.lower() for symptom in all_symptoms):
+            return True
+    return False
+
+
+def old_check_medication_safety(medication, context):
+    issues = []
+    if medication.name.lower() in ["paracetamol", "acetaminophen"]:
+        if context.get("age") and context["age"] < 18:
+            if not medication.max_daily:
+                issues.append("Pediatric paracetamol dosing requires careful weight-based calculation")
+        elif medication.max_daily:
+            try:
+                daily_max = int(''.join(filter(str.isdigit, medication.max_daily)))
+                if daily_max > 4000:
+                    issues.append(f"Paracetamol daily maximum {daily_max}mg exceeds safe limits")
+                elif daily_max > 3000:
+                    issues.append(f"Paracetamol daily maximum {daily_max}mg should be used with caution")
+            except ValueError:
+                issues.append("Could not parse paracetamol dosage information")
+    if context.get("allergies"):
+        allergies = [allergy.lower() for allergy in context["allergies"]]
+        med_name = medication.name.lower()
+        if "penicillin" in allergies and med_name in ["amoxicillin", "augmentin", "ampicillin"]:
+            issues.append(f"Medication {medication.name} contraindicated due to penicillin allergy")
+        if "sulfa" in allergies and any(sulfa in med_name for sulfa in ["sulfa", "sulfamethoxazole", "sulfasalazine"]):
+            issues.append(f"Medication {medication.name} contraindicated due to sulfa allergy")
+    if context.get("pregnant") and medication.name.lower() in ["ibuprofen", "naproxen", "diclofenac", "warfarin", "statins"]:
+        issues.append(f"Medication {medication.name} should be avoided in pregnancy")
+    if context.get("renal_issues") and medication.name.lower() in ["ibuprofen", "naproxen", "diclofenac"]:
+        issues.append(f"Medication {medication.name} should be used with caution in renal impairment")
+    return issues
+
+
+def old_check_pregnancy_contraindications(plan, context):
+    issues = []
+    if context.get("pregnant"):
+        contraindicated_meds = ["ibuprofen", "naproxen", "diclofenac", "warfarin", "statins",
+                                "ace inhibitors", "arb", "retinoids", "methotrexate"]
+        for med in plan.medications:
+            if any(contraindicated in med.name.lower() for contraindicated in contraindicated_meds):
+                issues.append(f"Medication {med.name} may not be safe during pregnancy")
+    return issues
+
+
+def old_check_allergy_contraindication(medication, allergies):
+    allergy_contraindications = {
+        "penicillin": ["amoxicillin", "augmentin", "ampicillin", "penicillin"],
+        "sulfa": ["sulfamethoxazole", "sulfasalazine", "sulfadiazine", "sulfa"],
+        "aspirin": ["aspirin", "ibuprofen", "naproxen", "diclofenac", "nsaid"],
+        "nsaid": ["ibuprofen", "naproxen", "diclofenac", "aspirin", "nsaid"]
+    }
+    medication_lower = medication.lower()
+    allergies_lower = [a.lower() for a in allergies]
+    for allergy in allergies_lower:
+        if allergy in allergy_contraindications:
+            if any(med in medication_lower for med in allergy_contraindications[allergy]):
+                return True
+    return False
+
+
+def review_old(case):
+    symptoms, red_flags, plan, context = case
+    old_check_red_flags(symptoms, red_flags)
+    for medication in plan.medications:
+        old_check_medication_safety(medication, context)
+    old_check_pregnancy_contraindications(plan, context)
+    for medication in plan.medications:
+        old_check_allergy_contraindication(medication.name, context["allergies"])
+
+
+def review_compiled(case, rules=SafetyRules(RuleBook(watch_interval=0))):
+    symptoms, red_flags, plan, context = case
+    rules.check_red_flags(symptoms, red_flags)
+    allergies = rules.allergy_set(context["allergies"])
+    for medication in plan.medications:
+        rules.check_medication_safety(medication, context, allergies)
+    rules.check_pregnancy_contraindications(plan, context)
+    for medication in plan.medications:
+        rules.check_allergy_contraindication(medication.name, allergies)
+
+
+def make_case(n, rng):
+    medications = [Medication(rng.choice(MEDICATIONS), "500 mg", "oral", "twice daily", max_daily="3000 mg")
+                   for _ in range(n)]
+    context = {"age": 34, "pregnant": True, "renal_issues": True,
+               "allergies": [rng.choice(ALLERGIES) for _ in range(n)]}
+    return ([rng.choice(SYMPTOMS) for _ in range(n)], [], DoctorPlan([], medications=medications), context)
+
+
+def per_call_us(fn, case, budget_s=0.3):
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < budget_s:
+        fn(case)
+        calls += 1
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def rules_with_allergy_rules(n_rules: int, rules_dir: str) -> SafetyRules:
+    """The shipped rules with allergies.json padded to n_rules allergy rules"""
+    for name in ("red_flags.json", "medications.json"):
+        shutil.copy(Path(RULES_DIR) / name, rules_dir)
+    with open(Path(RULES_DIR) / "allergies.json") as f:
+        allergies = json.load(f)
+    table = allergies["allergy_contraindications"]
+    for i in range(n_rules - len(table)):
+        table[f"allergen {i}"] = [f"drug{i}a", f"drug{i}b"]
+    with open(Path(rules_dir) / "allergies.json", "w") as f:
+        json.dump(allergies, f)
+    return SafetyRules(RuleBook(rules_dir, watch_interval=0))
+
+
+def main():
+    rng = random.Random(5)
+    print(f"{'n':>4} {'old (us)':>10} {'compiled (us)':>14} {'speedup':>8}")
+    for n in SIZES:
+        case = make_case(n, rng)
+        old_us = per_call_us(review_old, case)
+        new_us = per_call_us(review_compiled, case)
+        print(f"{n:>4} {old_us:>10.1f} {new_us:>14.1f} {old_us / new_us:>7.1f}x")
+
+    print(f"\n{'allergy rules':>13} {'allergy check (us)':>19}")
+    for n_rules in [4, 1_000, 20_000]:
+        rules_dir = tempfile.mkdtemp()
+        try:
+            rules = rules_with_allergy_rules(n_rules, rules_dir)
+            allergies = rules.allergy_set(["penicillin"])
+            check_us = per_call_us(lambda _: rules.check_allergy_contraindication("amoxicillin", allergies), None)
+            print(f"{n_rules:>13} {check_us:>19.2f}")
+        finally:
+            shutil.rmtree(rules_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Store x SKU stock table at 10k stores x 5k SKUs.
+
+Measures build time, on-disk size, memory-mapped load time, resident memory
+and nearest-stocked-store query latency.
+
+Run from the repository root:
+    python benchmarks/bench_store_stock.py
+"""
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+import pandas as pd
+from core.geo import PharmacyRegistry
+from core.stock import StoreStock
+
+N_STORES = 10_000
+N_SKUS = 5_000
+DENSITY = 0.2
+QUERIES = 2_000
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    rng = np.random.default_rng(0)
+    store_ids = np.array([f"S{i:05d}" for i in range(N_STORES)])
+    registry = PharmacyRegistry(pd.DataFrame({
+        'store_id': store_ids, 'name': 'Store',
+        'lat': rng.uniform(8, 32, N_STORES), 'lon': rng.uniform(70, 90, N_STORES),
+        'rating': 4.0, 'delivery': True, 'hours': '09:00-21:00',
+    }))
+
+    nnz = int(N_STORES * N_SKUS * DENSITY)
+    cells = np.unique(rng.integers(0, N_STORES * N_SKUS, size=nnz))
+    frame = pd.DataFrame({
+        'store_id': store_ids[cells // N_SKUS], 'sku': cells % N_SKUS,
+        'quantity': rng.integers(1, 50, size=len(cells)),
+    })
+    print(f"stocked cells: {len(frame):,} of {N_STORES * N_SKUS:,} "
+          f"(dense int32 table would be {N_STORES * N_SKUS * 4 / 2**20:.0f} MB)")
+
+    start = time.perf_counter()
+    stock = StoreStock.from_frame(frame, N_SKUS)
+    print(f"build:        {(time.perf_counter() - start) * 1e3:8.1f} ms")
+    del frame
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        stock.save(cache_dir)
+        size = sum(os.path.getsize(os.path.join(cache_dir, f)) for f in os.listdir(cache_dir))
+        print(f"on disk:      {size / 2**20:8.1f} MB")
+        del stock
+
+        before = rss_mb()
+        start = time.perf_counter()
+        stock = StoreStock.load(cache_dir)
+        stock.attach(registry)
+        print(f"mmap load:    {(time.perf_counter() - start) * 1e3:8.1f} ms "
+              f"(peak RSS +{rss_mb() - before:.1f} MB)")
+
+        skus = rng.integers(0, N_SKUS, size=(QUERIES, 2))
+        lats = rng.uniform(10, 30, QUERIES)
+        lons = rng.uniform(72, 88, QUERIES)
+        start = time.perf_counter()
+        for i in range(QUERIES):
+            stock.nearest_stores(skus[i].tolist(), lats[i], lons[i], k=3)
+        print(f"nearest k=3:  {(time.perf_counter() - start) / QUERIES * 1e6:8.1f} us/query")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Rule-path throughput of PatientSymptomAgent.extract_symptoms_batch by worker count.
+
+Run from the repository root:
+    python benchmarks/bench_symptom_batch.py [n_messages]
+"""
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agents.patient_symptom import PatientSymptomAgent
+
+TEMPLATES = [
+    "I've had fever of 101°F and sore throat for {n} days, coughing at night",
+    "mujhe {n} din se tez bukhar hai aur sir dard bhi, kamzori lagti hai",
+    "chest pain since morning and I feel dizzy, passed out once",
+    "stomach pain and vomiting for {n} hours after dinner",
+    "my appointment got moved again so I stayed home and rested",
+]
+
+
+def main():
+    n_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = random.Random(3)
+    messages = [(rng.choice(TEMPLATES).format(n=rng.randint(1, 9)), {"age": rng.randint(1, 90)})
+                for _ in range(n_messages)]
+
+    agent = PatientSymptomAgent()
+    agent.gemini_available = False
+    counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    print(f"{n_messages} messages, {os.cpu_count()} CPUs\n")
+    print(f"{'workers':>8} {'seconds':>9} {'msgs/sec':>10} {'speedup':>8}")
+    baseline = None
+    for workers in counts:
+        start = time.perf_counter()
+        done = sum(1 for _ in agent.extract_symptoms_batch(messages, workers=workers))
+        elapsed = time.perf_counter() - start
+        assert done == n_messages
+        rate = n_messages / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>8} {elapsed:>9.2f} {rate:>10.0f} {rate / baseline:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Single-pass SymptomMatcher vs. the previous one-re.search-per-phrase extraction.
+
+Run from the repository root:
+    python benchmarks/bench_symptom_matcher.py
+"""
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.lexicon import SymptomMatcher, SYMPTOM_TERMS, RED_FLAG_TERMS, SEVERITY_TERMS
+
+MESSAGES = {
+    "symptomatic": "I've had fever of 101°F and sore throat for 2 days, coughing at night, "
+                   "feeling tired and exhausted with a bad headache. ",
+    "narrative": "My appointment got moved again so I stayed home, made some soup, "
+                 "watched the news and tried to catch up on emails from work. ",
+}
+REPEATS = [1, 10, 100]
+
+# Words for a long message that does not repeat itself; repeated sentences
+# let the previous loop stop at the first hit and the matcher dedupe them
+FILLER = ("the a and to of in my was for on with at by from about over after before night day "
+          "morning work home soup news appointment doctor sister went came stayed made tried "
+          "called said think know really very little bit more some pills water tea walk bus "
+          "train office email phone meeting").split()
+SYMPTOMS = ["fever", "sore throat", "coughing", "tired", "headache", "nausea", "stomach pain"]
+
+
+def varied_message(chars: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    words = []
+    while sum(len(word) + 1 for word in words) < chars:
+        words.append(rng.choice(FILLER))
+        if rng.random() < 0.01:
+            words.append(rng.choice(SYMPTOMS))
+        if rng.random() < 0.08:
+            words[-1] += rng.choice('.,')
+    return ' '.join(words)
+
+
+def previous_extraction(text: str):
+    """The per-phrase loop PatientSymptomAgent used before the compiled matcher"""
+    text = text.lower()
+    symptoms = [label for label, phrases in SYMPTOM_TERMS.items()
+                if any(re.search(phrase, text) for phrase in phrases)]
+    red_flags = [phrase for phrase in RED_FLAG_TERMS if re.search(phrase, text)]
+    severity = "mild"
+    if any(word in text for word in SEVERITY_TERMS["severe"]):
+        severity = "severe"
+    elif any(word in text for word in SEVERITY_TERMS["moderate"]):
+        severity = "moderate"
+    return symptoms, red_flags, severity
+
+
+def per_call_us(fn, text, budget_s=0.3):
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < budget_s:
+        fn(text)
+        calls += 1
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    matcher = SymptomMatcher.default()
+    start = time.perf_counter()
+    SymptomMatcher.default()
+    print(f"compile: {(time.perf_counter() - start) * 1e3:.2f} ms\n")
+
+    print(f"{'message':>12} {'chars':>7} {'previous (us)':>14} {'compiled (us)':>14} {'speedup':>8}")
+    cases = [(name, sentence * repeat) for name, sentence in MESSAGES.items() for repeat in REPEATS]
+    cases += [("varied", varied_message(len(cases[-1][1])))]
+    for name, text in cases:
+        found = matcher.match(text)
+        assert (found.symptoms, found.red_flags, found.severity) == previous_extraction(text)
+        old = per_call_us(previous_extraction, text)
+        new = per_call_us(matcher.match, text)
+        print(f"{name:>12} {len(text):>7} {old:>14.1f} {new:>14.1f} {old / new:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import pandas as pd
+from core.inventory import InventoryIndex
+
+RELATION_RANK = {"same_class": 0, "same_indication": 1}
+STOCK_RANK = {"High": 0, "Medium": 1, "Low": 2}
+
+class AlternativesGraph:
+    """Therapeutic alternatives joined to the inventory once at load time.
+
+    Edges (drug, alternative, relation) are read from data and treated as
+    undirected. For every drug in the inventory the in-stock rows are
+    pre-sorted by stock level and price, so a query only walks a short
+    adjacency list and takes the first row of each neighbour.
+    """
+
+    def __init__(self, edges: pd.DataFrame, index: InventoryIndex):
+        self.index = index
+        self.neighbours: Dict[str, List[Tuple[str, str]]] = {}
+        for drug, alternative, relation in zip(edges['drug'], edges['alternative'], edges['relation']):
+            drug, alternative = index.normalize(drug), index.normalize(alternative)
+            self._add(drug, alternative, relation)
+            self._add(alternative, drug, relation)
+        for adjacent in self.neighbours.values():
+            adjacent.sort(key=lambda edge: RELATION_RANK.get(edge[1], len(RELATION_RANK)))
+
+        # canonical name -> in-stock row positions, best first
+        in_stock = index.columns['in_stock']
+        stock_level = index.columns['stock_level']
+        price = index.columns['price']
+        self.stocked_rows: Dict[str, List[int]] = {}
+        for name, positions in index.by_name.items():
+            rows = [pos for pos in positions if in_stock[pos]]
+            rows.sort(key=lambda pos: (STOCK_RANK.get(stock_level[pos], len(STOCK_RANK)), price[pos]))
+            if rows:
+                self.stocked_rows[name] = rows
+
+    def _add(self, drug: str, alternative: str, relation: str):
+        adjacent = self.neighbours.setdefault(drug, [])
+        if all(existing != alternative for existing, _ in adjacent):
+            adjacent.append((alternative, relation))
+
+    @classmethod
+    def from_csv(cls, path: str, index: InventoryIndex) -> "AlternativesGraph":
+        return cls(pd.read_csv(path), index)
+
+    @classmethod
+    def empty(cls, index: InventoryIndex) -> "AlternativesGraph":
+        return cls(pd.DataFrame({'drug': [], 'alternative': [], 'relation': []}), index)
+
+    def query(self, keys: List[str], is_contraindicated: Callable[[str], bool] = None,
+              store_stock=None, lat: Optional[float] = None, lon: Optional[float] = None,
+              ledger=None, limit: int = 5) -> List[Dict[str, Any]]:
+        """Ranked in-stock, allergy-safe alternatives for the first key with any edges.
+
+        Alternatives are ranked by relation (same class before same
+        indication), then distance to the nearest store holding them when a
+        location is given, then stock level and price.
+        """
+        adjacent = []
+        for key in keys:
+            adjacent = self.neighbours.get(key)
+            if adjacent:
+                break
+        if not adjacent:
+            return []
+
+        ranked = []
+        for alternative, relation in adjacent:
+            rows = self.stocked_rows.get(alternative)
+            if not rows or (is_contraindicated and is_contraindicated(alternative)):
+                continue
+            row = self.index.row(rows[0])
+            nearest = None
+            if store_stock is not None and lat is not None and lon is not None:
+                stores = store_stock.nearest_stores(rows, lat, lon, k=1, ledger=ledger)
+                nearest = stores[0] if stores else None
+            ranked.append((
+                RELATION_RANK.get(relation, len(RELATION_RANK)),
+                nearest["distance_km"] if nearest else float('inf'),
+                STOCK_RANK.get(row['stock_level'], len(STOCK_RANK)),
+                row['price'],
+                rows[0], row, relation, nearest
+            ))
+        ranked.sort(key=lambda entry: entry[:4])
+        return [{"sku": sku, "row": row, "relation": relation, "nearest_store": nearest}
+                for *_, sku, row, relation, nearest in ranked[:limit]]
@@ -0,0 +1,166 @@
+from typing import Callable, Dict, Any, Optional
+from collections import deque
+import threading
+import time
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose breaker is open"""
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker for one upstream endpoint.
+
+    While closed, call outcomes are kept for the last `window` seconds; once
+    at least `min_calls` are recorded and the failure rate reaches
+    `failure_threshold`, the breaker opens and calls are rejected without
+    touching the endpoint. After the backoff one probe call is let through
+    (half-open): success closes the breaker, failure reopens it with the
+    backoff doubled, up to `max_backoff`. Only the probe's outcome decides;
+    a call admitted before the breaker opened may still finish while it is
+    half-open, and is just counted.
+    """
+
+    def __init__(self, name: str, failure_threshold: float = 0.5, window: float = 60.0,
+                 min_calls: int = 4, base_backoff: float = 5.0, max_backoff: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.min_calls = min_calls
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (time, succeeded) within the window
+        self._state = CLOSED
+        self._backoff = base_backoff
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        # Lifetime counters for metrics
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self.clock() - self._opened_at >= self._backoff:
+            self._state = HALF_OPEN
+        return self._state
+
+    def _trim(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def allows_calls(self) -> bool:
+        """Whether a call would currently be let through (does not reserve the probe)"""
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and not self._probe_in_flight)
+
+    def admit(self) -> Optional[bool]:
+        """Admit one call: None if rejected, else whether it is the half-open probe.
+
+        The probe's outcome must be recorded with probe=True.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return False
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return None
+
+    def record_success(self, probe: bool = False):
+        with self._lock:
+            now = self.clock()
+            self.successes += 1
+            if self._state == HALF_OPEN:
+                if not probe:
+                    return
+                self._state = CLOSED
+                self._backoff = self.base_backoff
+                self._probe_in_flight = False
+                self._outcomes.clear()
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+    def record_failure(self, probe: bool = False):
+        with self._lock:
+            now = self.clock()
+            self.failures += 1
+            if self._state == HALF_OPEN:
+                if not probe:
+                    return
+                self._probe_in_flight = False
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+                self._open(now)
+                return
+            self._outcomes.append((now, False))
+            self._trim(now)
+            failed = sum(1 for _, ok in self._outcomes if not ok)
+            if self._state == CLOSED and len(self._outcomes) >= self.min_calls and \
+                    failed / len(self._outcomes) >= self.failure_threshold:
+                self._open(now)
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self.times_opened += 1
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Call fn through the breaker; raises CircuitOpenError if it is open"""
+        probe = self.admit()
+        if probe is None:
+            raise CircuitOpenError(f"circuit '{self.name}' is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure(probe)
+            raise
+        self.record_success(probe)
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            now = self.clock()
+            state = self._current_state()
+            self._trim(now)
+            calls = len(self._outcomes)
+            failed = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                "state": state,
+                "window_calls": calls,
+                "window_failure_rate": failed / calls if calls else 0.0,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+                "backoff_s": self._backoff,
+                "retry_in_s": max(0.0, self._opened_at + self._backoff - now) if state == OPEN else 0.0
+            }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+def breaker_for(name: str, **settings) -> CircuitBreaker:
+    """Process-wide breaker for an endpoint; settings apply only on first creation"""
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **settings)
+        return breaker
+
+def breaker_metrics() -> Dict[str, Dict[str, Any]]:
+    """Metrics for every breaker created so far, by endpoint name"""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.metrics() for breaker in breakers}
@@ -0,0 +1,43 @@
+from typing import Callable, Tuple, TypeVar
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import threading
+import time
+
+T = TypeVar("T")
+
+# LLM calls raced against a deadline run here. A call that misses its deadline
+# keeps its thread until the SDK returns, so the pool bounds how many can linger.
+MAX_LLM_CALLS = 16
+_executor = ThreadPoolExecutor(max_workers=MAX_LLM_CALLS, thread_name_prefix="llm-deadline")
+# One slot per worker, released when the call returns, so nothing waits in the pool's queue
+_slots = threading.BoundedSemaphore(MAX_LLM_CALLS)
+
+def race(llm_call: Callable[[], T], fallback: Callable[[], T], budget: float,
+         label: str = "LLM") -> Tuple[T, str]:
+    """Run llm_call against a latency budget, with the rule-based result ready meanwhile.
+
+    The LLM call starts first on a worker thread and the fallback is computed
+    on the calling thread while it is in flight. Returns the LLM result if it
+    arrives within `budget` seconds, otherwise the fallback. The second element
+    says which path won: "llm", "deadline" (LLM too slow), "fallback" (LLM
+    call failed) or "saturated" (every worker is still busy, so the LLM was
+    not called).
+    """
+    start = time.monotonic()
+    if not _slots.acquire(blocking=False):
+        # A queued call would start after its deadline had mostly passed and only add load
+        return fallback(), "saturated"
+    try:
+        future = _executor.submit(llm_call)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    fallback_result = fallback()
+    try:
+        return future.result(timeout=max(0.0, budget - (time.monotonic() - start))), "llm"
+    except FutureTimeout:
+        return fallback_result, "deadline"
+    except Exception as e:
+        print(f"{label} error: {e}")
+        return fallback_result, "fallback"
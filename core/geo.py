@@ -0,0 +1,160 @@
+from typing import List, Dict, Any, Optional, Tuple
+import math
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Vectorized great-circle distance from one point to many points"""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons) - math.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def parse_location(location: Optional[Dict[str, float]]) -> Optional[Tuple[float, float]]:
+    """Read (lat, lon) from a location dict, accepting the common key spellings"""
+    if not location:
+        return None
+    lat = location.get("lat", location.get("latitude"))
+    lon = location.get("lon", location.get("lng", location.get("longitude")))
+    if lat is None or lon is None:
+        return None
+    return float(lat), float(lon)
+
+class PharmacyRegistry:
+    """Pharmacy stores with a uniform lat/lon grid index for nearest-store queries.
+
+    Stores are sorted by grid cell so each cell is a contiguous slice of the
+    coordinate arrays; a query only computes distances for the cells around
+    the query point.
+    """
+
+    def __init__(self, stores: pd.DataFrame, cell_deg: float = 0.05):
+        self.cell_deg = cell_deg
+        lats = stores['lat'].to_numpy(dtype=np.float64)
+        lons = stores['lon'].to_numpy(dtype=np.float64)
+        cell_y = np.floor(lats / cell_deg).astype(np.int64)
+        cell_x = np.floor(lons / cell_deg).astype(np.int64)
+
+        order = np.lexsort((cell_x, cell_y))
+        self.stores = stores.iloc[order].reset_index(drop=True)
+        self.lats = lats[order]
+        self.lons = lons[order]
+        self.store_ids = self.stores['store_id'].tolist()
+        self.position_of = {store_id: pos for pos, store_id in enumerate(self.store_ids)}
+        self._records = None
+
+        # cell -> (start, end) slice into the sorted arrays
+        self.cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        cy, cx = cell_y[order], cell_x[order]
+        if len(order):
+            change = np.flatnonzero((np.diff(cy) != 0) | (np.diff(cx) != 0)) + 1
+            starts = np.concatenate(([0], change))
+            ends = np.concatenate((change, [len(order)]))
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                self.cells[(int(cy[start]), int(cx[start]))] = (start, end)
+            self._y_range = (int(cy.min()), int(cy.max()))
+            self._x_range = (int(cx.min()), int(cx.max()))
+        else:
+            self._y_range = self._x_range = (0, 0)
+
+    @classmethod
+    def from_csv(cls, path: str, **kwargs) -> "PharmacyRegistry":
+        """Load a registry from a CSV with store_id, name, lat, lon, rating, delivery, hours"""
+        df = pd.read_csv(path)
+        if 'store_id' not in df.columns:
+            df['store_id'] = range(len(df))
+        if 'delivery' in df.columns:
+            df['delivery'] = df['delivery'].astype(bool)
+        return cls(df, **kwargs)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def record(self, pos: int, distance_km: Optional[float] = None) -> Dict[str, Any]:
+        """Build the output record for a store position"""
+        if self._records is None:
+            self._records = self.stores.to_dict('records')
+        record = dict(self._records[pos])
+        record["distance_km"] = None if distance_km is None else round(float(distance_km), 2)
+        return record
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def _gather(self, cells) -> np.ndarray:
+        slices = [self.cells[c] for c in cells if c in self.cells]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, end) for start, end in slices])
+
+    def _ring(self, cy: int, cx: int, r: int):
+        if r == 0:
+            return [(cy, cx)]
+        ring = [(cy - r, x) for x in range(cx - r, cx + r + 1)]
+        ring += [(cy + r, x) for x in range(cx - r, cx + r + 1)]
+        ring += [(y, cx - r) for y in range(cy - r + 1, cy + r)]
+        ring += [(y, cx + r) for y in range(cy - r + 1, cy + r)]
+        return ring
+
+    def nearest(self, lat: float, lon: float, k: int = 3) -> List[Tuple[int, float]]:
+        """k nearest stores as (position, distance_km), closest first"""
+        if not len(self) or k <= 0:
+            return []
+        cy, cx = self._cell(lat, lon)
+        max_r = max(abs(cy - self._y_range[0]), abs(cy - self._y_range[1]),
+                    abs(cx - self._x_range[0]), abs(cx - self._x_range[1]))
+        candidates = []
+        found = 0
+        best = None
+        for r in range(max_r + 1):
+            if (2 * r + 1) ** 2 > len(self.cells):
+                # Far from every store: the rings left are mostly empty cells, so
+                # scanning all stores at once is cheaper than walking them
+                best = None
+                break
+            idx = self._gather(self._ring(cy, cx, r))
+            if len(idx):
+                candidates.append(idx)
+                found += len(idx)
+            if found >= k:
+                idx = np.concatenate(candidates)
+                dist = haversine_km(lat, lon, self.lats[idx], self.lons[idx])
+                kth = np.partition(dist, k - 1)[k - 1]
+                # Anything beyond ring r is at least r cells away in lat or lon
+                lon_scale = math.cos(math.radians(min(89.0, abs(lat) + (r + 1) * self.cell_deg)))
+                bound = r * self.cell_deg * KM_PER_DEGREE * lon_scale
+                best = (idx, dist)
+                if kth <= bound:
+                    break
+        if best is None:
+            idx = np.arange(len(self))
+            best = (idx, haversine_km(lat, lon, self.lats, self.lons))
+        idx, dist = best
+        top = np.argsort(dist, kind='stable')[:k]
+        return [(int(idx[i]), float(dist[i])) for i in top]
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> List[Tuple[int, float]]:
+        """All stores within radius_km as (position, distance_km), closest first"""
+        if not len(self):
+            return []
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(min(89.0, abs(lat) + dlat))), 1e-6))
+        y0, x0 = self._cell(lat - dlat, lon - dlon)
+        y1, x1 = self._cell(lat + dlat, lon + dlon)
+        span = (y1 - y0 + 1) * (x1 - x0 + 1)
+        if span > len(self.cells):
+            cells = [c for c in self.cells if y0 <= c[0] <= y1 and x0 <= c[1] <= x1]
+        else:
+            cells = [(y, x) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+        idx = self._gather(cells)
+        if not len(idx):
+            return []
+        dist = haversine_km(lat, lon, self.lats[idx], self.lons[idx])
+        keep = np.flatnonzero(dist <= radius_km)
+        keep = keep[np.argsort(dist[keep], kind='stable')]
+        return [(int(idx[i]), float(dist[i])) for i in keep]
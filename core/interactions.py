@@ -0,0 +1,162 @@
+from typing import List, Dict, Iterable, Optional, Tuple, NamedTuple
+import os
+import threading
+import pandas as pd
+from core.ontology import DrugOntology, ONTOLOGY_PATH, candidate_keys, normalize
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+# Most severe first; a severity is stored as its position here
+SEVERITIES = ("contraindicated", "major", "moderate", "minor")
+
+class Interaction(NamedTuple):
+    drug_a: str
+    drug_b: str
+    # The names the interaction is recorded under, e.g. "ssri" for sertraline
+    via_a: str
+    via_b: str
+    severity: str
+    mechanism: str
+
+class InteractionDB:
+    """Drug-drug interactions as an integer-coded adjacency map.
+
+    Every drug or class name gets an integer id. A pair (a, b) is stored
+    once per direction as adjacency[a][b] -> record number, and the records
+    keep the severity code and an interned mechanism string. Interactions
+    may be recorded against any class in the drug ontology ("ssri",
+    "antidepressant"). Each ontology entry's expansion, its own id plus the
+    ids of every class above it, is precomputed from the ontology closure,
+    so checking k drugs costs O(k^2) dict probes however many pairs are
+    loaded. A check may pass a newer ontology (the one the safety rules
+    hot-reloaded); its expansion is built once and kept until the next one.
+    """
+
+    def __init__(self, pairs: pd.DataFrame, ontology: Optional[DrugOntology] = None):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.adjacency: Dict[int, Dict[int, int]] = {}
+        self.severity: List[int] = []
+        self.mechanism: List[str] = []
+
+        mechanisms: Dict[str, str] = {}
+        for drug_a, drug_b, severity, mechanism in zip(pairs['drug_a'], pairs['drug_b'],
+                                                       pairs['severity'], pairs['mechanism']):
+            a, b = self._id(drug_a), self._id(drug_b)
+            code = SEVERITIES.index(str(severity).strip().lower())
+            mechanism = "" if pd.isna(mechanism) else str(mechanism).strip()
+            existing = self.adjacency.get(a, {}).get(b)
+            if existing is not None:
+                # Duplicate pair: keep the most severe record
+                if code < self.severity[existing]:
+                    self.severity[existing] = code
+                    self.mechanism[existing] = mechanisms.setdefault(mechanism, mechanism)
+                continue
+            record = len(self.severity)
+            self.severity.append(code)
+            self.mechanism.append(mechanisms.setdefault(mechanism, mechanism))
+            self.adjacency.setdefault(a, {})[b] = record
+            self.adjacency.setdefault(b, {})[a] = record
+
+        self.ontology = ontology if ontology is not None else DrugOntology.empty()
+        self._expansion = (self.ontology, self._expand_ontology(self.ontology))
+
+    def _expand_ontology(self, ontology: DrugOntology) -> List[Tuple[int, ...]]:
+        """ontology id -> interaction ids it is checked under (itself first, then its classes)"""
+        expansion = []
+        for name in ontology.names:
+            ids = [self.ids[name]] if name in self.ids else []
+            ids.extend(self.ids[drug_class] for drug_class in ontology.classes_of(name) if drug_class in self.ids)
+            expansion.append(tuple(ids))
+        return expansion
+
+    def _expansion_for(self, ontology: Optional[DrugOntology]) -> Tuple[DrugOntology, List[Tuple[int, ...]]]:
+        current = self._expansion
+        if ontology is None or ontology is current[0]:
+            return current
+        # Swapped in as one tuple, so concurrent checks never pair an ontology with another's expansion
+        current = self._expansion = (ontology, self._expand_ontology(ontology))
+        return current
+
+    def _id(self, name: str) -> int:
+        name = normalize(name)
+        drug_id = self.ids.get(name)
+        if drug_id is None:
+            drug_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return drug_id
+
+    @classmethod
+    def from_csv(cls, path: str = None, ontology_path: str = ONTOLOGY_PATH) -> "InteractionDB":
+        path = path or os.path.join(DATA_DIR, 'interactions.csv')
+        ontology = DrugOntology.from_csv(ontology_path) if os.path.exists(ontology_path) else None
+        return cls(pd.read_csv(path, dtype=str), ontology)
+
+    def __len__(self) -> int:
+        return len(self.severity)
+
+    def expand(self, name: str, ontology: Optional[DrugOntology] = None) -> Optional[Tuple[int, ...]]:
+        """Interaction ids a free-text medication name is checked under; None if it is unknown.
+
+        "Ibuprofen 400mg tablet" -> ibuprofen, nsaid and analgesic, as far as
+        each has interactions recorded.
+        """
+        ontology, expansion = self._expansion_for(ontology)
+        for key in candidate_keys(name):
+            node = ontology.ids.get(key)
+            if node is not None:
+                return expansion[node]
+            drug_id = self.ids.get(key)
+            if drug_id is not None:
+                return (drug_id,)
+        return None
+
+    def check(self, medications: Iterable[str], ontology: Optional[DrugOntology] = None) -> List[Interaction]:
+        """Interactions between every pair of medications, most severe first.
+
+        Each drug pair is reported once, with its most severe record.
+        Names the database does not know are skipped. Pass the ontology the
+        safety rules are using so both agree on class membership.
+        """
+        regimen = []
+        seen = set()
+        for name in medications:
+            key = normalize(name)
+            ids = self.expand(name, ontology) if key not in seen else None
+            seen.add(key)
+            if ids:
+                regimen.append((name, ids))
+
+        found = []
+        for i, (name_a, ids_a) in enumerate(regimen):
+            adjacent = [(a, self.adjacency[a]) for a in ids_a if a in self.adjacency]
+            if not adjacent:
+                continue
+            for name_b, ids_b in regimen[i + 1:]:
+                best = None
+                for a, neighbours in adjacent:
+                    for b in ids_b:
+                        record = neighbours.get(b)
+                        if record is not None and (best is None or self.severity[record] < self.severity[best[2]]):
+                            best = (a, b, record)
+                if best is not None:
+                    a, b, record = best
+                    found.append(Interaction(name_a, name_b, self.names[a], self.names[b],
+                                             SEVERITIES[self.severity[record]], self.mechanism[record]))
+        found.sort(key=lambda interaction: SEVERITIES.index(interaction.severity))
+        return found
+
+_shared: Optional[InteractionDB] = None
+_shared_lock = threading.Lock()
+
+def shared_interactions() -> InteractionDB:
+    """Process-wide interaction database loaded from data/interactions.csv on first use"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            try:
+                _shared = InteractionDB.from_csv()
+            except Exception as e:
+                print(f"Error loading interaction database: {e}")
+                _shared = InteractionDB(pd.DataFrame({'drug_a': [], 'drug_b': [], 'severity': [], 'mechanism': []}))
+        return _shared
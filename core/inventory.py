@@ -0,0 +1,89 @@
+from typing import List, Dict, Any, Iterable, NamedTuple
+import pandas as pd
+
+class InventoryIndex:
+    """Hash index over the inventory, built once when the inventory is loaded.
+
+    Maps normalized medication names, generic names and brands to row
+    positions so lookups are dictionary probes instead of column scans.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.by_name: Dict[str, List[int]] = {}
+        self.by_generic: Dict[str, List[int]] = {}
+        self.by_brand: Dict[str, List[int]] = {}
+
+        # Plain Python column lists so building a record never touches pandas
+        self.columns = {col: df[col].tolist() for col in df.columns}
+
+        for key_map, col in ((self.by_name, 'name'),
+                             (self.by_generic, 'generic_name'),
+                             (self.by_brand, 'brand')):
+            for pos, value in enumerate(self.columns.get(col, [])):
+                key_map.setdefault(self.normalize(value), []).append(pos)
+
+        # Stable drug id -> row position, for feed deltas that name the drug
+        self.by_drug_id: Dict[str, int] = {drug_id: pos for pos, drug_id in
+                                           enumerate(self.columns.get('drug_id', []))}
+
+    @staticmethod
+    def normalize(name: Any) -> str:
+        """Normalize a medication name for index lookups"""
+        return str(name).strip().lower()
+
+    def __len__(self):
+        return len(self.df)
+
+    def lookup(self, name: str) -> List[int]:
+        """Row positions whose medication name matches exactly"""
+        return self.by_name.get(self.normalize(name), [])
+
+    def find(self, name: str) -> List[int]:
+        """Row positions matching by name, then generic name, then brand"""
+        key = self.normalize(name)
+        return (self.by_name.get(key)
+                or self.by_generic.get(key)
+                or self.by_brand.get(key)
+                or [])
+
+    def row(self, pos: int) -> Dict[str, Any]:
+        """Build a record for a single row position"""
+        return {col: values[pos] for col, values in self.columns.items()}
+
+    def rows(self, positions: Iterable[int]) -> List[Dict[str, Any]]:
+        """Build records for several row positions"""
+        return [self.row(pos) for pos in positions]
+
+DRUG_ID_COLUMNS = ('name', 'strength', 'form', 'brand', 'manufacturer')
+
+def derive_drug_ids(df: pd.DataFrame) -> List[str]:
+    """Stable ids for inventory rows that do not carry a drug_id column.
+
+    The id is built from what the row describes, e.g. "amlodipine|5mg|tablet|amdepin|eli lilly",
+    so it does not change when rows are reordered. Identical rows get "#2", "#3", ...
+    in file order.
+    """
+    columns = [df[col].tolist() if col in df.columns else [''] * len(df) for col in DRUG_ID_COLUMNS]
+    seen: Dict[str, int] = {}
+    ids = []
+    for values in zip(*columns):
+        key = '|'.join(InventoryIndex.normalize(value) for value in values)
+        count = seen[key] = seen.get(key, 0) + 1
+        ids.append(key if count == 1 else f"{key}#{count}")
+    return ids
+
+class InventorySnapshot(NamedTuple):
+    """Immutable, versioned view of everything the pharmacy agent reads.
+
+    A reload builds a complete new snapshot and swaps the reference, so a
+    request that grabbed a snapshot keeps a consistent view throughout.
+    """
+    version: int
+    inventory_df: pd.DataFrame
+    inventory_index: InventoryIndex
+    pharmacy_registry: Any
+    store_stock: Any
+    resolver: Any
+    alternatives: Any
+    loaded_at: float
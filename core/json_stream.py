@@ -0,0 +1,125 @@
+from typing import Any, List, Optional, Tuple
+import json
+
+_decoder = json.JSONDecoder()
+
+def extract_json(text: str, opening: str = '{') -> str:
+    """The first complete JSON object (or array, with opening='[') in text.
+
+    Unlike a greedy regex this stops at the bracket that closes the first
+    value, ignoring brackets inside strings, so trailing prose or a second
+    JSON block in the model's answer does not get glued on. Returns the
+    text unchanged if no complete value is found.
+    """
+    start = text.find(opening)
+    if start < 0:
+        return text
+    try:
+        # Well-formed JSON: the C decoder finds the end without a Python-level scan
+        _, end = _decoder.raw_decode(text, start)
+        return text[start:end]
+    except ValueError:
+        pass
+    depth = 0
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+class JsonStreamParser:
+    """Incremental parser for the top-level fields of a streamed JSON object.
+
+    Feed text chunks as they arrive; each call returns the (key, value)
+    pairs whose values became complete in that chunk, so a caller can act on
+    "differential" while "follow_up_advice" is still being generated. Text
+    before the opening brace (e.g. a ```json fence) is skipped. Every
+    character is scanned once.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+        self.complete = False
+        self.key: Optional[str] = None
+        self.key_start: Optional[int] = None
+        self.value_start: Optional[int] = None
+        self.fields = {}
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        if self.complete:
+            return []
+        self.text += chunk
+        found = []
+        text = self.text
+        for i in range(self.pos, len(text)):
+            char = text[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.value_start is None and self.key_start is not None:
+                        self.key = json.loads(text[self.key_start:i + 1])
+                        self.key_start = None
+                continue
+            if not self.started:
+                if char == '{':
+                    self.started = True
+                    self.depth = 1
+                continue
+            if char == '"':
+                self.in_string = True
+                if self.depth == 1 and self.value_start is None:
+                    self.key_start = i
+            elif char == ':' and self.depth == 1 and self.key is not None and self.value_start is None:
+                self.value_start = i + 1
+            elif char in '{[':
+                self.depth += 1
+            elif char in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    self._finish_field(text, i, found)
+                    self.complete = True
+                    self.pos = i + 1
+                    return found
+            elif char == ',' and self.depth == 1:
+                self._finish_field(text, i, found)
+        self.pos = len(text)
+        return found
+
+    def _finish_field(self, text: str, end: int, found: List[Tuple[str, Any]]):
+        if self.key is not None and self.value_start is not None:
+            try:
+                value = json.loads(text[self.value_start:end])
+            except ValueError:
+                pass
+            else:
+                self.fields[self.key] = value
+                found.append((self.key, value))
+        self.key = None
+        self.value_start = None
+
+    def result(self) -> dict:
+        """All fields parsed so far (the whole object once complete)"""
+        return dict(self.fields)
@@ -0,0 +1,317 @@
+from typing import List, Dict, Tuple, NamedTuple, Optional
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+import numpy as np
+from core.reloader import save_array, prune_versions
+
+# Symptom label -> phrases that indicate it
+SYMPTOM_TERMS = {
+    "fever": ["fever", "temperature", "hot", "chills", "°f", "°c"],
+    "sore throat": ["sore throat", "throat pain", "difficulty swallowing"],
+    "cough": ["cough", "coughing", "hacking"],
+    "headache": ["headache", "head pain", "migraine"],
+    "fatigue": ["fatigue", "tired", "exhausted", "weakness"],
+    "nausea": ["nausea", "sick to stomach", "queasy"],
+    "vomiting": ["vomiting", "throwing up", "puking"],
+    "chest pain": ["chest pain", "chest discomfort"],
+    "breathing issues": ["shortness of breath", "difficulty breathing", "wheezing"],
+    "abdominal pain": ["stomach pain", "abdominal pain", "belly ache"]
+}
+
+# Red-flag phrases are reported as-is
+RED_FLAG_TERMS = [
+    "severe pain", "worst pain", "excruciating",
+    "can't breathe", "difficulty breathing",
+    "chest pain", "chest pressure",
+    "confusion", "disoriented",
+    "fainting", "passed out",
+    "blood", "bleeding",
+    "high fever", "fever over 103"
+]
+
+# Severity level -> keywords, most severe first
+SEVERITY_TERMS = {
+    "severe": ["severe", "worst", "excruciating", "unbearable"],
+    "moderate": ["moderate", "moderately", "significant"]
+}
+
+class LexiconMatch(NamedTuple):
+    symptoms: List[str]
+    red_flags: List[str]
+    severity: str
+
+def trie_pattern(terms: List[str]) -> str:
+    """Regex source for a character trie of the terms, longest match first"""
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+# Sentence and line breaks; no built-in phrase spans one
+SEGMENT_BREAKS = ('!', '?', '\n')
+# Above this many characters, repeated sentences are scanned once
+LONG_MESSAGE_CHARS = 2000
+
+def split_segments(text: str) -> List[str]:
+    # str.split is much faster than a regex split on long text
+    for mark in SEGMENT_BREAKS:
+        text = text.replace(mark, '.')
+    return text.split('.')
+
+class SymptomMatcher:
+    """Symptom, red-flag and severity lexicon compiled into one regex.
+
+    All phrases are merged into a single character-trie pattern so a
+    message is scanned once instead of once per phrase. Matches must start
+    at a word start but may run into a longer word ("cough" finds
+    "coughing"). A phrase found in the text also credits every shorter
+    lexicon phrase inside it, so "high fever" reports both the red flag
+    and the "fever" symptom.
+
+    Long messages (pasted logs, forwarded chats) often repeat sentences, so
+    each distinct sentence is scanned once; no phrase spans a sentence
+    break, so the result is the same.
+
+    An optional LexiconStore adds whole-word terms loaded from data files
+    (e.g. Hinglish synonyms); its labels are merged into the same result.
+    """
+
+    def __init__(self, symptoms: Dict[str, List[str]], red_flags: List[str],
+                 severity: Dict[str, List[str]], store: Optional["LexiconStore"] = None):
+        # phrase -> [(kind, label, rank)]; rank keeps the lexicon's own order in the output
+        entries: Dict[str, List[Tuple[str, str, int]]] = {}
+        rank = 0
+        for label, phrases in symptoms.items():
+            for phrase in phrases:
+                entries.setdefault(phrase.lower(), []).append(("symptom", label, rank))
+            rank += 1
+        for phrase in red_flags:
+            entries.setdefault(phrase.lower(), []).append(("red_flag", phrase, rank))
+            rank += 1
+        for level, (label, phrases) in enumerate(severity.items()):
+            for phrase in phrases:
+                entries.setdefault(phrase.lower(), []).append(("severity", label, level))
+
+        # Credit every phrase that starts at a word inside a longer matched phrase
+        self.hits: Dict[str, Tuple[Tuple[str, str, int], ...]] = {}
+        for phrase in entries:
+            words = {phrase[i:] for i in range(len(phrase)) if i == 0 or not phrase[i - 1].isalpha()}
+            self.hits[phrase] = tuple(hit for other, hits in entries.items()
+                                      if any(tail.startswith(other) for tail in words)
+                                      for hit in hits)
+
+        self.levels = list(severity)
+        self.store = store
+        self.dedupe_segments = not any(c in phrase for phrase in entries for c in SEGMENT_BREAKS + ('.',))
+        # (kind, label) -> rank, so store labels sort next to the built-in ones
+        self.ranks = {(kind, label): rank for hits in entries.values() for kind, label, rank in hits}
+        # Anchoring on a consumed non-letter (rather than a lookbehind) lets the
+        # regex engine skip letters quickly; match() pads the text with a space
+        self.pattern = re.compile(r"[^a-z](" + trie_pattern(list(entries)) + ")")
+
+    @classmethod
+    def default(cls, store: Optional["LexiconStore"] = None) -> "SymptomMatcher":
+        return cls(SYMPTOM_TERMS, RED_FLAG_TERMS, SEVERITY_TERMS, store)
+
+    def match(self, text: str, default_severity: str = "mild") -> LexiconMatch:
+        """Find all symptoms, red flags and the severity level in one pass"""
+        symptoms: Dict[str, int] = {}
+        red_flags: Dict[str, int] = {}
+        level = len(self.levels)
+        lowered = text.lower()
+        if len(lowered) > LONG_MESSAGE_CHARS and self.dedupe_segments:
+            # Joined with a non-letter, so word starts are the same as in the message
+            lowered = '\n'.join(set(split_segments(lowered)))
+        for phrase in set(self.pattern.findall(' ' + lowered)):
+            for kind, label, rank in self.hits.get(phrase, ()):
+                if kind == "symptom":
+                    symptoms[label] = rank
+                elif kind == "red_flag":
+                    red_flags[label] = rank
+                else:
+                    level = min(level, rank)
+        if self.store is not None:
+            for kind, label in self.store.match(text):
+                rank = self.ranks.get((kind, label), len(self.ranks))
+                if kind == "symptom":
+                    symptoms.setdefault(label, rank)
+                elif kind == "red_flag":
+                    red_flags.setdefault(label, rank)
+                elif kind == "severity" and label in self.levels:
+                    level = min(level, self.levels.index(label))
+        return LexiconMatch(
+            symptoms=sorted(symptoms, key=symptoms.get),
+            red_flags=sorted(red_flags, key=red_flags.get),
+            severity=self.levels[level] if level < len(self.levels) else default_severity
+        )
+
+WORD_PATTERN = re.compile(r"[a-z0-9'°ऀ-ॿÀ-ɏ]+")
+STORE_FILES = ('prefix_hashes', 'term_hashes', 'term_labels')
+
+def phrase_hash(phrase: str) -> int:
+    """Stable 64-bit hash of a normalized phrase (same value in every process)"""
+    return int.from_bytes(hashlib.blake2b(phrase.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def normalize_phrase(text: str) -> List[str]:
+    # NFC so a decomposed "ā" or Devanagari nukta reads the same as the precomposed form
+    return WORD_PATTERN.findall(unicodedata.normalize('NFC', text.lower()))
+
+def _sorted_contains(haystack: np.ndarray, needles: np.ndarray) -> np.ndarray:
+    """Membership mask of needles in a sorted array"""
+    if not len(haystack):
+        return np.zeros(len(needles), dtype=bool)
+    idx = np.searchsorted(haystack, needles)
+    idx[idx >= len(haystack)] = 0
+    return haystack[idx] == needles
+
+class LexiconStore:
+    """Large synonym lexicon compiled into memory-mapped hash arrays.
+
+    Terms are matched on whole words. Each term and each of its word
+    prefixes is stored as a sorted 64-bit hash, so matching is a vectorized
+    membership test over the words of a message followed by a short
+    extension walk at the few positions that can start a term. The arrays
+    are plain .npy files opened with mmap, so worker processes share a
+    single copy through the page cache; only the small label table is
+    decoded per process.
+    """
+
+    def __init__(self, prefix_hashes: np.ndarray, term_hashes: np.ndarray,
+                 term_labels: np.ndarray, labels: List[Tuple[str, str]], max_words: int):
+        self.prefix_hashes = prefix_hashes
+        self.term_hashes = term_hashes
+        self.term_labels = term_labels
+        self.labels = labels
+        self.max_words = max_words
+
+    def __len__(self):
+        return len(self.term_hashes)
+
+    @classmethod
+    def from_tsv(cls, paths: List[str]) -> "LexiconStore":
+        """Compile term / kind / label TSV files"""
+        label_ids: Dict[Tuple[str, str], int] = {}
+        terms: Dict[int, set] = {}
+        prefixes = set()
+        max_words = 1
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                header = f.readline().rstrip('\n').split('\t')
+                columns = {name: i for i, name in enumerate(header)}
+                for line in f:
+                    fields = line.rstrip('\n').split('\t')
+                    if len(fields) < len(header):
+                        continue
+                    words = normalize_phrase(fields[columns['term']])
+                    if not words:
+                        continue
+                    key = (fields[columns['kind']], fields[columns['label']])
+                    label_id = label_ids.setdefault(key, len(label_ids))
+                    terms.setdefault(phrase_hash(' '.join(words)), set()).add(label_id)
+                    for n in range(1, len(words) + 1):
+                        prefixes.add(phrase_hash(' '.join(words[:n])))
+                    max_words = max(max_words, len(words))
+
+        pairs = sorted((h, label_id) for h, ids in terms.items() for label_id in ids)
+        return cls(
+            prefix_hashes=np.array(sorted(prefixes), dtype=np.uint64),
+            term_hashes=np.array([h for h, _ in pairs], dtype=np.uint64),
+            term_labels=np.array([label_id for _, label_id in pairs], dtype=np.int32),
+            labels=[key for key, _ in sorted(label_ids.items(), key=lambda item: item[1])],
+            max_words=max_words
+        )
+
+    @staticmethod
+    def compiled_dir(paths: List[str], cache_dir: str) -> str:
+        """Subdirectory of cache_dir holding the lexicon compiled from this version of the TSVs"""
+        stamp = hashlib.blake2b(digest_size=8)
+        for path in sorted(os.path.abspath(p) for p in paths):
+            stat = os.stat(path)
+            stamp.update(f"{path}\0{stat.st_mtime_ns}\0{stat.st_size}\0".encode('utf-8'))
+        return os.path.join(cache_dir, f"v{stamp.hexdigest()}")
+
+    @classmethod
+    def compile(cls, paths: List[str], cache_dir: str) -> "LexiconStore":
+        """Load the compiled lexicon for the current TSVs from cache_dir, building it if missing.
+
+        Each version of the TSVs compiles into its own subdirectory, and
+        labels.json is written last, so pool workers compiling at the same
+        time never overwrite arrays another worker has mapped.
+        """
+        version_dir = cls.compiled_dir(paths, cache_dir)
+        if os.path.exists(os.path.join(version_dir, 'labels.json')):
+            try:
+                return cls.load(version_dir)
+            except (OSError, ValueError):
+                pass
+        store = cls.from_tsv(paths)
+        try:
+            store.save(version_dir, sources=paths)
+            prune_versions(cache_dir, keep=version_dir)
+        except OSError:
+            pass
+        return store
+
+    def save(self, cache_dir: str, sources: List[str] = ()):
+        """Write the arrays and label table, each to a temp file renamed into place"""
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in STORE_FILES:
+            save_array(os.path.join(cache_dir, f"{name}.npy"), getattr(self, name))
+        meta_path = os.path.join(cache_dir, 'labels.json')
+        tmp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"labels": self.labels, "max_words": self.max_words,
+                       "sources": sorted(os.path.abspath(p) for p in sources)}, f)
+        os.replace(tmp_path, meta_path)
+
+    @classmethod
+    def load(cls, cache_dir: str, mmap: bool = True) -> "LexiconStore":
+        """Open a compiled lexicon, memory-mapped read-only by default"""
+        mode = 'r' if mmap else None
+        # np.asarray drops the memmap subclass (and its per-index overhead), not the mapping
+        arrays = {name: np.asarray(np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode=mode))
+                  for name in STORE_FILES}
+        with open(os.path.join(cache_dir, 'labels.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        return cls(labels=[tuple(label) for label in meta["labels"]],
+                   max_words=meta["max_words"], **arrays)
+
+    def match(self, text: str) -> List[Tuple[str, str]]:
+        """(kind, label) for every lexicon term in the text, in text order"""
+        words = normalize_phrase(text)
+        if not words or not len(self.term_hashes):
+            return []
+        hashes = np.fromiter((phrase_hash(word) for word in words), dtype=np.uint64, count=len(words))
+        starts = np.flatnonzero(_sorted_contains(self.prefix_hashes, hashes))
+
+        found = []
+        for i in starts.tolist():
+            phrase, h, j = words[i], int(hashes[i]), i + 1
+            while True:
+                lo = int(np.searchsorted(self.term_hashes, h))
+                while lo < len(self.term_hashes) and int(self.term_hashes[lo]) == h:
+                    found.append(self.labels[int(self.term_labels[lo])])
+                    lo += 1
+                if j >= len(words) or j - i >= self.max_words:
+                    break
+                phrase += ' ' + words[j]
+                h = phrase_hash(phrase)
+                j += 1
+                if not _sorted_contains(self.prefix_hashes, np.array([h], dtype=np.uint64))[0]:
+                    break
+        return found
@@ -0,0 +1,108 @@
+from typing import Any, Callable, Iterator, Optional
+import google.generativeai as genai
+from core.circuit import CircuitBreaker, CircuitOpenError, breaker_for
+from core.llm_cache import ResponseCache, cache_key
+from core.singleflight import SingleFlight
+
+# Identical prompts in flight at the same time share one API call, across all clients
+inflight = SingleFlight()
+
+class GeminiClient:
+    """genai.GenerativeModel behind the shared circuit breaker for its model name.
+
+    Every agent using the same model shares one breaker, so an outage seen by
+    one agent stops the others from calling too. With a ResponseCache,
+    repeated prompts are answered from disk without an API call, and
+    identical prompts sent concurrently are coalesced into one call. Only
+    text the caller's parser accepted is cached, so a malformed or
+    truncated reply is retried next time instead of served for the TTL.
+    """
+
+    def __init__(self, model_name: str = 'gemini-pro', cache: Optional[ResponseCache] = None):
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.breaker: CircuitBreaker = breaker_for(f"gemini:{model_name}")
+        self.cache = cache
+
+    def available(self) -> bool:
+        """False while the breaker is open, so callers can skip straight to their fallback"""
+        return self.breaker.allows_calls()
+
+    def generate_content(self, prompt: str, parse: Callable[[str], Any] = None,
+                         cacheable: Callable[[Any], bool] = None, **kwargs):
+        """Gemini's response to prompt, or parse(response text) when a parser is given.
+
+        Without a parser the raw response is returned and never cached. With
+        one, the text is cached only once parse has accepted it (and
+        cacheable(result) holds, if given); a cached entry the parser now
+        rejects is dropped and the prompt sent again.
+        """
+        if kwargs:
+            return self.breaker.call(self.model.generate_content, prompt, **kwargs)
+        if parse is None:
+            response, _ = inflight.do(cache_key(self.model_name, prompt),
+                                      lambda: self.breaker.call(self.model.generate_content, prompt))
+            return response
+        if self.cache is not None:
+            text = self.cache.get(self.model_name, prompt)
+            if text is not None:
+                try:
+                    return parse(text)
+                except Exception:
+                    self.cache.delete(self.model_name, prompt)
+        # Callers with different parsers must not share a parsed result
+        key = (cache_key(self.model_name, prompt), getattr(parse, '__qualname__', id(parse)))
+        result, _ = inflight.do(key, lambda: self._call(prompt, parse, cacheable))
+        return result
+
+    def _call(self, prompt: str, parse: Callable[[str], Any], cacheable: Callable[[Any], bool] = None):
+        response = self.breaker.call(self.model.generate_content, prompt)
+        # Blocked or empty candidates raise here; a reply the parser rejects raises too
+        text = response.text
+        result = parse(text)
+        if self.cache is not None and (cacheable is None or cacheable(result)):
+            self.cache.put(self.model_name, prompt, text)
+        return result
+
+    def stream_content(self, prompt: str, validate: Callable[[str], Any] = None) -> Iterator[str]:
+        """Response text chunks as Gemini generates them.
+
+        A cached answer comes back as a single chunk. The breaker sees the
+        stream as one call: it fails if any chunk fails. Once the stream has
+        been read to the end, the full text is cached if validate accepts it;
+        without validate nothing is cached.
+        """
+        if self.cache is not None and validate is not None:
+            text = self.cache.get(self.model_name, prompt)
+            if text is not None:
+                try:
+                    validate(text)
+                except Exception:
+                    self.cache.delete(self.model_name, prompt)
+                else:
+                    yield text
+                    return
+        probe = self.breaker.admit()
+        if probe is None:
+            raise CircuitOpenError(f"circuit '{self.breaker.name}' is open")
+        parts = []
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                parts.append(chunk.text)
+                yield chunk.text
+        except GeneratorExit:
+            # The caller stopped reading early; the service was answering fine
+            self.breaker.record_success(probe)
+            raise
+        except Exception:
+            self.breaker.record_failure(probe)
+            raise
+        self.breaker.record_success(probe)
+        if self.cache is not None and validate is not None:
+            text = ''.join(parts)
+            try:
+                validate(text)
+            except Exception:
+                # Malformed or truncated: the caller falls back, and the next request asks again
+                return
+            self.cache.put(self.model_name, prompt, text)
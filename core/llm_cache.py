@@ -0,0 +1,133 @@
+from typing import Optional, Dict, Any
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', '.cache', 'llm_responses.sqlite')
+WHITESPACE = re.compile(r'\s+')
+
+def normalize_prompt(prompt: str) -> str:
+    """Case- and whitespace-insensitive form of a prompt"""
+    return WHITESPACE.sub(' ', prompt).strip().casefold()
+
+def cache_key(model_name: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{normalize_prompt(prompt)}".encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """Content-addressed LLM response cache in a local SQLite file.
+
+    Entries are keyed by model name plus normalized prompt, expire after
+    `ttl` seconds and are evicted least-recently-used first once the cache
+    holds more than `max_entries` responses or `max_bytes` of text. The
+    file runs in WAL mode, so several processes can share it.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl: float = 86400.0,
+                 max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL,
+            size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, model_name: str, prompt: str) -> Optional[str]:
+        key = cache_key(model_name, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, size, created FROM responses WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is not None and now - row[2] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.expirations += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self.bytes_saved += row[1]
+            return row[0]
+
+    def put(self, model_name: str, prompt: str, response: str):
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                             (cache_key(model_name, prompt), model_name, response, size, now, now))
+            self._evict()
+
+    def delete(self, model_name: str, prompt: str):
+        """Drop one entry, e.g. a response that no longer parses"""
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (cache_key(model_name, prompt),))
+
+    def _evict(self):
+        count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "entries": count,
+            "bytes_stored": total,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+_shared: Optional[ResponseCache] = None
+_shared_lock = threading.Lock()
+
+def shared_cache() -> Optional[ResponseCache]:
+    """Process-wide cache configured from LLM_CACHE_PATH / LLM_CACHE_TTL; None if LLM_CACHE=off"""
+    global _shared
+    if os.getenv("LLM_CACHE", "on").lower() in ("off", "0", "false"):
+        return None
+    with _shared_lock:
+        if _shared is None:
+            try:
+                _shared = ResponseCache(os.getenv("LLM_CACHE_PATH", DEFAULT_PATH),
+                                        ttl=float(os.getenv("LLM_CACHE_TTL", 86400)))
+            except (sqlite3.Error, OSError, ValueError) as e:
+                print(f"LLM response cache unavailable: {e}")
+                return None
+        return _shared
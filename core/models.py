@@ -25,7 +25,8 @@ class PatientContext:
 
 class SymptomPayload:
     def __init__(self, chief_complaint, symptoms, onset=None, severity=None, 
-                 red_flags=None, context=None, duration_hours=None, triggers=None):
+                 red_flags=None, context=None, duration_hours=None, triggers=None,
+                 source=None):
         self.chief_complaint = chief_complaint
         self.symptoms = symptoms or []
         self.onset = onset
@@ -34,6 +35,7 @@ class SymptomPayload:
         self.context = context or PatientContext()
         self.duration_hours = duration_hours
         self.triggers = triggers or []
+        self.source = source
         self.timestamp = datetime.now().isoformat()
         
     def to_dict(self):
@@ -59,7 +61,7 @@ class Medication:
 class DoctorPlan:
     def __init__(self, differential, tests_suggested=None, self_care=None, 
                  medications=None, escalation=None, disclaimer="", 
-                 follow_up_advice=None, warning_signs=None):
+                 follow_up_advice=None, warning_signs=None, source=None):
         self.differential = differential or []
         self.tests_suggested = tests_suggested or []
         self.self_care = self_care or []
@@ -68,6 +70,7 @@ class DoctorPlan:
         self.disclaimer = disclaimer
         self.follow_up_advice = follow_up_advice or []
         self.warning_signs = warning_signs or []
+        self.source = source
         
     def to_dict(self):
         result = {k: v for k, v in self.__dict__.items() if v is not None}
@@ -76,11 +79,16 @@ class DoctorPlan:
 
 class PharmacyAvailability:
     def __init__(self, availability=None, alternatives=None, 
-                 nearby_pharmacies=None, delivery_options=None):
+                 nearby_pharmacies=None, delivery_options=None,
+                 store_availability=None, inventory_version=None, ledger_seq=None):
         self.availability = availability or []
         self.alternatives = alternatives or []
         self.nearby_pharmacies = nearby_pharmacies or []
         self.delivery_options = delivery_options or []
+        self.store_availability = store_availability or []
+        self.inventory_version = inventory_version
+        # Stock/price delta sequence the availability reflects
+        self.ledger_seq = ledger_seq
         
     def to_dict(self):
         return {k: v for k, v in self.__dict__.items() if v is not None}
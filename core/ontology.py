@@ -0,0 +1,128 @@
+from functools import lru_cache
+from typing import List, Dict, Iterable, Iterator, Optional
+import os
+import pandas as pd
+from core.resolver import STRENGTH_PATTERN, NOISE_WORDS
+
+ONTOLOGY_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'drug_classes.csv')
+
+def normalize(name: str) -> str:
+    return ' '.join(str(name).lower().split())
+
+def candidate_keys(name: str) -> Iterator[str]:
+    """Keys to try for a free-text medication name, most specific first.
+
+    "Ibuprofen 400mg tablet" -> "ibuprofen 400mg tablet", "ibuprofen"; for
+    names of several words each remaining word is tried after the whole.
+    """
+    name = normalize(name)
+    yield name
+    words = [word for word in STRENGTH_PATTERN.sub(' ', name).split() if word not in NOISE_WORDS]
+    stripped = ' '.join(words)
+    if stripped != name:
+        yield stripped
+    if len(words) > 1:
+        yield from words
+
+class DrugOntology:
+    """Ingredient -> class -> super-class edges with the closure precomputed.
+
+    Every name gets an integer id, and `ancestors[id]` is an int bitset with
+    the bit of the name itself and of every class above it set. Whether a
+    drug belongs to a class, or to any class in a set compiled with
+    `mask()`, is then a single AND, however deep the hierarchy is.
+    Free-text lookups are memoized per ontology.
+    """
+
+    def __init__(self, edges: pd.DataFrame, cache_size: int = 4096):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        parents: Dict[int, List[int]] = {}
+        for name, parent in zip(edges['name'], edges['parent']):
+            child, parent = self._id(name), self._id(parent)
+            if child != parent and parent not in parents.setdefault(child, []):
+                parents[child].append(parent)
+
+        self.ancestors: List[int] = [0] * len(self.names)
+        done = [False] * len(self.names)
+        for start in range(len(self.names)):
+            if done[start]:
+                continue
+            # Iterative post-order walk, so a deep hierarchy cannot hit the recursion limit
+            stack, on_path = [(start, iter(parents.get(start, ())))], {start}
+            while stack:
+                node, pending = stack[-1]
+                parent = next(pending, None)
+                if parent is None:
+                    bits = 1 << node
+                    for p in parents.get(node, ()):
+                        bits |= self.ancestors[p]
+                    self.ancestors[node] = bits
+                    done[node] = True
+                    on_path.discard(node)
+                    stack.pop()
+                elif parent in on_path:
+                    raise ValueError(f"drug class cycle through '{self.names[parent]}'")
+                elif not done[parent]:
+                    on_path.add(parent)
+                    stack.append((parent, iter(parents.get(parent, ()))))
+
+        self.closure = lru_cache(maxsize=cache_size)(self._closure)
+
+    def _id(self, name: str) -> int:
+        name = normalize(name)
+        node = self.ids.get(name)
+        if node is None:
+            node = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return node
+
+    @classmethod
+    def from_csv(cls, path: str = ONTOLOGY_PATH) -> "DrugOntology":
+        return cls(pd.read_csv(path, dtype=str))
+
+    @classmethod
+    def empty(cls) -> "DrugOntology":
+        return cls(pd.DataFrame({'name': [], 'parent': []}))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def lookup(self, name: str) -> Optional[int]:
+        """Id for a free-text medication name, if the ontology knows it"""
+        for key in candidate_keys(name):
+            node = self.ids.get(key)
+            if node is not None:
+                return node
+        return None
+
+    def _closure(self, name: str) -> int:
+        """Bitset of the name and every class above it; 0 for unknown names"""
+        node = self.lookup(name)
+        return 0 if node is None else self.ancestors[node]
+
+    def mask(self, names: Iterable[str]) -> int:
+        """Bitset of the known names among these, to test with closure() & mask"""
+        bits = 0
+        for name in names:
+            node = self.ids.get(normalize(name))
+            if node is not None:
+                bits |= 1 << node
+        return bits
+
+    def is_a(self, name: str, drug_class: str) -> bool:
+        node = self.ids.get(normalize(drug_class))
+        return node is not None and (self.closure(name) >> node) & 1 == 1
+
+    def classes_of(self, name: str) -> List[str]:
+        """The name's classes and super-classes, in id order (not the name itself)"""
+        node = self.lookup(name)
+        if node is None:
+            return []
+        bits = self.ancestors[node] & ~(1 << node)
+        classes = []
+        while bits:
+            low = bits & -bits
+            classes.append(self.names[low.bit_length() - 1])
+            bits ^= low
+        return classes
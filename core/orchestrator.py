@@ -1,37 +1,420 @@
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import partial
 from agents.patient_symptom import PatientSymptomAgent
 from agents.doctor import DoctorAgent
 from agents.pharmacy import PharmacyAgent
 from agents.guardian import SafetyGuardian
-from core.models import SymptomPayload, DoctorPlan, PharmacyAvailability, SafetyReview
+from core.models import SymptomPayload, DoctorPlan, PatientContext, PharmacyAvailability, SafetyReview
+from core.schemas import MedicationSchema
+from core.circuit import breaker_metrics
+from core.llm_cache import shared_cache
+from core.deadline import race
+from core.plan_cache import PlanCache, case_key
+from core.singleflight import SingleFlight
+from core import llm
+from pydantic import ValidationError
 import asyncio
+import copy
+import hashlib
+import json
+import threading
+
+# Uncollected background assessments kept before the oldest finished ones are dropped
+MAX_BACKGROUND = 1024
 
 class Orchestrator:
-    def __init__(self):
-        self.psa = PatientSymptomAgent()
-        self.da = DoctorAgent()
+    def __init__(self, max_workers: int = 8, latency_budgets: Dict[str, float] = None,
+                 plan_cache_size: int = 1024, combined_llm: bool = False, red_flag_triage: bool = True):
+        # Optional per-stage LLM deadlines in seconds: {"extraction": ..., "plan": ...}
+        latency_budgets = latency_budgets or {}
+        self.latency_budgets = latency_budgets
+        # Ask Gemini for extraction and plan in one call, keeping the two-call path as fallback
+        self.combined_llm = combined_llm
+        self.psa = PatientSymptomAgent(latency_budget=latency_budgets.get("extraction"))
+        self.da = DoctorAgent(latency_budget=latency_budgets.get("plan"))
         self.pa = PharmacyAgent()
         self.sg = SafetyGuardian()
+        # Blocking agent calls (Gemini SDK, pandas) from the async pipeline run here,
+        # shared by all sessions so concurrent requests cannot pile up threads
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="orchestrator")
+        # Identical requests in flight at the same time run the pipeline once
+        self.inflight = SingleFlight()
+        # Doctor + pharmacy results by canonical case; 0 disables
+        self.plan_cache = PlanCache(plan_cache_size) if plan_cache_size else None
+        # Messages naming a critical red flag get an immediate escalation before any LLM call
+        self.red_flag_triage = red_flag_triage
+        self.triaged = 0
+        # session_id -> full assessment still running behind a triage response
+        self.background: Dict[str, Future] = {}
+        self._background_lock = threading.Lock()
     
-    def process_request(self, user_input: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Process a patient request through the multi-agent system"""
-        # Step 1: Extract symptoms with Patient Symptom Agent
-        symptom_data = self.psa.extract_symptoms(user_input, context)
-        
-        # Step 2: Generate plan with Doctor Agent
-        doctor_plan = self.da.generate_plan(symptom_data)
+    def process_request(self, user_input: str, context: Dict[str, Any] = None,
+                        background_assessment: bool = False) -> Dict[str, Any]:
+        """Process a patient request through the multi-agent system.
+
+        A message naming a critical red flag is answered at once with an
+        immediate escalation and no LLM or pharmacy work; with
+        background_assessment=True the full assessment still runs and can be
+        collected with full_assessment(session_id). Identical requests that
+        arrive while one is already being processed wait for it instead of
+        running the pipeline again.
+        """
+        triage = self._pre_triage(user_input, context, background_assessment)
+        if triage:
+            return triage
+        result, shared = self.inflight.do(self._request_key(user_input, context),
+                                          lambda: self._process(user_input, context))
+        return self._own_copy(result, shared)
+    
+    def _process(self, user_input: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        # Step 1: Extract symptoms (and, in combined mode, the plan), plus the raw-text red-flag screen
+        symptom_data, doctor_plan = self._first_stage(user_input, context)
+        self._merge_red_flags(symptom_data, self._screen_red_flags(user_input))
+        if doctor_plan is not None:
+            key, cached = self._plan_key(symptom_data), None
+        else:
+            key, cached = self._cached_plan(symptom_data,
+                                            context.get("allergies") if context else None,
+                                            context.get("location") if context else None)
         
-        # Step 3: Check pharmacy availability
-        pharmacy_data = self.pa.check_availability(
-            doctor_plan.medications, 
-            context.get("allergies") if context else None,
-            context.get("location") if context else None
-        )
+        if cached:
+            doctor_plan, pharmacy_data = cached
+        else:
+            # Step 2: Generate plan with Doctor Agent
+            if doctor_plan is None:
+                doctor_plan = self.da.generate_plan(symptom_data)
+            
+            # Step 3: Check pharmacy availability
+            pharmacy_data = self.pa.check_availability(
+                doctor_plan.medications, 
+                context.get("allergies") if context else None,
+                context.get("location") if context else None
+            )
+            self._store_plan(key, doctor_plan, pharmacy_data)
         
         # Step 4: Safety review
         safety_review = self.sg.review_plan(symptom_data, doctor_plan, pharmacy_data)
         
-        # Prepare comprehensive final response
+        return self._build_response(symptom_data, doctor_plan, pharmacy_data, safety_review)
+    
+    async def process_request_async(self, user_input: str, context: Dict[str, Any] = None,
+                                    background_assessment: bool = False) -> Dict[str, Any]:
+        """Async process_request; identical concurrent requests on the same loop share one run"""
+        triage = self._pre_triage(user_input, context, background_assessment)
+        if triage:
+            return triage
+        result, shared = await self.inflight.do_async(self._request_key(user_input, context),
+                                                      lambda: self._process_async(user_input, context))
+        return self._own_copy(result, shared)
+    
+    async def _process_async(self, user_input: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Process a patient request with independent stages running concurrently.
+
+        Stage graph (arrows are data dependencies):
+
+            extraction ----------+--> doctor plan ------+--> pharmacy --> safety review
+            red-flag screen -----+    pharmacy prefetch-+
+
+        The raw-text red-flag screen runs while the extraction call is in
+        flight, and pharmacy availability for the rule-predicted medications
+        is fetched while the doctor call is in flight; the prefetch is used
+        if the plan asks for the same medications. In combined mode a single
+        call replaces extraction and doctor plan when its response validates.
+        """
+        allergies = context.get("allergies") if context else None
+        location = context.get("location") if context else None
+        
+        # Stage 1: symptom extraction (or combined extraction + plan), with the
+        # raw-text red-flag screen alongside
+        first = asyncio.ensure_future(self._run_blocking(self._first_stage, user_input, context))
+        screened_flags = self._screen_red_flags(user_input)
+        symptom_data, doctor_plan = await first
+        self._merge_red_flags(symptom_data, screened_flags)
+        
+        if doctor_plan is not None:
+            pharmacy_data = await self._run_blocking(
+                self.pa.check_availability, doctor_plan.medications, allergies, location)
+            self._store_plan(self._plan_key(symptom_data), doctor_plan, pharmacy_data)
+            safety_review = self.sg.review_plan(symptom_data, doctor_plan, pharmacy_data)
+            return self._build_response(symptom_data, doctor_plan, pharmacy_data, safety_review)
+        
+        # Repeat cases skip the doctor stage, and the pharmacy stage unless stock has moved
+        key, cached = self._cached_plan(symptom_data, allergies, location)
+        if cached:
+            doctor_plan, pharmacy_data = cached
+            safety_review = self.sg.review_plan(symptom_data, doctor_plan, pharmacy_data)
+            return self._build_response(symptom_data, doctor_plan, pharmacy_data, safety_review)
+        
+        # Stage 2: doctor plan, with a pharmacy prefetch for the likely medications
+        planning = asyncio.ensure_future(self._run_blocking(self.da.generate_plan, symptom_data))
+        predicted = self.da._generate_fallback_plan(symptom_data).medications
+        prefetch = asyncio.ensure_future(
+            self._run_blocking(self.pa.check_availability, predicted, allergies, location))
+        doctor_plan = await planning
+        
+        # Stage 3: pharmacy availability for the medications actually planned
+        if [med.name for med in doctor_plan.medications] == [med.name for med in predicted]:
+            pharmacy_data = await prefetch
+        else:
+            prefetch.cancel()
+            pharmacy_data = await self._run_blocking(
+                self.pa.check_availability, doctor_plan.medications, allergies, location)
+        self._store_plan(key, doctor_plan, pharmacy_data)
+        
+        # Stage 4: safety review
+        safety_review = self.sg.review_plan(symptom_data, doctor_plan, pharmacy_data)
+        
+        return self._build_response(symptom_data, doctor_plan, pharmacy_data, safety_review)
+    
+    def process_request_streaming(self, user_input: str, context: Dict[str, Any] = None,
+                                  on_event: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """process_request with the doctor plan streamed, reporting results as they are ready.
+    
+        on_event(name, value) is called from the calling thread with
+        "symptoms" (the extraction), then each plan field ("differential",
+        "escalation", "medications", ...) as soon as it is complete, then
+        "pharmacy" and "safety_review". The pharmacy check starts as soon as
+        the medications field arrives, while the rest of the plan is still
+        being generated. Requests are not coalesced and combined mode is not
+        used here, since each caller wants its own stream. A message naming a
+        critical red flag reports the triage "escalation" first, and the full
+        assessment then streams behind it as usual.
+        """
+        emit = on_event or (lambda name, value: None)
+        triage = self._pre_triage(user_input, context)
+        if triage:
+            emit("escalation", triage["preliminary_assessment"]["escalation"])
+        
+        allergies = context.get("allergies") if context else None
+        location = context.get("location") if context else None
+    
+        symptom_data = self.psa.extract_symptoms(user_input, context)
+        self._merge_red_flags(symptom_data, self._screen_red_flags(user_input))
+        emit("symptoms", symptom_data.to_dict())
+    
+        key, cached = self._cached_plan(symptom_data, allergies, location)
+        if cached:
+            doctor_plan, pharmacy_data = cached
+            for name, value in doctor_plan.to_dict().items():
+                if name != "source":
+                    emit(name, value)
+        else:
+            early = {}
+    
+            def on_field(name, value):
+                if name == "medications" and isinstance(value, list):
+                    try:
+                        medications = [MedicationSchema.model_validate(med).to_medication() for med in value]
+                    except ValidationError:
+                        medications = None
+                    if medications is not None:
+                        early["names"] = [med.name for med in medications]
+                        early["future"] = self.executor.submit(
+                            self.pa.check_availability, medications, allergies, location)
+                emit(name, value)
+    
+            doctor_plan = self.da.generate_plan_stream(symptom_data, on_field)
+            # A failed stream is followed by the fallback plan, whose medications may differ
+            if early.get("names") == [med.name for med in doctor_plan.medications]:
+                pharmacy_data = early["future"].result()
+            else:
+                if "future" in early:
+                    early["future"].cancel()
+                pharmacy_data = self.pa.check_availability(doctor_plan.medications, allergies, location)
+            self._store_plan(key, doctor_plan, pharmacy_data)
+        emit("pharmacy", pharmacy_data.to_dict())
+    
+        safety_review = self.sg.review_plan(symptom_data, doctor_plan, pharmacy_data)
+        emit("safety_review", safety_review.to_dict())
+    
+        return self._build_response(symptom_data, doctor_plan, pharmacy_data, safety_review)
+    
+    def health(self) -> Dict[str, Any]:
+        """Circuit-breaker state for every LLM endpoint in use, cache metrics and coalesced-call counts"""
+        cache = shared_cache()
+        return {"llm_breakers": breaker_metrics(), "llm_cache": cache.metrics() if cache else None,
+                "plan_cache": self.plan_cache.metrics() if self.plan_cache else None,
+                "coalesced": {"requests": self.inflight.coalesced, "llm_calls": llm.inflight.coalesced},
+                "triaged": self.triaged}
+    
+    def full_assessment(self, session_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """The full assessment continuing behind a triage response.
+
+        Waits up to timeout seconds (None waits until it is done). Returns
+        None if the session has no background assessment or it is still
+        running; a collected result is forgotten.
+        """
+        with self._background_lock:
+            future = self.background.get(session_id)
+        if future is None:
+            return None
+        try:
+            result = future.result(timeout)
+        except FutureTimeoutError:
+            return None
+        with self._background_lock:
+            self.background.pop(session_id, None)
+        result["session_id"] = session_id
+        return result
+    
+    def _pre_triage(self, user_input: str, context: Dict[str, Any] = None,
+                    background_assessment: bool = False) -> Optional[Dict[str, Any]]:
+        """Immediate-escalation response if the raw text names a critical red flag, else None"""
+        if not self.red_flag_triage:
+            return None
+        flags = self.sg.rules.find_critical_red_flags(user_input)
+        if not flags:
+            return None
+        self.triaged += 1
+        
+        symptom_data = SymptomPayload(
+            chief_complaint=flags[0],
+            symptoms=list(flags),
+            red_flags=list(flags),
+            context=PatientContext(**context) if context else PatientContext(),
+            source="triage"
+        )
+        doctor_plan = DoctorPlan(
+            differential=[],
+            escalation={
+                "needed": True,
+                "reason": f"Red flag symptoms reported: {', '.join(flags)}",
+                "urgency": "immediate"
+            },
+            disclaimer="Informational only; see a clinician for proper diagnosis and treatment. This is an automated assessment and should not replace professional medical advice.",
+            source="triage"
+        )
+        safety_review = SafetyReview(
+            approved=False,
+            risk_level="high",
+            notes=["Red flag symptoms found in the message; full assessment " +
+                   ("continuing in the background" if background_assessment else "skipped")],
+            recommendations=["Seek emergency care now or call 112 / 108"]
+        )
+        response = self._build_response(symptom_data, doctor_plan, PharmacyAvailability(), safety_review)
+        response["full_assessment"] = "pending" if background_assessment else "skipped"
+        if background_assessment:
+            future = self.executor.submit(self._process, user_input, context)
+            with self._background_lock:
+                self.background[response["session_id"]] = future
+                # Forget the oldest finished assessments nobody collected
+                finished = [key for key, task in self.background.items() if task.done()]
+                for key in finished[:max(0, len(self.background) - MAX_BACKGROUND)]:
+                    del self.background[key]
+        return response
+    
+    def _request_key(self, user_input: str, context: Dict[str, Any] = None) -> str:
+        """Same text (ignoring case and spacing) with the same context"""
+        text = ' '.join(user_input.lower().split())
+        blob = json.dumps([text, context or {}], sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+    
+    def _own_copy(self, result: Dict[str, Any], shared: bool) -> Dict[str, Any]:
+        """A response the caller may modify; waiters get their own session_id and timestamp"""
+        result = copy.deepcopy(result)
+        if shared:
+            result["session_id"] = self._generate_session_id()
+            result["timestamp"] = self._get_timestamp()
+        return result
+    
+    def _first_stage(self, user_input: str, context: Dict[str, Any] = None) -> Tuple[SymptomPayload, Optional[DoctorPlan]]:
+        """Symptom payload, plus the plan when the combined call produced one"""
+        combined = self._combined_stage(user_input, context)
+        if combined:
+            return combined
+        return self.psa.extract_symptoms(user_input, context), None
+    
+    def _combined_stage(self, user_input: str, context: Dict[str, Any] = None) -> Optional[Tuple[SymptomPayload, DoctorPlan]]:
+        """Extraction and plan from one Gemini call; None means use the two-call path.
+
+        With latency budgets set, the call gets the sum of the extraction and
+        plan budgets; if it misses that, both stages answer from the rules.
+        """
+        if not (self.combined_llm and self.da.gemini_available and self.da.model.available()):
+            return None
+        
+        def call():
+            extraction, doctor_plan = self.da.generate_assessment(user_input, context)
+            symptom_data = extraction.to_payload(context, source="combined")
+            return symptom_data, doctor_plan
+        
+        budgets = [self.latency_budgets.get(stage) for stage in ("extraction", "plan")]
+        if all(budget is None for budget in budgets):
+            try:
+                return call()
+            except Exception as e:
+                print(f"Combined assessment failed, using separate calls: {e}")
+                return None
+        
+        result, source = race(call, lambda: None, sum(b for b in budgets if b is not None),
+                              label="Combined assessment")
+        if source in ("deadline", "saturated"):
+            symptom_data = self.psa._fallback_extraction(user_input, context)
+            doctor_plan = self.da._generate_fallback_plan(symptom_data)
+            symptom_data.source = doctor_plan.source = source
+            return symptom_data, doctor_plan
+        return result
+    
+    def _plan_key(self, symptom_data: SymptomPayload) -> Optional[str]:
+        """Plan-cache key: the canonical case plus the inventory snapshot and rules versions.
+
+        Including the versions means a reload or a rules change makes older
+        entries miss. Stock/price deltas do not; _cached_plan refreshes the
+        availability of a hit instead.
+        """
+        if self.plan_cache is None:
+            return None
+        return case_key(symptom_data, self.pa.snapshot.version, self.sg.rules.version)
+    
+    def _cached_plan(self, symptom_data: SymptomPayload, allergies: List[str] = None,
+                     location: Dict[str, float] = None) -> Tuple[Optional[str], Optional[Tuple[DoctorPlan, PharmacyAvailability]]]:
+        """Cache key for this case and the cached (plan, availability) if there is one.
+
+        If stock or price deltas have arrived since the availability was
+        computed, it is recomputed for the plan's medications and stored
+        back; the doctor plan itself is reused.
+        """
+        key = self._plan_key(symptom_data)
+        if key is None:
+            return None, None
+        cached = self.plan_cache.get(key)
+        if cached:
+            doctor_plan, pharmacy_data = cached
+            if pharmacy_data.ledger_seq != self.pa.ledger.seq:
+                pharmacy_data = self.pa.check_availability(doctor_plan.medications, allergies, location)
+                self.plan_cache.put(key, doctor_plan, pharmacy_data)
+            doctor_plan.source = "cache"
+            cached = doctor_plan, pharmacy_data
+        return key, cached
+    
+    def _store_plan(self, key: Optional[str], doctor_plan: DoctorPlan, pharmacy_data: PharmacyAvailability):
+        # Degraded plans (deadline, open circuit, failed call) are not worth pinning
+        # while Gemini is configured; they are recomputed next time
+        if key and (doctor_plan.source in ("llm", "combined") or not self.da.gemini_available):
+            self.plan_cache.put(key, doctor_plan, pharmacy_data)
+    
+    def _run_blocking(self, fn, *args):
+        """Run a blocking call on the shared executor"""
+        return asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args))
+    
+    def _screen_red_flags(self, user_input: str) -> List[str]:
+        """Critical red flags in the raw text, independent of the LLM.
+
+        The same negation-aware scan as the triage, so "no chest pain" adds
+        nothing, and every pipeline merges its result the same way.
+        """
+        return self.sg.rules.find_critical_red_flags(user_input)
+    
+    @staticmethod
+    def _merge_red_flags(symptom_data: SymptomPayload, flags: List[str]):
+        for flag in flags:
+            if flag not in symptom_data.red_flags:
+                symptom_data.red_flags.append(flag)
+    
+    def _build_response(self, symptom_data: SymptomPayload, doctor_plan: DoctorPlan,
+                        pharmacy_data: PharmacyAvailability, safety_review: SafetyReview) -> Dict[str, Any]:
+        """Prepare comprehensive final response"""
         return {
             "symptom_analysis": symptom_data.to_dict(),
             "preliminary_assessment": doctor_plan.to_dict(),
@@ -40,7 +423,9 @@ class Orchestrator:
             "recommendation": self._generate_recommendation(doctor_plan, safety_review),
             "timestamp": self._get_timestamp(),
             "session_id": self._generate_session_id(),
-            "risk_level": safety_review.risk_level
+            "risk_level": safety_review.risk_level,
+            # Which path produced each LLM stage: "llm", "combined", "fallback", "deadline", "saturated", "circuit_open", "cache" or "triage"
+            "sources": {"extraction": symptom_data.source, "plan": doctor_plan.source}
         }
     
     def _generate_recommendation(self, doctor_plan: DoctorPlan, safety_review: SafetyReview) -> str:
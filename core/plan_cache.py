@@ -0,0 +1,112 @@
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import copy
+import hashlib
+import json
+import threading
+from core.models import SymptomPayload, DoctorPlan, PharmacyAvailability
+
+# Age band edges line up with the age cut-offs the safety rules use (8, 16, 18)
+AGE_BANDS = (2, 8, 12, 16, 18, 65)
+DURATION_BANDS_HOURS = (24, 72, 168)
+# Pediatric doses are per kg, so children's weights get narrow bands
+WEIGHT_BANDS_KG = (5, 10, 15, 20, 25, 30, 35, 40, 50, 60, 80, 100, 120)
+HEIGHT_BANDS_CM = (60, 80, 100, 120, 140, 160, 180)
+
+def _band(value: Optional[float], edges: Tuple) -> Optional[int]:
+    """Index of the band a value falls into, or None when unknown"""
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return sum(1 for edge in edges if value >= edge)
+
+def _vital(vitals, name: str) -> Optional[float]:
+    """A positive numeric vital sign, or None"""
+    try:
+        value = float(vitals.get(name))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+def _terms(values) -> list:
+    return sorted({str(value).strip().lower() for value in values or [] if str(value).strip()})
+
+def canonical_case(symptom_data: SymptomPayload) -> Dict[str, Any]:
+    """The parts of a payload the doctor and pharmacy stages depend on, in canonical form.
+
+    Free text (chief complaint, onset wording) is left out; numbers that rules
+    only compare against thresholds are reduced to bands, weight finely
+    enough for per-kg dosing; location is rounded to ~100 m so nearby users
+    share pharmacy results.
+    """
+    context = symptom_data.context
+    vitals = getattr(context, 'vitals', None) or {}
+    location = getattr(context, 'location', None) or {}
+    lat = location.get('lat', location.get('latitude')) if isinstance(location, dict) else None
+    lon = location.get('lon', location.get('lng', location.get('longitude'))) if isinstance(location, dict) else None
+    return {
+        "symptoms": _terms(symptom_data.symptoms),
+        "severity": (symptom_data.severity or "").strip().lower(),
+        "red_flags": _terms(symptom_data.red_flags),
+        "duration_band": _band(symptom_data.duration_hours, DURATION_BANDS_HOURS),
+        "age_band": _band(getattr(context, 'age', None), AGE_BANDS),
+        "weight_band": _band(_vital(vitals, 'weight'), WEIGHT_BANDS_KG),
+        "height_band": _band(_vital(vitals, 'height'), HEIGHT_BANDS_CM),
+        "sex": (getattr(context, 'sex', None) or "").strip().lower(),
+        "pregnant": bool(getattr(context, 'pregnant', False)),
+        "allergies": _terms(getattr(context, 'allergies', [])),
+        "meds": _terms(getattr(context, 'meds', [])),
+        "history": _terms(getattr(context, 'medical_history', [])),
+        "location": [round(float(lat), 3), round(float(lon), 3)] if lat is not None and lon is not None else None
+    }
+
+def case_key(symptom_data: SymptomPayload, *versions) -> str:
+    """Hash of the canonical case plus the data/rules versions it was computed under"""
+    blob = json.dumps([canonical_case(symptom_data), [str(v) for v in versions]], sort_keys=True)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+class PlanCache:
+    """In-process LRU of (DoctorPlan, PharmacyAvailability) by case key.
+
+    Entries are deep-copied in and out, because the safety review edits
+    the plan it is given.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[DoctorPlan, PharmacyAvailability]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Tuple[DoctorPlan, PharmacyAvailability]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(entry)
+
+    def put(self, key: str, doctor_plan: DoctorPlan, pharmacy_data: PharmacyAvailability):
+        entry = copy.deepcopy((doctor_plan, pharmacy_data))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "entries": len(self._entries)}
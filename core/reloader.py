@@ -0,0 +1,89 @@
+from typing import Callable, List, Optional, Tuple
+import os
+import shutil
+import threading
+import numpy as np
+
+def save_array(path: str, array: np.ndarray):
+    """np.save to a temp file in the same directory, then rename it over path.
+
+    A process that has the old file memory-mapped keeps reading the old
+    inode; writing into the mapped file in place would SIGBUS it.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+    try:
+        np.save(tmp_path, array)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def prune_versions(cache_dir: str, keep: str):
+    """Remove compiled cache versions other than keep, and files of the older unversioned layout.
+
+    Unlinking keeps existing memory maps of the removed files valid.
+    """
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if path == keep:
+            continue
+        if name.startswith('v') and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif name.endswith(('.npy', '.json')):
+            os.remove(path)
+
+class FileWatcher:
+    """Polls file modification times and calls back when any file changes.
+
+    The callback runs on the watcher thread. If it raises, the change is not
+    acknowledged and the callback is retried as soon as the files change
+    again, so a file caught half-written is picked up once the writer finishes.
+    """
+
+    def __init__(self, paths: List[str], callback: Callable[[], None], interval: float = 5.0):
+        self.paths = list(paths)
+        self.callback = callback
+        self.interval = interval
+        self._stamp = self._current_stamp()
+        self._failed_stamp = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _current_stamp(self) -> Tuple:
+        stamp = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def check(self) -> bool:
+        """Run the callback if any watched file changed; returns True if it ran"""
+        stamp = self._current_stamp()
+        if stamp == self._stamp or stamp == self._failed_stamp:
+            return False
+        try:
+            self.callback()
+        except Exception as e:
+            print(f"Reload of {', '.join(os.path.basename(p) for p in self.paths)} failed: {e}")
+            self._failed_stamp = stamp
+            return False
+        self._stamp = stamp
+        return True
+
+    def start(self):
+        """Start polling on a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="file-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
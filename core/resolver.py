@@ -0,0 +1,134 @@
+from typing import List, Dict, Iterable, Optional, Tuple
+from functools import lru_cache
+import os
+import re
+import pandas as pd
+from core.inventory import InventoryIndex
+
+# Dose, unit and dosage-form words that LLM output tacks onto drug names
+STRENGTH_PATTERN = re.compile(r'\b\d+(?:\.\d+)?\s*(?:mg|mcg|µg|g|ml|iu|%)?\b')
+NOISE_WORDS = frozenset([
+    "tablet", "tablets", "tab", "tabs", "capsule", "capsules", "cap", "caps",
+    "syrup", "suspension", "susp", "oral", "solution", "drops", "injection",
+    "cream", "gel", "ointment", "inhaler", "sr", "er", "xr", "mg", "mcg", "ml",
+])
+
+def edit_distance(a: str, b: str, cutoff: int) -> int:
+    """Levenshtein distance, giving up early once it must exceed cutoff"""
+    if abs(len(a) - len(b)) > cutoff:
+        return cutoff + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        if min(current) > cutoff:
+            return cutoff + 1
+        previous = current
+    return previous[-1]
+
+def trigrams(text: str) -> List[str]:
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+class MedicationResolver:
+    """Maps free-text drug names to canonical inventory names.
+
+    Looks at inventory names, generic names, brands and a synonym table.
+    Exact keys are checked first, then each word of the name, then close
+    spellings found through a trigram index and confirmed by edit distance.
+    A close spelling must start with the same letter, and names in
+    known_names (other ingredients the ontology or alternatives know, such
+    as oxazepam next to diazepam) are never spelled onto a different drug.
+    Results are memoized per resolver, and a resolver lives as long as the
+    inventory snapshot it was built from.
+    """
+
+    def __init__(self, index: InventoryIndex, synonyms: Dict[str, str] = None, cache_size: int = 4096,
+                 known_names: Iterable[str] = ()):
+        names = index.columns.get('name', [])
+        # Every lookup key -> canonical inventory name
+        self.keys: Dict[str, str] = {}
+        for key_map in (index.by_brand, index.by_generic, index.by_name):
+            for key, positions in key_map.items():
+                self.keys[key] = index.normalize(names[positions[0]])
+        self.synonyms = set()
+        for synonym, canonical in (synonyms or {}).items():
+            canonical, synonym = index.normalize(canonical), index.normalize(synonym)
+            if canonical in index.by_name and synonym not in self.keys:
+                self.keys[synonym] = canonical
+                self.synonyms.add(synonym)
+        self.known_names = frozenset(index.normalize(name) for name in known_names)
+
+        self.trigram_index: Dict[str, List[str]] = {}
+        for key in self.keys:
+            for gram in set(trigrams(key)):
+                self.trigram_index.setdefault(gram, []).append(key)
+
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def resolve(self, text: str) -> Optional[str]:
+        """Canonical inventory name for free text, or None"""
+        found = self.match(text)
+        return found[0] if found else None
+
+    @staticmethod
+    def load_synonyms(path: str) -> Dict[str, str]:
+        """Read a synonym,name CSV"""
+        if not os.path.exists(path):
+            return {}
+        df = pd.read_csv(path)
+        return dict(zip(df['synonym'].astype(str), df['name'].astype(str)))
+
+    @staticmethod
+    def clean(text: str) -> str:
+        """Lowercase and drop strengths, dosage forms and punctuation"""
+        text = STRENGTH_PATTERN.sub(' ', str(text).lower())
+        words = re.findall(r"[a-zµ][a-zµ\-]*", text)
+        return ' '.join(word for word in words if word not in NOISE_WORDS)
+
+    def _match(self, text: str) -> Optional[Tuple[str, str]]:
+        """(canonical name, how it matched) for free text, or None.
+
+        How is "exact" (the cleaned name is an inventory name, generic or
+        brand), "synonym", "word" (one word of a longer name) or "fuzzy".
+        """
+        cleaned = self.clean(text)
+        if not cleaned:
+            return None
+        if cleaned in self.keys:
+            return self.keys[cleaned], "synonym" if cleaned in self.synonyms else "exact"
+        words = cleaned.split()
+        for word in words:
+            if word in self.keys:
+                return self.keys[word], "word"
+        for candidate in [cleaned] + (words if len(words) > 1 else []):
+            if candidate in self.known_names:
+                # A real ingredient we do not stock, not a misspelling of one we do
+                continue
+            match = self._fuzzy(candidate)
+            if match:
+                return match, "fuzzy"
+        return None
+
+    def _fuzzy(self, text: str, max_candidates: int = 8) -> Optional[str]:
+        if len(text) < 5:
+            return None
+        counts: Dict[str, int] = {}
+        for gram in set(trigrams(text)):
+            for key in self.trigram_index.get(gram, ()):
+                counts[key] = counts.get(key, 0) + 1
+        if not counts:
+            return None
+        # One edit, two for long names; drug names a few letters apart are often different drugs
+        cutoff = 2 if len(text) >= 12 else 1
+        candidates = sorted(counts.items(), key=lambda item: -item[1])[:max_candidates]
+        best: Tuple[int, str] = (cutoff + 1, None)
+        for key, _ in candidates:
+            if key[0] != text[0]:
+                continue
+            distance = edit_distance(text, key, cutoff)
+            if distance < best[0]:
+                best = (distance, key)
+        return self.keys[best[1]] if best[1] else None
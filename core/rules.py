@@ -1,102 +1,342 @@
 # Safety rules and validation logic
-from typing import List, Dict, Any
+from typing import List, Dict, Any, FrozenSet, Iterable, Optional
+import bisect
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+from core.lexicon import trie_pattern
 from core.models import SymptomPayload, DoctorPlan, Medication
+from core.ontology import DrugOntology, ONTOLOGY_PATH, normalize
+from core.reloader import FileWatcher
+
+# Rule tables are declared in versioned JSON files here, so they can change without a deploy
+RULES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'rules')
+
+# A negation or history cue only applies within its own clause
+CLAUSE_BREAK = re.compile(r"[.;,:!?\n]|\b(?:but|however|though|although)\b")
+# A negator governing the flag right after it: "no chest pain", "denies any fainting",
+# "don't have chest pain", "no fever or chest pain". "can't bear this chest pain" is not one.
+NEGATED = re.compile(
+    r"(?:\b(?:no|not|nor|denies|denied|deny|denying|without|never|negative for|free of)"
+    r"|n't (?:have|has|had|get|got|feel|felt|notice|noticed|experience|experienced))"
+    r"(?: (?:any|much|more|real|severe|significant|the|a|an|having|getting|feeling|experiencing))*"
+    r"(?: [\w']+(?: [\w']+)? (?:or|nor))? ?$"
+)
+# The clause is about the past, not the complaint now
+PAST_EVENT = re.compile(r"\b(?:last|past|previous) (?:night|week|month|year|time)\b|\b(?:years?|months?|weeks?|days?) ago\b"
+                        r"|\bwent away\b|\bused to\b|\bhistory of\b|\bresolved\b|\bin the past\b")
+# ... or about someone else, told in the past tense ("grandpa had chest pain")
+OTHER_SUBJECT = re.compile(r"\b(?:he|she|they|grandpa|grandma|grandfather|grandmother"
+                           r"|(?:my|his|her|our|their) (?:father|mother|dad|mom|mum|brother|sister|friend"
+                           r"|son|daughter|husband|wife|uncle|aunt|cousin|neighbou?r))\b")
+PAST_TENSE = re.compile(r"\b(?:had|was|were|did)\b")
+# Any sign the problem is present or ongoing keeps the flag, whatever else the clause says
+HAPPENING_NOW = re.compile(r"\b(?:just|now|today|tonight|currently|still|keeps?|kept|again|since|ongoing"
+                           r"|is|are|am|has|have|getting|worse|worsening)\b")
+
+def _mentions_current(text: str, breaks: List[int], start: int, end: int) -> bool:
+    """False only if the match at text[start:end] is clearly negated, past or someone else's.
+
+    When in doubt this returns True, so the message is triaged. breaks
+    holds the (start, end) offsets of every clause break, flattened and in
+    order, so the clause around the match is found by bisection.
+    """
+    i = bisect.bisect_right(breaks, start)
+    clause_start = breaks[i - 1] if i else 0
+    j = bisect.bisect_left(breaks, end)
+    clause_end = breaks[j] if j < len(breaks) else len(text)
+    if NEGATED.search(' '.join(text[clause_start:start].split())):
+        return False
+    clause = text[clause_start:clause_end]
+    if HAPPENING_NOW.search(clause):
+        return True
+    if PAST_EVENT.search(clause):
+        return False
+    return not (OTHER_SUBJECT.search(clause) and PAST_TENSE.search(clause))
+
+def _substring_pattern(terms: Iterable[str]):
+    """One trie regex finding any of the terms anywhere in a string; None if there are none"""
+    terms = [term.lower() for term in terms]
+    return re.compile(trie_pattern(terms)) if terms else None
+
+class RuleSet:
+    """Rule tables from data/rules/*.json compiled into an evaluation index.
+
+    Exact-name rules become frozensets and dicts, and every substring rule
+    table becomes a single trie regex. Rule names that are drug classes in
+    the ontology also become a bitset, so "statins" catches atorvastatin
+    with one AND against the drug's precomputed class closure. A check
+    therefore costs O(medications + allergies) plus the length of the
+    names scanned, however many rules the files declare. Instances are
+    immutable; a reload builds a new one.
+    """
+
+    def __init__(self, tables: Dict[str, Any], version: str, ontology: Optional[DrugOntology] = None):
+        self.version = version
+        self.ontology = ontology = ontology if ontology is not None else DrugOntology.empty()
+
+        red_flags = tuple(flag.lower() for flag in tables.get("critical_red_flags", []))
+        self.critical_red_flags = red_flags
+        # Any critical flag inside a symptom or red flag, in one scan over the joined text
+        self.critical_substrings = _substring_pattern(red_flags)
+        # Free-text phrasing (or the flag itself) -> critical flag; longest phrase wins
+        self.critical_terms = {**{flag: flag for flag in red_flags},
+                               **{k.lower(): v.lower() for k, v in tables.get("critical_phrasings", {}).items()}}
+        self.critical_pattern = re.compile(
+            r"\b(" + "|".join(re.escape(term) for term in sorted(self.critical_terms, key=len, reverse=True)) + r")\b"
+        ) if self.critical_terms else None
+
+        paracetamol = tables.get("paracetamol", {})
+        self.paracetamol_names = frozenset(name.lower() for name in paracetamol.get("names", []))
+        self.paracetamol_caution_mg = paracetamol.get("adult_caution_mg", 3000)
+        self.paracetamol_max_mg = paracetamol.get("adult_max_mg", 4000)
+        self.pediatric_below_age = paracetamol.get("pediatric_below_age", 18)
+
+        # Allergy -> (pattern for the medication names it rules out, class bitset)
+        self.allergy_patterns = {allergy.lower(): (_substring_pattern(names), ontology.mask(names))
+                                 for allergy, names in tables.get("allergy_contraindications", {}).items() if names}
+        # Context flag -> (exact medication names, class bitset, issue template)
+        self.condition_medications = {
+            condition: (frozenset(name.lower() for name in rule["names"]), ontology.mask(rule["names"]), rule["issue"])
+            for condition, rule in tables.get("condition_medications", {}).items()
+        }
+        pregnancy = tables.get("pregnancy_contraindicated", [])
+        self.pregnancy_pattern = _substring_pattern(pregnancy)
+        self.pregnancy_mask = ontology.mask(pregnancy)
+        # Restricted name fragment or class -> (minimum age, reason)
+        self.age_restrictions = {name.lower(): (rule["min_age"], rule["reason"])
+                                 for name, rule in tables.get("age_restrictions", {}).items()}
+        self.age_pattern = _substring_pattern(self.age_restrictions)
+        self.age_mask = ontology.mask(self.age_restrictions)
+        # Ontology id -> the restricted name it carries, for walking the set bits of closure & age_mask
+        self.age_by_class = {ontology.ids[normalize(name)]: name for name in self.age_restrictions
+                             if normalize(name) in ontology.ids}
+
+    @classmethod
+    def load(cls, rules_dir: str = RULES_DIR, ontology_path: str = ONTOLOGY_PATH) -> "RuleSet":
+        """Merge and compile every rules file; raises on a missing directory or malformed file"""
+        paths = sorted(glob.glob(os.path.join(rules_dir, '*.json')))
+        if not paths:
+            raise FileNotFoundError(f"no rule files in {rules_dir}")
+        tables: Dict[str, Any] = {}
+        versions, digest = [], hashlib.sha256()
+        for path in paths:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            data = json.loads(raw)
+            if "version" not in data:
+                raise ValueError(f"{os.path.basename(path)} has no version")
+            name = os.path.splitext(os.path.basename(path))[0]
+            versions.append(f"{name}@{data['version']}")
+            digest.update(raw)
+            for key, value in data.items():
+                if key in ("version", "description"):
+                    continue
+                if key in tables:
+                    raise ValueError(f"rule table '{key}' is declared in more than one file")
+                tables[key] = value
+        ontology = DrugOntology.empty()
+        if ontology_path and os.path.exists(ontology_path):
+            with open(ontology_path, 'rb') as f:
+                digest.update(f.read())
+            ontology = DrugOntology.from_csv(ontology_path)
+        # Declared versions for people, content digest so an edit without a bump still counts
+        return cls(tables, f"{','.join(versions)}#{digest.hexdigest()[:8]}", ontology)
+
+class RuleBook:
+    """The current RuleSet, recompiled and swapped in whenever a rules file changes.
+
+    Readers take `current` once per check and keep a consistent rule set
+    even if a reload lands meanwhile; a file that fails to load leaves the
+    current rules in place.
+    """
+
+    def __init__(self, rules_dir: str = RULES_DIR, watch_interval: float = 5.0,
+                 ontology_path: str = ONTOLOGY_PATH):
+        self.rules_dir = rules_dir
+        self.ontology_path = ontology_path
+        self._reload_lock = threading.Lock()
+        self.current = RuleSet.load(rules_dir, ontology_path)
+        self.watcher = None
+        if watch_interval:
+            self.watcher = FileWatcher(self._watched_paths(), self.reload, interval=watch_interval)
+            self.watcher.start()
+
+    def _watched_paths(self) -> List[str]:
+        # The directory itself changes when a rules file is added or removed
+        paths = [self.rules_dir] + sorted(glob.glob(os.path.join(self.rules_dir, '*.json')))
+        return paths + [self.ontology_path] if self.ontology_path else paths
+
+    @property
+    def version(self) -> str:
+        return self.current.version
+
+    def reload(self) -> RuleSet:
+        with self._reload_lock:
+            rules = RuleSet.load(self.rules_dir, self.ontology_path)
+            self.current = rules
+            if self.watcher is not None:
+                self.watcher.paths = self._watched_paths()
+            return rules
+
+_shared: Optional[RuleBook] = None
+_shared_lock = threading.Lock()
+
+def shared_rules() -> RuleBook:
+    """Process-wide rule book over data/rules, shared by the safety review and the pharmacy"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RuleBook()
+        return _shared
 
 class SafetyRules:
-    @staticmethod
-    def check_red_flags(symptoms: List[str], red_flags: List[str]) -> bool:
+    def __init__(self, book: Optional[RuleBook] = None):
+        self.book = book or shared_rules()
+
+    @property
+    def version(self) -> str:
+        """Version of the rules in force; changes whenever a rules file does"""
+        return self.book.version
+
+    @property
+    def ontology(self) -> DrugOntology:
+        """Drug ontology of the rules in force, reloaded with them"""
+        return self.book.current.ontology
+
+    def check_red_flags(self, symptoms: List[str], red_flags: List[str]) -> bool:
         """Check if any red flag symptoms are present"""
-        critical_red_flags = [
-            "chest pain", "severe shortness of breath", "unilateral weakness",
-            "confusion", "blood in vomit", "blood in stool", "difficulty breathing",
-            "neck stiffness", "severe headache", "fainting", "loss of consciousness",
-            "severe abdominal pain", "high fever", "rapid heart rate",
-            "sudden vision changes", "difficulty speaking"
-        ]
-        
-        # Check if any critical red flags are mentioned in symptoms or red_flags
-        all_symptoms = symptoms + red_flags
-        for flag in critical_red_flags:
-            if any(flag in symptom.lower() for symptom in all_symptoms):
-                return True
-        return False
+        pattern = self.book.current.critical_substrings
+        # Check if any critical red flags are mentioned in symptoms or red_flags;
+        # flags never span a newline, so one search over the joined text is enough
+        return pattern is not None and pattern.search('\n'.join(symptoms + red_flags).lower()) is not None
 
     @staticmethod
-    def check_medication_safety(medication: Medication, context: Dict[str, Any]) -> List[str]:
+    def allergy_set(allergies: Optional[Iterable[str]]) -> FrozenSet[str]:
+        """Lower-cased allergies; pass the result to the checks to skip re-normalizing per medication"""
+        if isinstance(allergies, frozenset):
+            return allergies
+        return frozenset(allergy.lower() for allergy in allergies or ())
+
+    def find_critical_red_flags(self, text: str) -> List[str]:
+        """Critical red flags the patient reports having now, in order of appearance.
+
+        One precompiled regex pass over the raw message, so it can run before
+        any extraction as a pre-triage screen. A flag is skipped when a
+        negation cue comes shortly before it in the same clause ("no chest
+        pain"), or when its clause is about a past event ("went away last
+        year") or about someone else in the past tense ("grandpa fainted").
+        """
+        rules = self.book.current
+        if rules.critical_pattern is None:
+            return []
+        text = text.lower().replace("\u2019", "'")
+        breaks = None
+        found = []
+        for match in rules.critical_pattern.finditer(text):
+            flag = rules.critical_terms[match.group(1)]
+            if flag in found:
+                continue
+            if breaks is None:
+                breaks = [pos for brk in CLAUSE_BREAK.finditer(text) for pos in brk.span()]
+            if _mentions_current(text, breaks, match.start(), match.end()):
+                found.append(flag)
+        return found
+
+    def check_medication_safety(self, medication: Medication, context: Dict[str, Any],
+                                allergies: Optional[FrozenSet[str]] = None) -> List[str]:
         """Check medication safety based on patient context"""
+        rules = self.book.current
         issues = []
-        
+        med_name = medication.name.lower()
+
         # Check paracetamol/acetaminophen dosage
-        if medication.name.lower() in ["paracetamol", "acetaminophen"]:
-            if context.get("age") and context["age"] < 18:
+        if med_name in rules.paracetamol_names:
+            if context.get("age") and context["age"] < rules.pediatric_below_age:
                 # Pediatric dosing
                 if "max_daily" not in medication.__dict__ or not medication.max_daily:
                     issues.append("Pediatric paracetamol dosing requires careful weight-based calculation")
             else:
-                # Adult dosing - check if exceeds 3000-4000 mg daily
+                # Adult dosing - check against the caution and maximum daily limits
                 if hasattr(medication, 'max_daily') and medication.max_daily:
                     try:
                         daily_max = int(''.join(filter(str.isdigit, medication.max_daily)))
-                        if daily_max > 4000:
+                        if daily_max > rules.paracetamol_max_mg:
                             issues.append(f"Paracetamol daily maximum {daily_max}mg exceeds safe limits")
-                        elif daily_max > 3000:
+                        elif daily_max > rules.paracetamol_caution_mg:
                             issues.append(f"Paracetamol daily maximum {daily_max}mg should be used with caution")
                     except:
                         issues.append("Could not parse paracetamol dosage information")
-        
+
         # Check for allergies
-        if context.get("allergies"):
-            allergies = [allergy.lower() for allergy in context["allergies"]]
-            med_name = medication.name.lower()
-            
-            # Penicillin allergy cross-reactivity
-            if "penicillin" in allergies and med_name in ["amoxicillin", "augmentin", "ampicillin"]:
-                issues.append(f"Medication {medication.name} contraindicated due to penicillin allergy")
-            
-            # Sulfa allergy
-            if "sulfa" in allergies and any(sulfa in med_name for sulfa in ["sulfa", "sulfamethoxazole", "sulfasalazine"]):
-                issues.append(f"Medication {medication.name} contraindicated due to sulfa allergy")
-        
-        # Pregnancy precautions
-        if context.get("pregnant") and medication.name.lower() in ["ibuprofen", "naproxen", "diclofenac", "warfarin", "statins"]:
-            issues.append(f"Medication {medication.name} should be avoided in pregnancy")
-            
-        # Renal precautions
-        if context.get("renal_issues") and medication.name.lower() in ["ibuprofen", "naproxen", "diclofenac"]:
-            issues.append(f"Medication {medication.name} should be used with caution in renal impairment")
-        
+        classes = rules.ontology.closure(med_name)
+        issues.extend(f"Medication {medication.name} contraindicated due to {allergy} allergy"
+                      for allergy in self._conflicting_allergies(rules, med_name, classes, allergies, context))
+
+        # Pregnancy and renal precautions
+        for condition, (names, mask, issue) in rules.condition_medications.items():
+            if context.get(condition) and (med_name in names or classes & mask):
+                issues.append(issue.format(name=medication.name))
+
         return issues
 
-    @staticmethod
-    def check_pregnancy_contraindications(plan: DoctorPlan, context: Dict[str, Any]) -> List[str]:
+    def check_pregnancy_contraindications(self, plan: DoctorPlan, context: Dict[str, Any]) -> List[str]:
         """Check for pregnancy-related contraindications"""
+        rules = self.book.current
+        pattern = rules.pregnancy_pattern
         issues = []
-        if context.get("pregnant"):
-            # Check medications that should be avoided in pregnancy
-            contraindicated_meds = ["ibuprofen", "naproxen", "diclofenac", "warfarin", "statins", 
-                                   "ace inhibitors", "arb", "retinoids", "methotrexate"]
+        if context.get("pregnant") and pattern is not None:
+            # Check medications that should be avoided in pregnancy, by name or by class
             for med in plan.medications:
-                if any(contraindicated in med.name.lower() for contraindicated in contraindicated_meds):
+                med_name = med.name.lower()
+                if pattern.search(med_name) or rules.ontology.closure(med_name) & rules.pregnancy_mask:
                     issues.append(f"Medication {med.name} may not be safe during pregnancy")
-        
+
         return issues
 
-    @staticmethod
-    def check_allergy_contraindication(medication: str, allergies: List[str]) -> bool:
+    def check_allergy_contraindication(self, medication: str, allergies: Iterable[str]) -> bool:
         """Check if medication is contraindicated due to allergies"""
-        allergy_contraindications = {
-            "penicillin": ["amoxicillin", "augmentin", "ampicillin", "penicillin"],
-            "sulfa": ["sulfamethoxazole", "sulfasalazine", "sulfadiazine", "sulfa"],
-            "aspirin": ["aspirin", "ibuprofen", "naproxen", "diclofenac", "nsaid"],
-            "nsaid": ["ibuprofen", "naproxen", "diclofenac", "aspirin", "nsaid"]
-        }
-        
-        medication_lower = medication.lower()
-        allergies_lower = [a.lower() for a in allergies]
-        
-        for allergy in allergies_lower:
-            if allergy in allergy_contraindications:
-                if any(med in medication_lower for med in allergy_contraindications[allergy]):
-                    return True
-        
-        return False
\ No newline at end of file
+        rules = self.book.current
+        medication = medication.lower()
+        return bool(self._conflicting_allergies(rules, medication, rules.ontology.closure(medication),
+                                                self.allergy_set(allergies)))
+
+    def check_age_restrictions(self, medications: List[Medication], age: Optional[int]) -> List[str]:
+        """Medications restricted below the patient's age"""
+        rules = self.book.current
+        issues = []
+        if age is None or rules.age_pattern is None:
+            return issues
+        for medication in medications:
+            med_name = medication.name.lower()
+            restricted = [match.group(0) for match in rules.age_pattern.finditer(med_name)]
+            classes = rules.ontology.closure(med_name)
+            bits = classes & rules.age_mask
+            while bits:
+                low = bits & -bits
+                restricted.append(rules.age_by_class[low.bit_length() - 1])
+                bits ^= low
+            seen = set()
+            for name in restricted:
+                min_age, reason = rules.age_restrictions.get(name, (0, None))
+                if age < min_age and reason not in seen:
+                    seen.add(reason)
+                    issues.append(f"Medication {medication.name} {reason}")
+        return issues
+
+    def _conflicting_allergies(self, rules: RuleSet, med_name: str, classes: int,
+                               allergies: Optional[FrozenSet[str]], context: Dict[str, Any] = None) -> List[str]:
+        """The patient's allergies that rule out this medication, in a stable order"""
+        if allergies is None:
+            allergies = self.allergy_set((context or {}).get("allergies"))
+        conflicting = []
+        # One dict probe per patient allergy, however many allergy rules there are
+        for allergy in allergies:
+            rule = rules.allergy_patterns.get(allergy)
+            if rule is not None and (classes & rule[1] or rule[0].search(med_name)):
+                conflicting.append(allergy)
+        conflicting.sort()
+        return conflicting
@@ -0,0 +1,149 @@
+from typing import Any, Dict, List, Optional, Type, TypeVar, Union
+import re
+from pydantic import BaseModel, ConfigDict, ValidationError
+from core.json_stream import extract_json
+from core.models import DoctorPlan, Medication, PatientContext, SymptomPayload
+
+# Schemas for what Gemini returns. pydantic-core parses and type-checks the raw
+# JSON in one pass; unknown keys are dropped instead of crashing a constructor,
+# and a ValidationError names every bad field by its path. Field types stay
+# declarative (no Python validators) so validation never leaves the compiled
+# core; the loose shapes models produce ("48 hours", "60%", null lists) are
+# tidied in the to_* conversions.
+
+NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+DEFAULT_DISCLAIMER = "Informational only; see a clinician for diagnosis."
+
+Schema = TypeVar('Schema', bound=BaseModel)
+
+class LLMSchema(BaseModel):
+    model_config = ConfigDict(extra='ignore', coerce_numbers_to_str=True)
+
+def _number(value: Union[float, str, None]) -> Optional[float]:
+    """48 / "48 hours" / "about 2" -> the number; text without one -> None"""
+    if isinstance(value, str):
+        match = NUMBER_PATTERN.search(value)
+        return float(match.group(0)) if match else None
+    return value
+
+def _texts(items: Optional[List[Union[str, Dict[str, Any]]]]) -> List[str]:
+    """List entries the model wrote as objects ({"name": ...}) reduced to their text"""
+    texts = []
+    for item in items or []:
+        if isinstance(item, dict):
+            item = next((item[key] for key in ("name", "symptom", "flag", "trigger", "sign", "description")
+                         if isinstance(item.get(key), str)),
+                        ', '.join(str(v) for v in item.values()))
+        texts.append(item)
+    return texts
+
+class MedicationSchema(LLMSchema):
+    name: str
+    dose: Optional[str] = None
+    route: Optional[str] = None
+    frequency: Optional[str] = None
+    max_daily: Optional[str] = None
+    duration: Optional[str] = None
+    precautions: Optional[List[Union[str, Dict[str, Any]]]] = None
+    interactions: Optional[List[Union[str, Dict[str, Any]]]] = None
+
+    def to_medication(self) -> Medication:
+        return Medication(self.name, self.dose, self.route, self.frequency, self.max_daily,
+                          self.duration, _texts(self.precautions), _texts(self.interactions))
+
+class SymptomExtraction(LLMSchema):
+    chief_complaint: str = ""
+    symptoms: Optional[List[Union[str, Dict[str, Any]]]] = None
+    onset: Optional[str] = None
+    severity: Optional[str] = None
+    red_flags: Optional[List[Union[str, Dict[str, Any]]]] = None
+    duration_hours: Union[float, str, None] = None
+    triggers: Optional[List[Union[str, Dict[str, Any]]]] = None
+
+    def to_payload(self, context: Dict[str, Any] = None, source: str = "llm") -> SymptomPayload:
+        return SymptomPayload(
+            chief_complaint=self.chief_complaint,
+            symptoms=_texts(self.symptoms),
+            onset=self.onset,
+            severity=self.severity.strip().lower() if self.severity else self.severity,
+            red_flags=_texts(self.red_flags),
+            context=PatientContext(**context) if context else PatientContext(),
+            duration_hours=_number(self.duration_hours),
+            triggers=_texts(self.triggers),
+            source=source
+        )
+
+class DifferentialItem(LLMSchema):
+    condition: str
+    likelihood: Union[float, str, None] = None
+    explanation: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        # "60%" or 60 -> 0.6
+        likelihood = _number(self.likelihood) or 0.0
+        item = {"condition": self.condition, "likelihood": likelihood / 100 if likelihood > 1 else likelihood}
+        if self.explanation is not None:
+            item["explanation"] = self.explanation
+        return item
+
+class Escalation(LLMSchema):
+    needed: bool = False
+    reason: Optional[str] = None
+    urgency: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        escalation = {"needed": self.needed, "reason": self.reason}
+        if self.urgency is not None:
+            escalation["urgency"] = self.urgency
+        return escalation
+
+class PlanSchema(LLMSchema):
+    differential: Optional[List[DifferentialItem]] = None
+    tests_suggested: Optional[List[Union[Dict[str, Any], str]]] = None
+    self_care: Optional[List[Union[Dict[str, Any], str]]] = None
+    medications: Optional[List[MedicationSchema]] = None
+    escalation: Optional[Escalation] = None
+    follow_up_advice: Optional[List[Union[Dict[str, Any], str]]] = None
+    warning_signs: Optional[List[Union[str, Dict[str, Any]]]] = None
+    disclaimer: Optional[str] = None
+
+    def to_plan(self, source: str = "llm") -> DoctorPlan:
+        return DoctorPlan(
+            differential=[item.to_dict() for item in self.differential or []],
+            tests_suggested=self.tests_suggested or [],
+            self_care=self.self_care or [],
+            medications=[med.to_medication() for med in self.medications or []],
+            escalation=self.escalation.to_dict() if self.escalation else {"needed": False, "reason": None},
+            disclaimer=self.disclaimer or DEFAULT_DISCLAIMER,
+            follow_up_advice=self.follow_up_advice or [],
+            warning_signs=_texts(self.warning_signs),
+            source=source
+        )
+
+class CombinedAssessment(LLMSchema):
+    extraction: SymptomExtraction
+    plan: PlanSchema
+
+def parse_llm_json(schema: Type[Schema], text: str) -> Schema:
+    """Validate the JSON object in a model response against schema.
+
+    The usual response (the object, maybe inside a ```json fence) is parsed
+    in a single pass from its first '{' to its last '}'. Only if that span
+    is not valid JSON, e.g. prose with braces follows the object, is the
+    first balanced object cut out first. Raises ValidationError.
+    """
+    start, end = text.find('{'), text.rfind('}') + 1
+    if 0 <= start < end:
+        try:
+            return schema.model_validate_json(text[start:end])
+        except ValidationError as e:
+            if not any(error['type'] == 'json_invalid' for error in e.errors()):
+                raise
+    return schema.model_validate_json(extract_json(text))
+
+# Parsers for GeminiClient(parse=...): module-level, so identical prompts coalesce
+def parse_plan(text: str) -> PlanSchema:
+    return parse_llm_json(PlanSchema, text)
+
+def parse_extraction(text: str) -> SymptomExtraction:
+    return parse_llm_json(SymptomExtraction, text)
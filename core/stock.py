@@ -0,0 +1,339 @@
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from core.geo import PharmacyRegistry, haversine_km
+from core.reloader import save_array, prune_versions
+
+class StoreStock:
+    """Store x SKU stock table in compressed sparse column form.
+
+    SKUs are inventory row positions. For SKU ``s`` the stores that carry it
+    are ``store_codes[indptr[s]:indptr[s + 1]]`` (sorted) with matching
+    ``quantities``. Store codes index into ``store_ids``. Only stocked cells
+    are stored, and the arrays can be saved as .npy files and memory-mapped
+    so several worker processes share one copy through the page cache.
+    """
+
+    FILES = ('indptr', 'store_codes', 'quantities', 'store_ids')
+
+    def __init__(self, store_ids: np.ndarray, indptr: np.ndarray,
+                 store_codes: np.ndarray, quantities: np.ndarray):
+        self.store_ids = store_ids
+        self.indptr = indptr
+        self.store_codes = store_codes
+        self.quantities = quantities
+        self.registry: Optional[PharmacyRegistry] = None
+        self.registry_pos: Optional[np.ndarray] = None
+        self.code_of: Dict[str, int] = {}
+        # SKU -> drug id, the key ledger deltas are recorded under
+        self.drug_ids: Optional[List[str]] = None
+
+    @property
+    def n_skus(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def n_stores(self) -> int:
+        return len(self.store_ids)
+
+    @classmethod
+    def empty(cls, n_skus: int) -> "StoreStock":
+        return cls(np.array([], dtype=str), np.zeros(n_skus + 1, dtype=np.int64),
+                   np.array([], dtype=np.int32), np.array([], dtype=np.int32))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, n_skus: int) -> "StoreStock":
+        """Build from a long table with store_id, sku and quantity columns"""
+        df = df[(df['sku'] >= 0) & (df['sku'] < n_skus) & (df['quantity'] > 0)]
+        codes, store_ids = pd.factorize(df['store_id'].astype(str), sort=True)
+        skus = df['sku'].to_numpy(dtype=np.int64)
+        order = np.lexsort((codes, skus))
+        counts = np.bincount(skus, minlength=n_skus)
+        indptr = np.zeros(n_skus + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(np.asarray(store_ids, dtype=str), indptr,
+                   codes[order].astype(np.int32),
+                   df['quantity'].to_numpy(dtype=np.int32)[order])
+
+    @classmethod
+    def from_csv(cls, path: str, n_skus: int, cache_dir: Optional[str] = None) -> "StoreStock":
+        """Load from CSV, reusing the compiled .npy cache built from this version of it.
+
+        Each version of the CSV gets its own cache subdirectory, so a reload
+        never writes to files an older snapshot (or another process) still
+        has memory-mapped.
+        """
+        version_dir = cls._version_dir(cache_dir, path, n_skus) if cache_dir else None
+        if version_dir and all(os.path.exists(os.path.join(version_dir, f"{name}.npy")) for name in cls.FILES):
+            try:
+                return cls.load(version_dir)
+            except (OSError, ValueError):
+                pass
+        stock = cls.from_frame(pd.read_csv(path, dtype={'store_id': str}), n_skus)
+        if version_dir:
+            try:
+                stock.save(version_dir)
+                prune_versions(cache_dir, keep=version_dir)
+            except OSError:
+                pass
+        return stock
+
+    @staticmethod
+    def _version_dir(cache_dir: str, source: str, n_skus: int) -> str:
+        stat = os.stat(source)
+        return os.path.join(cache_dir, f"v{stat.st_mtime_ns}-{stat.st_size}-{n_skus}")
+
+    def save(self, cache_dir: str):
+        """Write the arrays as .npy files that load() can memory-map, replacing each atomically"""
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in self.FILES:
+            save_array(os.path.join(cache_dir, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, cache_dir: str, mmap: bool = True) -> "StoreStock":
+        """Load saved arrays, memory-mapped read-only by default"""
+        mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode=mode)
+                  for name in cls.FILES}
+        return cls(**arrays)
+
+    def attach(self, registry: PharmacyRegistry, drug_ids: Optional[List[str]] = None):
+        """Map store codes to registry positions for distance queries, and SKUs to drug ids"""
+        self.registry = registry
+        self.drug_ids = drug_ids
+        store_ids = self.store_ids.tolist()
+        self.code_of = {store_id: code for code, store_id in enumerate(store_ids)}
+        self.registry_pos = np.array([registry.position_of.get(store_id, -1)
+                                      for store_id in store_ids], dtype=np.int64)
+
+    def drug_id(self, sku: int) -> str:
+        """Ledger key of a SKU; the row position itself when no drug ids are attached"""
+        if self.drug_ids is not None and 0 <= sku < len(self.drug_ids):
+            return self.drug_ids[sku]
+        return str(sku)
+
+    def quantity(self, store_id: str, sku: int, ledger: Optional["StockLedger"] = None) -> int:
+        """Units of a SKU held by one store"""
+        if ledger is not None:
+            units = ledger.quantities_for(self.drug_id(sku)).get(store_id)
+            if units is not None:
+                return units
+        code = self.code_of.get(store_id)
+        if code is None or not 0 <= sku < self.n_skus:
+            return 0
+        start, end = int(self.indptr[sku]), int(self.indptr[sku + 1])
+        i = start + int(np.searchsorted(self.store_codes[start:end], code))
+        if i < end and self.store_codes[i] == code:
+            return int(self.quantities[i])
+        return 0
+
+    def stores_for(self, skus: Iterable[int],
+                   ledger: Optional["StockLedger"] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(registry positions, quantities) of every store stocking any of the SKUs.
+
+        Quantities from the ledger override the loaded table; stores without
+        a registry entry or with no units left are dropped.
+        """
+        empty = np.empty(0, dtype=np.int64)
+        if self.registry is None:
+            return empty, empty
+        pos_parts, qty_parts = [], []
+        for sku in skus:
+            if not 0 <= sku < self.n_skus:
+                continue
+            start, end = int(self.indptr[sku]), int(self.indptr[sku + 1])
+            codes = self.store_codes[start:end]
+            qty = self.quantities[start:end]
+            deltas = ledger.quantities_for(self.drug_id(sku)) if ledger is not None else None
+            if deltas:
+                # Copy first: the loaded arrays may be read-only memory maps
+                qty = np.array(qty, dtype=np.int64)
+                extra_pos, extra_qty = [], []
+                for store_id, units in deltas.items():
+                    code = self.code_of.get(store_id)
+                    i = int(np.searchsorted(codes, code)) if code is not None else len(codes)
+                    if i < len(codes) and codes[i] == code:
+                        qty[i] = units
+                    else:
+                        extra_pos.append(self.registry.position_of.get(store_id, -1))
+                        extra_qty.append(units)
+                pos_parts.append(np.asarray(extra_pos, dtype=np.int64))
+                qty_parts.append(np.asarray(extra_qty, dtype=np.int64))
+            pos_parts.append(self.registry_pos[codes])
+            qty_parts.append(np.asarray(qty, dtype=np.int64))
+        if not pos_parts:
+            return empty, empty
+        positions = np.concatenate(pos_parts)
+        quantities = np.concatenate(qty_parts)
+        keep = (positions >= 0) & (quantities > 0)
+        return positions[keep], quantities[keep]
+
+    def nearest_stores(self, skus: Iterable[int], lat: Optional[float] = None,
+                       lon: Optional[float] = None, k: int = 3,
+                       ledger: Optional["StockLedger"] = None) -> List[Dict[str, Any]]:
+        """Nearest stores holding any of the SKUs, one entry per store.
+
+        Without a location the stores with the most units are returned.
+        """
+        positions, qty = self.stores_for(skus, ledger)
+        if not len(positions):
+            return []
+        # Total units per store across the requested SKUs
+        positions, inverse = np.unique(positions, return_inverse=True)
+        totals = np.bincount(inverse, weights=qty).astype(np.int64)
+
+        if lat is None or lon is None:
+            distances = None
+            top = np.argsort(-totals, kind='stable')[:k]
+        else:
+            distances = haversine_km(lat, lon, self.registry.lats[positions], self.registry.lons[positions])
+            if len(distances) > k:
+                top = np.argpartition(distances, k - 1)[:k]
+                top = top[np.argsort(distances[top], kind='stable')]
+            else:
+                top = np.argsort(distances, kind='stable')
+
+        stores = []
+        for i in top.tolist():
+            record = self.registry.record(int(positions[i]), None if distances is None else distances[i])
+            record["quantity"] = int(totals[i])
+            stores.append(record)
+        return stores
+
+
+class StockLedger:
+    """Stock and price deltas applied on top of the loaded snapshot.
+
+    Deltas are keyed by drug id (the inventory's ``drug_id`` column), not by
+    row position, so they still land on the right drug if inventory.csv is
+    reordered. Each event is a dictionary write, so applying one is O(1).
+    Writers take a lock among themselves; readers never lock and only take
+    C-level copies of the small per-drug dictionaries. When a journal path
+    is given every batch of events is appended to it as JSON lines, and
+    ``replay()`` restores the ledger after a crash.
+    """
+
+    def __init__(self, journal_path: Optional[str] = None, fsync: bool = False):
+        self.journal_path = journal_path
+        self.fsync = fsync
+        self.seq = 0
+        # drug_id -> store_id -> (quantity, seq) and drug_id -> (price, seq)
+        self._quantities: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        self._prices: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._journal = None
+
+    def __len__(self):
+        return sum(len(stores) for stores in self._quantities.values()) + len(self._prices)
+
+    def quantities_for(self, drug_id: str) -> Dict[str, int]:
+        """Store quantities overridden for a drug"""
+        stores = self._quantities.get(drug_id)
+        if not stores:
+            return {}
+        return {store_id: units for store_id, (units, _) in stores.copy().items()}
+
+    def price(self, drug_id: str) -> Optional[float]:
+        """Overridden price for a drug, if any"""
+        entry = self._prices.get(drug_id)
+        return entry[0] if entry else None
+
+    @property
+    def has_prices(self) -> bool:
+        return bool(self._prices)
+
+    def set_quantity(self, drug_id: str, store_id: str, quantity: int) -> int:
+        """Record that a store now holds ``quantity`` units of a drug"""
+        return self.apply([{"type": "stock", "drug_id": drug_id, "store_id": store_id, "quantity": quantity}])
+
+    def set_price(self, drug_id: str, price: float) -> int:
+        """Record a new price for a drug"""
+        return self.apply([{"type": "price", "drug_id": drug_id, "price": price}])
+
+    def apply(self, events: Iterable[Dict[str, Any]], journal: bool = True) -> int:
+        """Apply a batch of events under one lock and one journal flush; returns the last sequence number.
+
+        The whole batch is validated before anything changes, so a bad event
+        leaves the ledger and the journal as they were. Replayed events keep
+        the sequence numbers they were journalled with.
+        """
+        with self._lock:
+            lines = []
+            seq = self.seq
+            for event in events:
+                # Journalled events carry their seq; new ones are numbered from the counter
+                seq = int(event["seq"]) if not journal and "seq" in event else seq + 1
+                drug_id = str(event["drug_id"])
+                if event.get("type", "stock") == "price":
+                    price = event["price"]
+                    float(price)
+                    lines.append({"seq": seq, "type": "price", "drug_id": drug_id, "price": price})
+                else:
+                    lines.append({"seq": seq, "type": "stock", "drug_id": drug_id,
+                                  "store_id": str(event["store_id"]), "quantity": int(event["quantity"])})
+            if journal and lines and self.journal_path:
+                self._write_journal(lines)
+            for line in lines:
+                if line["type"] == "price":
+                    self._prices[line["drug_id"]] = (line["price"], line["seq"])
+                else:
+                    self._quantities.setdefault(line["drug_id"], {})[line["store_id"]] = (line["quantity"], line["seq"])
+                self.seq = max(self.seq, line["seq"])
+            return self.seq
+
+    def _write_journal(self, lines: List[Dict[str, Any]]):
+        if self._journal is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._journal.write(''.join(json.dumps(line) + '\n' for line in lines))
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def replay(self) -> int:
+        """Re-apply journalled events after a restart; returns how many were applied"""
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return 0
+        events = []
+        with open(self.journal_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    break
+        self.apply(events, journal=False)
+        return len(events)
+
+    def truncate(self, upto_seq: int):
+        """Drop events up to a sequence number once the data files are known to include them.
+
+        Later events are kept and the journal is rewritten to hold only them.
+        """
+        with self._lock:
+            for drug_id in list(self._quantities):
+                stores = {store_id: entry for store_id, entry in self._quantities[drug_id].items()
+                          if entry[1] > upto_seq}
+                if stores:
+                    self._quantities[drug_id] = stores
+                else:
+                    del self._quantities[drug_id]
+            self._prices = {drug_id: entry for drug_id, entry in self._prices.items() if entry[1] > upto_seq}
+
+            if self.journal_path:
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+                kept = [{"seq": seq, "type": "stock", "drug_id": drug_id, "store_id": store_id, "quantity": units}
+                        for drug_id, stores in self._quantities.items()
+                        for store_id, (units, seq) in stores.items()]
+                kept += [{"seq": seq, "type": "price", "drug_id": drug_id, "price": price}
+                         for drug_id, (price, seq) in self._prices.items()]
+                kept.sort(key=lambda line: line["seq"])
+                tmp_path = self.journal_path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(''.join(json.dumps(line) + '\n' for line in kept))
+                os.replace(tmp_path, self.journal_path)
@@ -0,0 +1,20 @@
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+PHARMACY_FILES = ('inventory.csv', 'pharmacies.csv', 'store_stock.csv', 'drug_synonyms.csv', 'alternatives.csv')
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """A private copy of the pharmacy data files, which the PharmacyAgent loads instead"""
+    import agents.pharmacy as pharmacy
+    for name in PHARMACY_FILES:
+        shutil.copy(os.path.join(pharmacy.DATA_DIR, name), tmp_path / name)
+    monkeypatch.setattr(pharmacy, 'DATA_DIR', str(tmp_path))
+    return tmp_path
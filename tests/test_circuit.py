@@ -0,0 +1,52 @@
+from core.circuit import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def opened_breaker(clock):
+    breaker = CircuitBreaker("test", min_calls=2, base_backoff=5.0, clock=clock)
+    for _ in range(2):
+        assert breaker.admit() is False
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now += 5.0
+    return breaker
+
+
+def test_only_the_probe_closes_a_half_open_breaker():
+    clock = Clock()
+    breaker = CircuitBreaker("test", min_calls=2, base_backoff=5.0, clock=clock)
+    assert breaker.admit() is False  # a slow call started while closed
+    for _ in range(2):
+        breaker.admit()
+        breaker.record_failure()
+    clock.now += 5.0
+    assert breaker.admit() is True
+
+    # The slow call finishing says nothing about the probe
+    breaker.record_success()
+    assert breaker.state == HALF_OPEN
+    assert breaker.admit() is None
+
+    breaker.record_success(probe=True)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_with_longer_backoff():
+    clock = Clock()
+    breaker = opened_breaker(clock)
+    assert breaker.admit() is True
+    breaker.record_failure()  # not the probe
+    assert breaker.state == HALF_OPEN
+    breaker.record_failure(probe=True)
+    assert breaker.state == OPEN
+    clock.now += 5.0
+    assert breaker.state == OPEN
+    clock.now += 5.0
+    assert breaker.state == HALF_OPEN
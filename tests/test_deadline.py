@@ -0,0 +1,62 @@
+import threading
+
+import core.deadline as deadline
+from agents.patient_symptom import PatientSymptomAgent
+from core.deadline import race
+
+
+def test_saturated_pool_answers_from_the_fallback(monkeypatch):
+    monkeypatch.setattr(deadline, '_slots', threading.BoundedSemaphore(1))
+    release = threading.Event()
+    calls = []
+
+    def slow_llm():
+        calls.append(1)
+        release.wait(5)
+        return "llm"
+
+    assert race(slow_llm, lambda: "rules", 0.01) == ("rules", "deadline")
+    # The first call still holds the only worker, so this one is not submitted
+    assert race(slow_llm, lambda: "rules", 1.0) == ("rules", "saturated")
+    assert len(calls) == 1
+
+    release.set()
+    for _ in range(100):
+        if deadline._slots.acquire(timeout=0.05):
+            deadline._slots.release()
+            break
+    assert race(lambda: "llm", lambda: "rules", 1.0) == ("llm", "llm")
+
+
+def test_race_reports_which_path_answered():
+    assert race(lambda: "llm", lambda: "rules", 1.0) == ("llm", "llm")
+
+    def failing_llm():
+        raise RuntimeError("quota exceeded")
+
+    assert race(failing_llm, lambda: "rules", 1.0) == ("rules", "fallback")
+
+    slow = threading.Event()
+    try:
+        assert race(lambda: slow.wait(5), lambda: "rules", 0.01) == ("rules", "deadline")
+    finally:
+        slow.set()
+
+
+def test_slow_extraction_is_answered_by_the_lexicon_on_time():
+    agent = PatientSymptomAgent(latency_budget=0.05)
+    agent.gemini_available = True
+    agent.model = type("Model", (), {"available": lambda self: True})()
+    slow = threading.Event()
+
+    def slow_extraction(user_input, context=None):
+        slow.wait(5)
+        raise RuntimeError("too late")
+
+    agent._llm_extraction = slow_extraction
+    try:
+        payload = agent.extract_symptoms("fever and cough for 2 days", {"age": 30})
+    finally:
+        slow.set()
+    assert payload.source == "deadline"
+    assert "fever" in payload.symptoms and "cough" in payload.symptoms
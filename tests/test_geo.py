@@ -0,0 +1,33 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.geo import PharmacyRegistry, haversine_km
+
+PHARMACIES = os.path.join(os.path.dirname(__file__), '..', 'data', 'pharmacies.csv')
+
+
+def brute_force(registry, lat, lon, k):
+    dist = haversine_km(lat, lon, registry.lats, registry.lons)
+    return np.sort(dist)[:k]
+
+
+def test_nearest_matches_brute_force():
+    rng = np.random.default_rng(3)
+    stores = pd.DataFrame({'store_id': np.arange(2000), 'lat': rng.uniform(8, 32, 2000),
+                           'lon': rng.uniform(70, 90, 2000)})
+    registry = PharmacyRegistry(stores)
+    for lat, lon in zip(rng.uniform(0, 40, 200), rng.uniform(60, 100, 200)):
+        found = [dist for _, dist in registry.nearest(lat, lon, k=5)]
+        assert np.allclose(found, brute_force(registry, lat, lon, 5))
+
+
+def test_nearest_far_from_every_store_is_fast():
+    registry = PharmacyRegistry.from_csv(PHARMACIES)
+    for lat, lon in [(0.0, 0.0), (40.7, -74.0), (-33.9, 151.2)]:
+        start = time.perf_counter()
+        found = registry.nearest(lat, lon, k=3)
+        assert time.perf_counter() - start < 0.05
+        assert np.allclose([dist for _, dist in found], brute_force(registry, lat, lon, 3))
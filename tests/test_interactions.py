@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from core.interactions import InteractionDB
+from core.ontology import DrugOntology
+
+CLASSES = pd.DataFrame({
+    'name': ['aspirin', 'aspirin', 'ibuprofen', 'sertraline', 'phenelzine', 'nsaid', 'ssri'],
+    'parent': ['nsaid', 'antiplatelet', 'nsaid', 'ssri', 'maoi', 'analgesic', 'antidepressant'],
+})
+PAIRS = pd.DataFrame({
+    'drug_a': ['warfarin', 'warfarin', 'warfarin', 'ssri', 'ssri', 'antidepressant', 'warfarin'],
+    'drug_b': ['aspirin', 'nsaid', 'antiplatelet', 'maoi', 'nsaid', 'analgesic', 'Aspirin'],
+    'severity': ['major', 'major', 'moderate', 'Contraindicated', 'moderate', 'minor', 'minor'],
+    'mechanism': ['bleeding', 'bleeding', 'haemostasis', 'serotonin syndrome', 'GI bleeding', 'test', 'duplicate'],
+})
+
+
+@pytest.fixture
+def db():
+    return InteractionDB(PAIRS, DrugOntology(CLASSES))
+
+
+def test_classes_expand_to_every_ancestor(db):
+    names = lambda drug: [db.names[i] for i in db.expand(drug)]
+    assert names("Ibuprofen 400mg tablet") == ["nsaid", "analgesic"]
+    assert names("aspirin") == ["aspirin", "nsaid", "antiplatelet", "analgesic"]
+    assert db.expand("vitamin c") is None
+
+
+def test_pair_is_reported_once_with_its_most_severe_record(db):
+    # warfarin-aspirin is recorded directly, via nsaid and via antiplatelet; the duplicate minor row is dropped
+    assert len(db) == 6
+    [interaction] = db.check(["warfarin", "aspirin 75mg"])
+    assert (interaction.via_a, interaction.via_b, interaction.severity) == ("warfarin", "aspirin", "major")
+
+
+def test_results_are_ordered_by_severity(db):
+    found = db.check(["ibuprofen", "sertraline", "phenelzine", "warfarin", "Ibuprofen"])
+    assert [(i.drug_a, i.drug_b, i.severity) for i in found] == [
+        ("sertraline", "phenelzine", "contraindicated"),
+        ("ibuprofen", "warfarin", "major"),
+        ("ibuprofen", "sertraline", "moderate"),
+    ]
+    assert found[0].via_a == "ssri" and found[0].mechanism == "serotonin syndrome"
+
+
+
+def test_newer_ontology_changes_class_membership(db):
+    edited = DrugOntology(pd.concat([CLASSES, pd.DataFrame({'name': ['paroxetine'], 'parent': ['ssri']})]))
+    assert db.check(["paroxetine", "phenelzine"]) == []
+    [interaction] = db.check(["paroxetine", "phenelzine"], edited)
+    assert interaction.severity == "contraindicated"
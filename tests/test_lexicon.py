@@ -0,0 +1,54 @@
+import glob
+import os
+
+import pytest
+
+import core.lexicon as lexicon
+from core.lexicon import LexiconStore, SymptomMatcher
+
+LEXICON_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'lexicon')
+
+
+@pytest.fixture
+def matcher(tmp_path):
+    paths = sorted(glob.glob(os.path.join(LEXICON_DIR, '*.tsv')))
+    return SymptomMatcher.default(LexiconStore.compile(paths, str(tmp_path)))
+
+
+@pytest.mark.parametrize("text, symptom", [
+    ("सीने में दर्द है", "chest pain"),
+    ("मुझे बुखार और खांसी है", "fever"),
+    ("साँस लेने में तकलीफ़ हो रही है", "breathing issues"),
+    ("saans lene mein taklif", "breathing issues"),
+    ("saans lene me takleef", "breathing issues"),
+    ("bukhār hai", "fever"),
+])
+def test_hindi_spellings_and_script(matcher, text, symptom):
+    assert symptom in matcher.match(text).symptoms
+
+
+def test_recompile_leaves_mapped_store_intact(tmp_path):
+    tsv = tmp_path / 'terms.tsv'
+    cache = str(tmp_path / 'cache')
+    tsv.write_text("term\tkind\tlabel\nfever\tsymptom\tfever\n", encoding='utf-8')
+    LexiconStore.compile([str(tsv)], cache)
+    # The second compile maps the arrays the first one wrote, as pool workers do
+    old = LexiconStore.compile([str(tsv)], cache)
+    assert old.match("high fever") == [("symptom", "fever")]
+
+    with open(tsv, 'a', encoding='utf-8') as f:
+        f.write("".join(f"term{i}\tsymptom\tlabel{i}\n" for i in range(1000)))
+    new = LexiconStore.compile([str(tsv)], cache)
+    assert ("symptom", "label7") in new.match("term7")
+    assert old.match("high fever") == [("symptom", "fever")]
+    assert os.listdir(cache) == [os.path.basename(LexiconStore.compiled_dir([str(tsv)], cache))]
+
+
+def test_long_message_dedupe_matches_a_full_scan(monkeypatch):
+    matcher = SymptomMatcher.default()
+    text = ("Slept badly, had a fever of 101°F. Coughing at night!\n" * 60
+            + "Today: chest pain?? and vomiting blood." + " Went for a walk." * 40)
+    deduped = matcher.match(text)
+    monkeypatch.setattr(lexicon, 'LONG_MESSAGE_CHARS', len(text))
+    assert matcher.match(text) == deduped
+    assert deduped.red_flags == ["chest pain", "blood"]
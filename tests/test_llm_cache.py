@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from core.llm import GeminiClient
+from core.llm_cache import ResponseCache
+
+
+class Reply:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        return Reply(self.replies.pop(0))
+
+
+@pytest.fixture
+def client(tmp_path, request):
+    # A model name per test, so each gets its own breaker
+    return GeminiClient(f"test-{request.node.name}", cache=ResponseCache(str(tmp_path / 'cache.db')))
+
+
+def test_only_replies_the_parser_accepts_are_cached(client):
+    client.model = FakeModel(['{"severity": "mild"', '{"severity": "mild"}'])
+    with pytest.raises(ValueError):
+        client.generate_content("prompt", parse=json.loads)
+    assert client.cache.get(client.model_name, "prompt") is None
+
+    assert client.generate_content("prompt", parse=json.loads) == {"severity": "mild"}
+    assert client.generate_content("  prompt ", parse=json.loads) == {"severity": "mild"}
+    assert client.model.calls == 2
+
+
+def test_cacheable_can_refuse_a_parsed_reply(client):
+    client.model = FakeModel(['[1, null]', '[1, 2]'])
+    complete = lambda items: None not in items
+    assert client.generate_content("batch", parse=json.loads, cacheable=complete) == [1, None]
+    assert client.cache.get(client.model_name, "batch") is None
+    assert client.generate_content("batch", parse=json.loads, cacheable=complete) == [1, 2]
+    assert client.cache.get(client.model_name, "batch") == '[1, 2]'
+
+
+def test_cached_entry_the_parser_rejects_is_asked_again(client):
+    client.cache.put(client.model_name, "prompt", "not json")
+    client.model = FakeModel(['{"ok": true}'])
+    assert client.generate_content("prompt", parse=json.loads) == {"ok": True}
+    assert client.model.calls == 1
+    assert client.cache.get(client.model_name, "prompt") == '{"ok": true}'
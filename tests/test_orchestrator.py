@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.models import SymptomPayload, PatientContext
+from core.orchestrator import Orchestrator
+
+
+@pytest.fixture(scope="module")
+def orchestrator():
+    orchestrator = Orchestrator(plan_cache_size=0, red_flag_triage=False)
+
+    def llm_extraction(user_input, context=None):
+        # Stands in for Gemini, which reads negation and reports no red flags here
+        return SymptomPayload(chief_complaint="cough", symptoms=["cough"], severity="mild",
+                              red_flags=[], context=PatientContext(**(context or {})), source="llm")
+
+    orchestrator.psa.extract_symptoms = llm_extraction
+    return orchestrator
+
+
+def comparable(result):
+    return {key: value for key, value in result.items() if key not in ("timestamp", "session_id")}
+
+
+@pytest.mark.parametrize("text, red_flags", [
+    ("mild cough, no chest pain", []),
+    ("cough and now chest pain", ["chest pain"]),
+])
+def test_sync_and_async_agree(orchestrator, text, red_flags):
+    sync = orchestrator.process_request(text, {"age": 30})
+    async_ = asyncio.run(orchestrator.process_request_async(text, {"age": 30}))
+    assert sync["symptom_analysis"]["red_flags"] == red_flags
+    for result in (sync, async_):
+        result["symptom_analysis"].pop("timestamp", None)
+    assert comparable(sync) == comparable(async_)
+
+
+def test_coalesced_callers_get_their_own_session(orchestrator):
+    release = threading.Event()
+    calls = []
+    extract = orchestrator.psa.extract_symptoms
+
+    def slow_extraction(user_input, context=None):
+        calls.append(user_input)
+        release.wait(5)
+        return extract(user_input, context)
+
+    orchestrator.psa.extract_symptoms = slow_extraction
+    coalesced = orchestrator.inflight.coalesced
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(orchestrator.process_request, "dry cough since monday", {"age": 40})
+                       for _ in range(4)]
+            while orchestrator.inflight.coalesced < coalesced + 3:
+                time.sleep(0.01)
+            release.set()
+            results = [future.result() for future in futures]
+    finally:
+        orchestrator.psa.extract_symptoms = extract
+
+    assert len(calls) == 1
+    assert len({result["session_id"] for result in results}) == 4
+    results[0]["symptom_analysis"]["symptoms"].append("edited")
+    assert all("edited" not in result["symptom_analysis"]["symptoms"] for result in results[1:])
+    assert all(comparable(result) == comparable(results[1]) for result in results[2:])
+
+
+def test_coalesced_async_callers_get_their_own_session(orchestrator):
+    async def run():
+        request = lambda: orchestrator.process_request_async("sore throat and cough", {"age": 22})
+        return await asyncio.gather(*(request() for _ in range(3)))
+
+    coalesced = orchestrator.inflight.coalesced
+    results = asyncio.run(run())
+    assert orchestrator.inflight.coalesced == coalesced + 2
+    assert len({result["session_id"] for result in results}) == 3
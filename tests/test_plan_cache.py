@@ -0,0 +1,22 @@
+from core.models import SymptomPayload, PatientContext
+from core.plan_cache import case_key
+
+
+def payload(**context):
+    return SymptomPayload(chief_complaint="fever", symptoms=["fever", "cough"], severity="mild",
+                          duration_hours=24, context=PatientContext(**context))
+
+
+def test_cases_differing_only_in_weight_do_not_share_an_entry():
+    light = payload(age=6, vitals={"height": 115, "weight": 18})
+    heavy = payload(age=6, vitals={"height": 115, "weight": 27})
+    assert case_key(light, 1) != case_key(heavy, 1)
+
+
+def test_same_weight_band_and_unknown_vitals_share_an_entry():
+    assert case_key(payload(age=6, vitals={"weight": 18.2}), 1) == case_key(payload(age=6, vitals={"weight": 19}), 1)
+    assert case_key(payload(age=30), 1) == case_key(payload(age=30, vitals={"weight": "", "blood_group": "O+"}), 1)
+
+
+def test_versions_are_part_of_the_key():
+    assert case_key(payload(age=30), 1, "a") != case_key(payload(age=30), 2, "a")
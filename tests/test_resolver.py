@@ -0,0 +1,46 @@
+import pytest
+
+from agents.pharmacy import PharmacyAgent
+from core.models import Medication
+
+
+@pytest.fixture(scope="module")
+def agent():
+    return PharmacyAgent(watch_interval=0)
+
+
+@pytest.mark.parametrize("text, name, how", [
+    ("Paracetamol 500mg tablet", "paracetamol", "exact"),
+    ("paracetmol", "paracetamol", "fuzzy"),
+    ("amoxicilin 250 mg", "amoxicillin", "fuzzy"),
+    ("ibuprofin", "ibuprofen", "fuzzy"),
+    ("azithromicin", "azithromycin", "fuzzy"),
+    ("acetaminophen", "paracetamol", "synonym"),
+    ("Tylenol extra", "paracetamol", "word"),
+])
+def test_misspellings_and_synonyms_resolve(agent, text, name, how):
+    assert agent.snapshot.resolver.match(text) == (name, how)
+
+
+@pytest.mark.parametrize("text", [
+    "oxazepam", "felodipine", "esomeprazole", "levocetirizine", "fexofenadine",
+    "ativan", "allegra", "xyz", "vitamin", "",
+])
+def test_different_drugs_and_junk_do_not_resolve(agent, text):
+    resolved = agent.snapshot.resolver.resolve(text)
+    assert resolved is None or resolved == text
+
+
+def test_other_drug_is_reported_unavailable_not_substituted(agent):
+    result = agent.check_availability([Medication("oxazepam", "10mg", "oral", "at night")])
+    assert result.availability == [] and result.store_availability == []
+    assert result.alternatives[0]["name"] == "oxazepam"
+    assert result.alternatives[0]["type"] == "unavailable"
+
+
+def test_non_exact_match_is_flagged(agent):
+    result = agent.check_availability([Medication("paracetmol", "500mg", "oral", "tds")])
+    assert result.availability
+    assert all(item["requested"] == "paracetmol" and item["match"] == "fuzzy" for item in result.availability)
+    assert result.store_availability[0]["matched_name"] == "paracetamol"
+    assert result.store_availability[0]["match"] == "fuzzy"
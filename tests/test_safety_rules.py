@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from core.interactions import InteractionDB
+from core.models import DoctorPlan, Medication
+from core.ontology import ONTOLOGY_PATH
+from core.rules import RULES_DIR, RuleBook, SafetyRules
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return SafetyRules(RuleBook(watch_interval=0))
+
+
+# Expected outputs are those of the per-call list-literal checks the compiled tables replaced
+@pytest.mark.parametrize("name, max_daily, context, issues", [
+    ("paracetamol", "5000 mg", {"age": 40}, ["Paracetamol daily maximum 5000mg exceeds safe limits"]),
+    ("Paracetamol", "3500 mg", {"age": 40}, ["Paracetamol daily maximum 3500mg should be used with caution"]),
+    ("paracetamol", "3000 mg", {"age": 40}, []),
+    ("paracetamol", None, {"age": 10}, ["Pediatric paracetamol dosing requires careful weight-based calculation"]),
+    ("acetaminophen", "as needed", {"age": 40}, ["Could not parse paracetamol dosage information"]),
+    ("amoxicillin", None, {"allergies": ["Penicillin"]},
+     ["Medication amoxicillin contraindicated due to penicillin allergy"]),
+    ("sulfasalazine", None, {"allergies": ["Sulfa"]},
+     ["Medication sulfasalazine contraindicated due to sulfa allergy"]),
+    ("ibuprofen", None, {"pregnant": True, "renal_issues": True},
+     ["Medication ibuprofen should be avoided in pregnancy",
+      "Medication ibuprofen should be used with caution in renal impairment"]),
+    ("warfarin", None, {"pregnant": True}, ["Medication warfarin should be avoided in pregnancy"]),
+    ("cetirizine", "10 mg", {"age": 10, "pregnant": True, "renal_issues": True, "allergies": ["Penicillin", "Sulfa"]}, []),
+])
+def test_medication_safety_matches_previous_rules(rules, name, max_daily, context, issues):
+    medication = Medication(name, "500 mg", "oral", "twice daily", max_daily=max_daily)
+    assert rules.check_medication_safety(medication, context, rules.allergy_set(context.get("allergies"))) == issues
+
+
+@pytest.mark.parametrize("name, allergies, contraindicated", [
+    ("Augmentin 625", ["Penicillin"], True),
+    ("sulfadiazine", ["sulfa"], True),
+    ("ibuprofen", ["NSAID"], True),
+    ("paracetamol", ["aspirin"], False),
+    ("ibuprofen", ["dust"], False),
+    ("amoxicillin", [], False),
+])
+def test_allergy_contraindication_matches_previous_rules(rules, name, allergies, contraindicated):
+    assert rules.check_allergy_contraindication(name, rules.allergy_set(allergies)) is contraindicated
+
+
+def test_pregnancy_and_red_flags_match_previous_rules(rules):
+    plan = DoctorPlan([], medications=[Medication(name, "", "oral", "")
+                                       for name in ["ibuprofen", "paracetamol", "Methotrexate 7.5mg"]])
+    assert rules.check_pregnancy_contraindications(plan, {"pregnant": True}) == [
+        "Medication ibuprofen may not be safe during pregnancy",
+        "Medication Methotrexate 7.5mg may not be safe during pregnancy"]
+    assert rules.check_pregnancy_contraindications(plan, {}) == []
+
+    assert rules.check_red_flags(["mild chest pain"], [])
+    assert rules.check_red_flags(["cough"], ["Severe Headache today"])
+    assert not rules.check_red_flags(["headache", "cough"], [])
+
+
+@pytest.fixture
+def edited_book(tmp_path):
+    rules_dir = tmp_path / 'rules'
+    shutil.copytree(RULES_DIR, rules_dir)
+    shutil.copy(ONTOLOGY_PATH, tmp_path / 'drug_classes.csv')
+    book = RuleBook(str(rules_dir), watch_interval=3600, ontology_path=str(tmp_path / 'drug_classes.csv'))
+    yield book
+    book.watcher.stop()
+
+
+def test_ontology_edit_reloads_every_class_rule(edited_book, tmp_path):
+    rules = SafetyRules(edited_book)
+    ketorolac = Medication("ketorolac", "10 mg", "oral", "")
+    version = rules.version
+    assert rules.check_medication_safety(ketorolac, {"renal_issues": True}) == []
+    assert not rules.check_allergy_contraindication("ketorolac", rules.allergy_set(["NSAID"]))
+    assert InteractionDB.from_csv().check(["ketorolac", "warfarin"], rules.ontology) == []
+
+    with open(tmp_path / 'drug_classes.csv', 'a') as f:
+        f.write("ketorolac,nsaid\n")
+    assert edited_book.watcher.check()
+    assert rules.version != version
+    assert rules.check_medication_safety(ketorolac, {"renal_issues": True}) == [
+        "Medication ketorolac should be used with caution in renal impairment"]
+    assert rules.check_allergy_contraindication("ketorolac", rules.allergy_set(["NSAID"]))
+    [interaction] = InteractionDB.from_csv().check(["ketorolac", "warfarin"], rules.ontology)
+    assert (interaction.via_a, interaction.severity) == ("nsaid", "major")
+
+
+def test_broken_ontology_edit_keeps_the_current_rules(edited_book, tmp_path):
+    rules = SafetyRules(edited_book)
+    version = rules.version
+    with open(tmp_path / 'drug_classes.csv', 'a') as f:
+        f.write("analgesic,ibuprofen\n")
+    assert not edited_book.watcher.check()
+    assert rules.version == version
+    assert rules.check_allergy_contraindication("ibuprofen", rules.allergy_set(["NSAID"]))
+
+
+def test_rules_file_edit_is_reloaded_and_bad_json_is_ignored(edited_book):
+    rules = SafetyRules(edited_book)
+    path = os.path.join(edited_book.rules_dir, 'medications.json')
+    plan = DoctorPlan([], medications=[Medication("misoprostol", "", "oral", "")])
+    assert rules.check_pregnancy_contraindications(plan, {"pregnant": True}) == []
+
+    with open(path) as f:
+        table = json.load(f)
+    table["pregnancy_contraindicated"].append("misoprostol")
+    with open(path, 'w') as f:
+        json.dump(table, f)
+    assert edited_book.watcher.check()
+    issues = ["Medication misoprostol may not be safe during pregnancy"]
+    assert rules.check_pregnancy_contraindications(plan, {"pregnant": True}) == issues
+
+    with open(path, 'w') as f:
+        f.write('{"pregnancy_contraindicated": [')
+    assert not edited_book.watcher.check()
+    assert rules.check_pregnancy_contraindications(plan, {"pregnant": True}) == issues
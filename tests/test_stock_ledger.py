@@ -0,0 +1,93 @@
+import os
+
+import pandas as pd
+import pytest
+
+import agents.pharmacy as pharmacy
+from core.models import Medication
+from core.stock import StockLedger
+
+
+def price_of(agent, name):
+    result = agent.check_availability([Medication(name, "", "oral", "")])
+    return [item["price"] for item in result.availability]
+
+
+def test_reload_keeps_deltas_until_compacted(data_dir):
+    agent = pharmacy.PharmacyAgent(watch_interval=0, journal_path=str(data_dir / 'journal.jsonl'))
+    sku = 3
+    name = agent.inventory_df.iloc[sku]['name']
+    seq = agent.apply_price_delta(sku, 999)
+
+    # A reload triggered by a file the feed did not fold the delta into
+    os.utime(data_dir / 'pharmacies.csv')
+    agent.reload_inventory()
+    assert agent.ledger.price(agent.inventory_df.iloc[sku]['drug_id']) == 999
+    assert '₹999' in price_of(agent, name)
+
+    agent.compact_ledger(seq)
+    assert len(agent.ledger) == 0
+    assert os.path.getsize(data_dir / 'journal.jsonl') == 0
+
+
+def test_deltas_follow_the_drug_when_inventory_is_reordered(data_dir):
+    journal = str(data_dir / 'journal.jsonl')
+    agent = pharmacy.PharmacyAgent(watch_interval=0, journal_path=journal)
+    row = agent.inventory_df.iloc[3]
+    agent.apply_price_delta(3, 999)
+
+    inventory = pd.read_csv(data_dir / 'inventory.csv')
+    inventory.iloc[::-1].to_csv(data_dir / 'inventory.csv', index=False)
+    agent.reload_inventory()
+    moved = agent.inventory_df.index[agent.inventory_df['drug_id'] == row['drug_id']][0]
+    assert moved != 3
+    assert agent._price(agent.inventory_df.iloc[moved]['drug_id'], row['price']) == 999
+    assert agent._price(agent.inventory_df.iloc[3]['drug_id'], 1) == 1
+
+    # The journal replays onto the reordered inventory too
+    restarted = pharmacy.PharmacyAgent(watch_interval=0, journal_path=journal)
+    assert restarted.ledger.price(row['drug_id']) == 999
+
+
+def test_unknown_drug_id_is_rejected(data_dir):
+    agent = pharmacy.PharmacyAgent(watch_interval=0)
+    with pytest.raises(ValueError):
+        agent.apply_deltas([{"type": "price", "drug_id": "no such drug", "price": 1}])
+    with pytest.raises(ValueError):
+        agent.apply_deltas([{"type": "price", "sku": len(agent.inventory_df), "price": 1}])
+    assert len(agent.ledger) == 0
+
+
+def test_replay_keeps_journalled_sequence_numbers(tmp_path):
+    journal = str(tmp_path / 'journal.jsonl')
+    ledger = StockLedger(journal)
+    for i in range(1, 11):
+        ledger.set_quantity(f"drug{i}", "S0001", i)
+    ledger.truncate(5)
+
+    restarted = StockLedger(journal)
+    restarted.replay()
+    assert restarted.seq == 10
+    assert restarted.quantities_for("drug8") == {"S0001": 8}
+    assert restarted.set_quantity("drug11", "S0001", 11) == 11
+
+    # Only seq 6 and 7 have been folded into the files
+    restarted.truncate(7)
+    assert restarted.quantities_for("drug7") == {}
+    for i in (8, 9, 10, 11):
+        assert restarted.quantities_for(f"drug{i}") == {"S0001": i}
+    again = StockLedger(journal)
+    again.replay()
+    assert len(again) == 4 and again.seq == 11
+
+
+def test_bad_event_leaves_batch_unapplied(tmp_path):
+    journal = tmp_path / 'journal.jsonl'
+    ledger = StockLedger(str(journal))
+    ledger.set_price("drug0", 10)
+    with pytest.raises((KeyError, ValueError)):
+        ledger.apply([{"type": "price", "drug_id": "drug1", "price": 5},
+                      {"type": "stock", "drug_id": "drug2", "store_id": "S0001", "quantity": "many"}])
+    assert ledger.seq == 1 and len(ledger) == 1
+    assert ledger.price("drug1") is None
+    assert len(journal.read_text().splitlines()) == 1
@@ -0,0 +1,31 @@
+import numpy as np
+
+import agents.pharmacy as pharmacy
+
+
+def test_reload_keeps_old_snapshot_readable(data_dir):
+    agent = pharmacy.PharmacyAgent(watch_interval=0)
+    # The second load maps the compiled cache the first one wrote
+    agent.reload_inventory()
+    old = agent.snapshot.store_stock
+    assert isinstance(old.quantities, np.memmap)
+    total = int(old.quantities.sum())
+
+    with open(data_dir / 'store_stock.csv', 'a') as f:
+        f.write("S0001,0,500\n")
+    agent.reload_inventory()
+
+    # The old snapshot still reads its own data rather than crashing on rewritten pages
+    assert int(old.quantities.sum()) == total
+    assert int(agent.snapshot.store_stock.quantities.sum()) > total
+    assert agent.snapshot.store_stock.quantity("S0001", 0) >= 500
+
+
+def test_cache_versions_are_pruned(data_dir):
+    agent = pharmacy.PharmacyAgent(watch_interval=0)
+    for quantity in (7, 8):
+        with open(data_dir / 'store_stock.csv', 'a') as f:
+            f.write(f"S0002,1,{quantity}\n")
+        agent.reload_inventory()
+    cache = data_dir / '.cache' / 'store_stock'
+    assert len([path for path in cache.iterdir() if path.is_dir()]) == 1
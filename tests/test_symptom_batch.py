@@ -0,0 +1,29 @@
+import json
+
+from agents.patient_symptom import PatientSymptomAgent
+
+
+class FakeModel:
+    def __init__(self):
+        self.prompts = []
+
+    def available(self):
+        return True
+
+    def generate_content(self, prompt, parse=None, cacheable=None):
+        self.prompts.append(prompt)
+        return parse(json.dumps([{"chief_complaint": "cough", "symptoms": ["cough"], "severity": "mild"}] * 2))
+
+
+def test_batched_prompt_keeps_each_message_context():
+    agent = PatientSymptomAgent()
+    agent.gemini_available = True
+    agent.model = FakeModel()
+    items = [("dry cough", {"age": 70, "meds": ["warfarin"]}),
+             ("cough  at\nnight", {"age": 28, "pregnant": True})]
+
+    results = list(agent.extract_symptoms_batch(items))
+    prompt = agent.model.prompts[0]
+    first, second = prompt.index('1. Patient message: "dry cough"'), prompt.index('2. Patient message: "cough at night"')
+    assert first < prompt.index("'warfarin'") < second < prompt.index("'pregnant': True")
+    assert [result.context.age for result in results] == [70, 28]
@@ -0,0 +1,54 @@
+import pytest
+
+from core.orchestrator import Orchestrator
+from core.rules import SafetyRules
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return SafetyRules()
+
+
+@pytest.mark.parametrize("text", [
+    "mild cough, no chest pain and no difficulty breathing",
+    "my chest pain went away last year",
+    "grandpa fainted last week",
+    "grandpa had chest pain",
+    "I don't have chest pain",
+    "I am not having chest pain",
+    "I had chest pain 3 years ago",
+    "no fever or chest pain",
+    "denies any fainting",
+])
+def test_negated_past_and_other_people_are_not_triaged(rules, text):
+    assert rules.find_critical_red_flags(text) == []
+
+
+@pytest.mark.parametrize("text, flags", [
+    ("I have chest pain", ["chest pain"]),
+    ("I can't breathe", ["difficulty breathing"]),
+    ("I can’t breathe", ["difficulty breathing"]),
+    ("no fever but severe chest pain", ["chest pain"]),
+    ("no chest pain. I passed out an hour ago", ["fainting"]),
+    ("my son can't breathe", ["difficulty breathing"]),
+    ("my daughter just fainted", ["fainting"]),
+    ("I can't bear this chest pain", ["chest pain"]),
+    ("I can't stop vomiting blood", ["blood in vomit"]),
+    ("I'm worried my wife has chest pain", ["chest pain"]),
+    ("my husband collapsed and passed out", ["fainting"]),
+    ("chest pain started 2 days ago and is getting worse", ["chest pain"]),
+    # Unclear whether this is happening now, so it is triaged
+    ("grandpa fainted", ["fainting"]),
+])
+def test_current_red_flags_are_triaged(rules, text, flags):
+    assert rules.find_critical_red_flags(text) == flags
+
+
+def test_streaming_runs_the_full_assessment_behind_triage():
+    orchestrator = Orchestrator(plan_cache_size=0)
+    events = []
+    result = orchestrator.process_request_streaming("I have chest pain", on_event=lambda name, value: events.append(name))
+    assert events[0] == "escalation"
+    assert "pharmacy" in events and events[-1] == "safety_review"
+    assert "chest pain" in result["symptom_analysis"]["red_flags"]
+    assert result["preliminary_assessment"]["escalation"]["needed"]